@@ -0,0 +1,114 @@
+import argparse
+import json
+import pathlib
+import platform
+import subprocess
+import sys
+import time
+
+from collections import namedtuple
+
+import numpy as np
+
+from benchmarks.kernels import benchmarks
+
+BenchmarkConfig = namedtuple("BenchmarkConfig", ["points", "time_steps", "elements", "search_grid", "material",
+                                                 "reference_points", "cycle_levels", "cpus", "shared_memory",
+                                                 "repeat", "seed"])
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=pathlib.Path(__file__).parent,
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmarks(config, names=None):
+    """
+    Runs the benchmarks in names, default all benchmarks
+    :return:    dict with the configuration, information about the environment and the results of each benchmark
+    """
+    if names is None:
+        names = list(benchmarks)
+    report = {"config": config._asdict(), "revision": git_revision(), "python": platform.python_version(),
+              "numpy": np.__version__, "platform": platform.platform(), "date": time.strftime("%Y-%m-%d %H:%M:%S"),
+              "results": {}}
+    for name in names:
+        print("Running benchmark " + name)
+        report["results"][name] = benchmarks[name](config)
+        result = report["results"][name]
+        if "wall_time" in result:
+            print("\tWall time " + str(round(result["wall_time"], 4)) + " s", end="")
+            if "speedup" in result:
+                print(", speed-up " + str(round(result["speedup"], 1)) + ", max error " + str(result["max_error"]),
+                      end="")
+            print("")
+        else:
+            for cpus, cpu_result in result["cpus"].items():
+                print("\t" + cpus + " cpus: wall time " + str(round(cpu_result["wall_time"], 4)) + " s")
+    return report
+
+
+def compare_reports(report, old_report):
+    """
+    Prints the ratio between the wall times in report and old_report for the benchmarks that are in both reports
+    """
+    print("Wall time relative to " + str(old_report.get("revision")))
+    for name, result in report["results"].items():
+        old_result = old_report["results"].get(name)
+        if old_result is None:
+            continue
+        if "wall_time" in result:
+            pairs = [(name, result, old_result)]
+        else:
+            pairs = [(name + " " + cpus + " cpus", cpu_result, old_result["cpus"][cpus])
+                     for cpus, cpu_result in result["cpus"].items() if cpus in old_result["cpus"]]
+        for label, new, old in pairs:
+            print("\t" + label + ": " + str(round(new["wall_time"]/old["wall_time"], 3)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks of the fatigue and weakest-link kernels using synthetic "
+                                                 "stress histories, meshes and hardness fields")
+    parser.add_argument("--benchmarks", nargs="+", choices=list(benchmarks), help="Benchmarks to run, default all")
+    parser.add_argument("--points", type=int, default=2000, help="Number of points in the stress histories")
+    parser.add_argument("--time_steps", type=int, default=4, help="Number of time steps in the stress histories")
+    parser.add_argument("--elements", type=int, default=1000, help="Number of elements in the synthetic mesh")
+    parser.add_argument("--search_grid", type=float, default=10, help="Angle increment for the Findley criterion")
+    parser.add_argument("--material", default="SS2506")
+    parser.add_argument("--reference_points", type=int, default=20,
+                        help="Number of points evaluated by the reference implementations")
+    parser.add_argument("--cycle_levels", type=int, default=10,
+                        help="Number of cycle counts in the weakest-link benchmark")
+    parser.add_argument("--cpus", type=int, nargs="+", default=[1, 2, 4],
+                        help="Numbers of cpus in the scaling benchmark")
+    parser.add_argument("--shared_memory", action="store_true", help="Use shared memory in the scaling benchmark")
+    parser.add_argument("--repeat", type=int, default=3, help="Number of timings, the shortest time is reported")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", type=pathlib.Path, help="json file for the results")
+    parser.add_argument("--compare", type=pathlib.Path, help="json file with results to compare with")
+    args = parser.parse_args()
+
+    config = BenchmarkConfig(args.points, args.time_steps, args.elements, args.search_grid, args.material,
+                             min(args.reference_points, args.points), args.cycle_levels, args.cpus,
+                             args.shared_memory, args.repeat, args.seed)
+    report = run_benchmarks(config, args.benchmarks)
+    if args.output:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        with open(args.output, 'w') as result_file:
+            json.dump(report, result_file, indent=2)
+        print("Results written to " + str(args.output))
+    if args.compare:
+        try:
+            with open(args.compare, 'r') as old_result_file:
+                compare_reports(report, json.load(old_result_file))
+        except (OSError, ValueError) as e:
+            print("Problems when reading the results in " + str(args.compare))
+            print(e)
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
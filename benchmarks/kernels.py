@@ -0,0 +1,170 @@
+"""
+Benchmarks of the computational kernels. Each benchmark times the optimized kernel on the full synthetic problem and
+compares it with the reference implementation in benchmarks.references on a subset of the points
+"""
+import tempfile
+import time
+
+import numpy as np
+
+from fat_eval.fatigue_materials import materials
+from fat_eval.multiaxial_fatigue.evaluation import evaluate_effective_stress
+from fat_eval.multiaxial_fatigue.findley import Findley, findley, smallest_enclosing_circles
+from fat_eval.multiaxial_fatigue.haigh import haigh
+from fat_eval.utilities.odb_cache import OdbFieldCache
+from fat_eval.weakest_link.FEM_functions.mesh import Mesh
+from fat_eval.weakest_link.probabilistic_sn_curve import calculate_lives
+from fat_eval.weakest_link.weakest_link_evaluator import WeakestLinkEvaluator
+
+from benchmarks import references
+from benchmarks.synthetic_data import synthetic_mesh, synthetic_steel_data, synthetic_stress_history
+from benchmarks.synthetic_data import synthetic_weakest_link_stress
+
+
+def time_function(func, repeat=1):
+    """
+    Calls func repeat times
+    :return:    the value returned by the last call and the shortest wall time in seconds
+    """
+    times = []
+    value = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        value = func()
+        times.append(time.perf_counter() - start)
+    return value, min(times)
+
+
+def _result(wall_time, points, reference_time=None, reference_points=None, max_error=None, **data):
+    result = {"wall_time": wall_time, "points": points, "points_per_second": points/wall_time if wall_time else None}
+    if reference_time is not None:
+        result["reference_time"] = reference_time
+        result["reference_points"] = reference_points
+        result["max_error"] = float(max_error)
+        # Speed-up per point, the reference is only evaluated for a subset of the points
+        result["speedup"] = (reference_time/reference_points)/(wall_time/points) if wall_time else None
+    result.update(data)
+    return result
+
+
+def benchmark_findley(config):
+    stress_history = synthetic_stress_history(config.points, config.time_steps, config.seed)
+    k = materials[config.material].findley_k(synthetic_steel_data(config.points, config.seed))
+    sf, wall_time = time_function(lambda: findley(stress_history, k, config.search_grid), config.repeat)
+    n = config.reference_points
+    reference, reference_time = time_function(
+        lambda: references.reference_findley(stress_history[:, :n, :], k[:n], config.search_grid))
+    return _result(wall_time, config.points, reference_time, n, np.max(np.abs(sf[:n] - reference)),
+                   search_grid=config.search_grid)
+
+
+def benchmark_haigh(config):
+    stress_history = synthetic_stress_history(config.points, config.time_steps, config.seed)
+    k = materials[config.material].mean_stress_sensitivity(synthetic_steel_data(config.points, config.seed))
+    sh, wall_time = time_function(lambda: haigh(stress_history, k), config.repeat)
+    n = config.reference_points
+    reference, reference_time = time_function(lambda: references.reference_haigh(stress_history[:, :n, :], k[:n]))
+    return _result(wall_time, config.points, reference_time, n, np.max(np.abs(sh[:n] - reference)))
+
+
+def benchmark_smallest_enclosing_circle(config):
+    stress_history = synthetic_stress_history(config.points, config.time_steps, config.seed)
+    xp = stress_history[:, :, 3].T
+    yp = stress_history[:, :, 4].T
+    (_, _, radii), wall_time = time_function(lambda: smallest_enclosing_circles(xp, yp), config.repeat)
+    n = config.reference_points
+    reference, reference_time = time_function(lambda: references.reference_smallest_enclosing_circles(xp[:n],
+                                                                                                      yp[:n]))
+    return _result(wall_time, config.points, reference_time, n, np.max(np.abs(radii[:n] - reference)))
+
+
+def benchmark_weakest_link_setup(config):
+    """
+    The setup of the evaluator from element data and hardness, i.e. setup_weakest_link_evaluator without reading the
+    odb files, and loading the evaluator from a snapshot in the odb cache
+    """
+    element_data, element_labels = synthetic_mesh(config.elements, config.seed)
+    steel_data = synthetic_steel_data(element_labels.shape[0], config.seed)
+    evaluator, wall_time = time_function(
+        lambda: WeakestLinkEvaluator(Mesh.from_element_data(element_data), element_labels, steel_data),
+        config.repeat)
+    with tempfile.TemporaryDirectory() as directory:
+        cache = OdbFieldCache(directory)
+        cache.store("snapshot", evaluator.snapshot())
+        _, snapshot_time = time_function(lambda: WeakestLinkEvaluator.from_snapshot(cache.load("snapshot")),
+                                         config.repeat)
+
+    reference, reference_time = time_function(
+        lambda: references.reference_integration_weights(references.reference_elements(element_data), element_labels))
+    error = np.max(np.abs(evaluator.integration_weights - reference))
+    return _result(wall_time, element_labels.shape[0], reference_time, element_labels.shape[0], error,
+                   elements=config.elements, snapshot_load_time=snapshot_time)
+
+
+def _weakest_link_problem(config):
+    element_data, element_labels = synthetic_mesh(config.elements, config.seed)
+    steel_data = synthetic_steel_data(element_labels.shape[0], config.seed)
+    stress = synthetic_weakest_link_stress(element_labels.shape[0], config.seed)
+    evaluator = WeakestLinkEvaluator(Mesh.from_element_data(element_data), element_labels, steel_data,
+                                     symmetry_factor=4)
+    return element_data, element_labels, steel_data, stress, evaluator
+
+
+def benchmark_weakest_link_evaluate(config):
+    element_data, element_labels, steel_data, stress, evaluator = _weakest_link_problem(config)
+    cycles = np.logspace(4, 8, config.cycle_levels)
+    pf, wall_time = time_function(lambda: [evaluator.evaluate(stress, config.material, cycles=n) for n in cycles],
+                                  config.repeat)
+    pf_many, many_time = time_function(lambda: evaluator.evaluate_many(stress, config.material, cycles),
+                                       config.repeat)
+    elements = references.reference_elements(element_data)
+    reference, reference_time = time_function(
+        lambda: [references.reference_pf(elements, element_labels, steel_data, 4, stress, config.material, n)
+                 for n in cycles])
+    error = max(np.max(np.abs(np.array(pf) - reference)), np.max(np.abs(pf_many - reference)))
+    points = element_labels.shape[0]*cycles.shape[0]
+    return _result(wall_time, points, reference_time, points, error, evaluate_many_time=many_time,
+                   pf_range=[float(np.min(reference)), float(np.max(reference))])
+
+
+def benchmark_calculate_life(config):
+    _, _, _, stress, evaluator = _weakest_link_problem(config)
+    pf_levels = [0.1, 0.5, 0.9]
+    span = [1e3, 1e9]
+    lives, wall_time = time_function(lambda: calculate_lives(stress, evaluator, pf_levels, span, config.material),
+                                     config.repeat)
+    reference, reference_time = time_function(
+        lambda: [references.reference_life(stress, evaluator, pf, span, config.material) for pf in pf_levels])
+    error = np.max(np.abs(np.log(lives) - np.log(reference)))
+    return _result(wall_time, len(pf_levels), reference_time, len(pf_levels), error, error_measure="log(N)")
+
+
+def benchmark_cpu_scaling(config):
+    """
+    Wall time of the Findley evaluation through evaluate_effective_stress for the numbers of cpus in config.cpus
+    """
+    stress_history = synthetic_stress_history(config.points, config.time_steps, config.seed)
+    steel_data = synthetic_steel_data(config.points, config.seed)
+    results = {}
+    serial = None
+    for cpus in config.cpus:
+        s, wall_time = time_function(
+            lambda: evaluate_effective_stress(stress_history, config.material, Findley.evaluate, cpus,
+                                              search_grid=config.search_grid, shared_memory=config.shared_memory,
+                                              **steel_data.data),
+            config.repeat)
+        if serial is None:
+            serial = s
+        results[str(cpus)] = _result(wall_time, config.points, max_deviation=float(np.max(np.abs(s - serial))))
+    return {"cpus": results, "shared_memory": config.shared_memory}
+
+
+benchmarks = {
+    "findley": benchmark_findley,
+    "haigh": benchmark_haigh,
+    "smallest_enclosing_circle": benchmark_smallest_enclosing_circle,
+    "weakest_link_setup": benchmark_weakest_link_setup,
+    "weakest_link_evaluate": benchmark_weakest_link_evaluate,
+    "calculate_life": benchmark_calculate_life,
+    "cpu_scaling": benchmark_cpu_scaling
+}
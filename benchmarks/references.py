@@ -0,0 +1,93 @@
+"""
+Straightforward implementations of the kernels, point by point, used to check the accuracy of the optimized kernels
+"""
+from collections import defaultdict
+
+import numpy as np
+
+from fat_eval.fatigue_materials import materials
+from fat_eval.multiaxial_fatigue.findley import get_transform_matrix, smallest_enclosing_circle
+from fat_eval.multiaxial_fatigue.haigh import stress_tensors
+from fat_eval.weakest_link.FEM_functions.elements import element_types
+from fat_eval.weakest_link.hazard_functions import weibull
+
+
+def reference_findley(stress_history, k, search_grid):
+    findley_vec = np.zeros((stress_history.shape[1], 1)) - 1e6
+    for theta in np.arange(0, 180 + search_grid, search_grid):
+        for phi in np.arange(-90, 90 + search_grid, search_grid):
+            q = get_transform_matrix(theta, phi)
+            for j in range(stress_history.shape[1]):
+                s_prim = np.dot(stress_history[:, j, :], q.T)
+                _, _, tau = smallest_enclosing_circle(s_prim[:, 3], s_prim[:, 4])
+                findley_vec[j, 0] = max(findley_vec[j, 0], tau + k[j]*s_prim[:, 0].max())
+    return findley_vec
+
+
+def reference_haigh(stress_history, mean_stress_sensitivities):
+    tensors = stress_tensors(stress_history)
+    effective_stress = np.zeros(stress_history.shape[1])
+    for i, mean_stress_k in enumerate(mean_stress_sensitivities):
+        s_max = []
+        directions = []
+        for j in range(stress_history.shape[0]):
+            eigen_vals, eigen_dirs = np.linalg.eigh(tensors[j, i])
+            s_max.append(eigen_vals[-1])
+            directions.append(eigen_dirs[:, -1])
+        max_inc = np.argmax(s_max)
+        n = directions[max_inc]
+        s_min = min(np.dot(np.dot(n, tensors[j, i]), n) for j in range(stress_history.shape[0]) if j != max_inc)
+        effective_stress[i] = (s_max[max_inc] - s_min)/2 + mean_stress_k*(s_max[max_inc] + s_min)/2
+    return effective_stress
+
+
+def reference_smallest_enclosing_circles(xp, yp):
+    return np.array([smallest_enclosing_circle(x, y)[2] for x, y in zip(xp, yp)])
+
+
+def reference_elements(element_data):
+    return {label: element_types[element_type](coordinates)
+            for element_type, element_coordinates in element_data.items()
+            for label, coordinates in element_coordinates.items()}
+
+
+def reference_integration_weights(elements, element_labels):
+    weights = np.zeros(element_labels.shape[0])
+    gauss_points = defaultdict(int)
+    for i, label in enumerate(element_labels):
+        element = elements[label]
+        j = gauss_points[label]
+        gauss_points[label] += 1
+        weights[i] = element.gauss_weights[j]*element.gauss_point_volumes[j]
+    return weights
+
+
+def reference_pf(elements, element_labels, steel_data, symmetry_factor, stress_state, material_name, cycles=2e6):
+    functional_values = weibull(stress_state, steel_data, materials[material_name], cycles=cycles)
+    values_dict = defaultdict(list)
+    for s, label in zip(functional_values, element_labels):
+        values_dict[label].append(s)
+    integral = 0
+    for e_label, values in values_dict.items():
+        element = elements[e_label]
+        for vol, w, val in zip(element.gauss_point_volumes, element.gauss_weights, values):
+            integral += val*w*vol
+    pf = 1 - np.exp(-integral)
+    return 1 - (1 - pf)**symmetry_factor
+
+
+def reference_life(stress_state, evaluator, pf, span, material):
+    def calculate_pf(cycles):
+        return evaluator.evaluate(stress_state, material, cycles=np.exp(cycles)) - pf
+
+    n1 = np.log(span[0])
+    n2 = np.log(span[1])
+    n = (n1 + n2)/2
+    while abs(n2 - n1) > 1e-3:
+        f = calculate_pf(n)
+        if calculate_pf(n1)*f < 0:
+            n2 = n
+        else:
+            n1 = n
+        n = (n1 + n2)/2
+    return np.exp(n)
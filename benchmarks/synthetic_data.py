@@ -0,0 +1,57 @@
+import numpy as np
+
+from fat_eval.utilities.steel_data import SteelData
+
+unit_cube = np.array([[0, 0, 0], [1, 0, 0], [1, 1, 0], [0, 1, 0],
+                      [0, 0, 1], [1, 0, 1], [1, 1, 1], [0, 1, 1]], dtype=float)
+
+
+def synthetic_stress_history(points, time_steps, seed=0):
+    """
+    Random stress history, a static stress with cyclic stresses superposed, with values similar to a case hardened
+    component
+    :return:    numpy array with shape (time_steps, points, 6)
+    """
+    rng = np.random.RandomState(seed)
+    static_stress = 200*rng.randn(1, points, 6)
+    return static_stress + 400*rng.randn(time_steps, points, 6)
+
+
+def synthetic_hardness(points, seed=0):
+    """
+    Hardness field in HRC with a smooth variation, like a carburized case, and small random fluctuations
+    """
+    rng = np.random.RandomState(seed)
+    return 56 + 6*np.sin(np.linspace(0, np.pi, points)) + 0.2*rng.randn(points)
+
+
+def synthetic_steel_data(points, seed=0):
+    return SteelData({"SDV_HARDNESS": synthetic_hardness(points, seed)})
+
+
+def synthetic_mesh(elements, seed=0):
+    """
+    Distorted hexahedral elements with every fourth element of type C3D8R and the rest of type C3D8
+    :return:    element data on the form given by ABQInterface.get_element_data and the element label of each
+                integration point
+    """
+    rng = np.random.RandomState(seed)
+    element_data = {"C3D8": {}, "C3D8R": {}}
+    element_labels = []
+    for label in range(1, elements + 1):
+        coordinates = unit_cube*(1 + rng.rand(3)) + 0.1*rng.randn(8, 3) + rng.rand(3)*10
+        if label % 4:
+            element_data["C3D8"][label] = coordinates
+            element_labels.extend([label]*8)
+        else:
+            element_data["C3D8R"][label] = coordinates
+            element_labels.append(label)
+    return element_data, np.array(element_labels)
+
+
+def synthetic_weakest_link_stress(points, seed=0):
+    """
+    Effective stress field giving a probability of failure between 0 and 1 for typical mesh sizes
+    """
+    rng = np.random.RandomState(seed)
+    return 300 + 60*rng.rand(points)
@@ -1,35 +1,44 @@
 import numpy as np
 
+from fat_eval.fatigue_materials.material_fields import material_field
+
+# Number of cycles where the exponent b of the SN-curve changes, the material parameters are smooth in between
+cycle_breakpoints = [1e5]
+
+# Material parameters as functions of the Vickers hardness, the fields are computed once per SteelData object
+hardness_fields = {
+    "sth": lambda HV: 0*HV,
+    "m": lambda HV: 11.5719e6/HV**2,
+    "sw": lambda HV: 158.7 + 0.481538*HV,
+    "mean_stress_sensitivity": lambda HV: HV/1000,
+    "findley_k": lambda HV: 0.017 + 8.27e-4*HV,
+    "critical_findley_stress": lambda HV: 197.75 + 0.56833*HV
+}
+
 
 def sth(steel_data, effective_stress):
-    return 0*steel_data.HV
+    return material_field(steel_data, "SS2506", "sth")
 
 
 def m(steel_data, effective_stress, N=2e6):
-    m = 11.5719e6/steel_data.HV**2
-    if N < 1e5:
-        b = 5
-    else:
-        b = 28
+    m = material_field(steel_data, "SS2506", "m")
+    b = np.where(np.asarray(N) < 1e5, 5, 28)
     return m*(N/1e5)**(-1/b)*(2e6/1e5)**(1/28)
 
 
 def mean_stress_sensitivity(steel_data):
-    return np.array(steel_data.HV)/1000
+    return material_field(steel_data, "SS2506", "mean_stress_sensitivity")
 
 
 def findley_k(steel_data):
-    return 0.017 + 8.27e-4*steel_data.HV
+    return material_field(steel_data, "SS2506", "findley_k")
 
 
 def critical_findley_stress(steel_data):
-    return 197.75 + 0.56833*steel_data.HV
+    return material_field(steel_data, "SS2506", "critical_findley_stress")
 
 
 def sw(steel_data, effective_stress, N=2e6):
-    if N < 1e5:
-        b = 5
-    else:
-        b = 28
-    sw = 158.7 + 0.481538*steel_data.HV
+    b = np.where(np.asarray(N) < 1e5, 5, 28)
+    sw = material_field(steel_data, "SS2506", "sw")
     return sw*(N/1e5)**(-1/b)*(2e6/1e5)**(1/28)
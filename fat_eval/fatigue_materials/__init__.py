@@ -1,2 +1,5 @@
+from fat_eval.fatigue_materials.material_fields import materials, material_field, precompute_material_fields
+from fat_eval.fatigue_materials.material_fields import register_material
 from fat_eval.fatigue_materials import SS2506
-materials = {"SS2506": SS2506}
+
+register_material("SS2506", SS2506)
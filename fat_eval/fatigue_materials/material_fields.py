@@ -0,0 +1,56 @@
+import numpy as np
+
+materials = {}
+_hardness_fields = {}
+
+
+def register_material(name, material, hardness_fields=None, table_size=None):
+    """
+    Registers a material so that it can be used by name in the fatigue criteria and the weakest-link evaluation
+    :param name:            name of the material as used in the input files
+    :param material:        module or object with the material functions, like findley_k(steel_data)
+    :param hardness_fields: dict with functions of the Vickers hardness HV giving the material parameter fields,
+                            default is the attribute hardness_fields of material. The fields are computed once for
+                            each SteelData object and accessed by the material functions with material_field
+    :param table_size:      If given, the hardness fields are evaluated at table_size hardness values between the
+                            smallest and largest hardness and interpolated linearly, intended for expensive material
+                            laws. Default is the attribute hardness_table_size of material
+    """
+    if hardness_fields is None:
+        hardness_fields = getattr(material, "hardness_fields", {})
+    if table_size is None:
+        table_size = getattr(material, "hardness_table_size", None)
+    materials[name] = material
+    _hardness_fields[name] = (hardness_fields, table_size)
+
+
+def material_field(steel_data, material_name, field_name):
+    """
+    The hardness field field_name of the material at the points of steel_data, memoized in steel_data. Objects
+    without memoization, only providing the hardness HV, get the field computed at each call
+    """
+    def evaluate():
+        return _evaluate_hardness_field(steel_data.HV, *_hardness_fields[material_name], field_name=field_name)
+
+    cached = getattr(steel_data, "cached", None)
+    if cached is None:
+        return evaluate()
+    return cached((material_name, field_name), evaluate)
+
+
+def precompute_material_fields(steel_data, material_name):
+    """
+    Computes all hardness fields of a material for steel_data, for instance before the steel data is shared by
+    forked worker processes
+    """
+    for field_name in _hardness_fields[material_name][0]:
+        material_field(steel_data, material_name, field_name)
+
+
+def _evaluate_hardness_field(hv, hardness_fields, table_size, field_name):
+    function = hardness_fields[field_name]
+    hv = np.asarray(hv, dtype=float)
+    if table_size is None or hv.size <= table_size:
+        return function(hv)
+    hv_table = np.linspace(hv.min(), hv.max(), table_size)
+    return np.interp(hv, hv_table, function(hv_table))
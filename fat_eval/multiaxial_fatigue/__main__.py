@@ -6,13 +6,19 @@ from collections import namedtuple
 
 from abaqus_python_interface import OdbReadingError
 
-from fat_eval.multiaxial_fatigue.fatigue_analysis import perform_fatigue_analysis
+from fat_eval.multiaxial_fatigue.distributed import authkey_variable, Coordinator, parse_address
+from fat_eval.multiaxial_fatigue.fatigue_analysis import fatigue_analysis_stages, perform_fatigue_analysis
+from fat_eval.multiaxial_fatigue.scheduling import schedulers
 from fat_eval.utilities.input_file_functions import FatigueFileReadingError, read_input_file, OdbData
+from fat_eval.utilities.checkpoint import CheckpointMismatchError
+from fat_eval.utilities.executors import executors, parse_stage_executor
 from fat_eval.utilities.input_file_functions import argparse_check_path
+from fat_eval.utilities.profiling import Profiler
 
 FatigueAnalysisData = namedtuple("FatigueAnalysisData", ["abaqus", "effective_stress", "material", "cyclic_stresses",
                                                          "static_stresses", "output_data", "heat_treatment",
-                                                         "copy_odb", "stress_history_data"])
+                                                         "copy_odb", "stress_history_data", "search_grid",
+                                                         "tolerance"])
 
 
 def parse_fatigue_file(fatigue_file):
@@ -37,6 +43,12 @@ def parse_fatigue_file(fatigue_file):
     abq = read_mandatory_parameter(keywords["abaqus"][0], "abq")
     effective_stress = read_mandatory_parameter(keywords["effective_stress"][0], "criterion")
     material = read_mandatory_parameter(keywords["effective_stress"][0], "material")
+    search_grid = keywords["effective_stress"][0].parameters.get("search_grid", None)
+    if search_grid is not None:
+        search_grid = float(search_grid)
+    tolerance = keywords["effective_stress"][0].parameters.get("tolerance", None)
+    if tolerance is not None:
+        tolerance = float(tolerance)
     cyclic_stresses = [OdbData(stress_step) for stress_step in keywords["cyclic_stress"]]
     static_stresses = [OdbData(stress_step) for stress_step in keywords["static_stress"]]
     output_data = [OdbData(output) for output in keywords["write_to_odb"]]
@@ -51,7 +63,7 @@ def parse_fatigue_file(fatigue_file):
         copy_odb = None
 
     return FatigueAnalysisData(abq, effective_stress, material, cyclic_stresses, static_stresses, output_data,
-                               heat_treatment, copy_odb, stress_history_data)
+                               heat_treatment, copy_odb, stress_history_data, search_grid, tolerance)
 
 
 def main():
@@ -59,19 +71,86 @@ def main():
     parser.add_argument("input_file", type=argparse_check_path,
                         help="Path to the file defining the fatigue evaluation")
     parser.add_argument("--cpus", type=int, help="Number of cpu cores used for the simulations")
+    parser.add_argument("--scheduler", choices=schedulers, default="static",
+                        help="How the points are distributed over the cpus, static splits the points into one equal "
+                             "slice per cpu and dynamic evaluates many small chunks taken from a shared queue by the "
+                             "worker processes, which balances points with different evaluation times")
+    parser.add_argument("--executor", type=parse_stage_executor, action="append",
+                        help="Backend running the jobs of a stage of the analysis, given as stage=backend with the "
+                             "stages " + ", ".join(fatigue_analysis_stages) + " and the backends "
+                             + ", ".join(executors) + ". Can be given once per stage, default is process")
+    parser.add_argument("--executor_timeout", type=float,
+                        help="Time in seconds allowed for the jobs of a stage, also for the evaluations by the "
+                             "dynamic scheduler and by the workers of a coordinator")
+    parser.add_argument("--shared_memory", action="store_true",
+                        help="Share the stress history and results with the worker processes through shared memory "
+                             "instead of sending copies to each process")
+    parser.add_argument("--chunk_size", type=int,
+                        help="Number of integration points evaluated at a time, limits the memory usage for large "
+                             "models. The fields are only read one chunk at a time from the odb cache, with --no_cache "
+                             "the complete fields are still read into memory")
+    parser.add_argument("--coordinator", type=parse_address,
+                        help="host:port where a coordinator listens for worker processes evaluating the criterion, "
+                             "workers on other hosts are started by python -m fat_eval.multiaxial_fatigue.distributed "
+                             "host:port with the same environment variable " + authkey_variable + " as the analysis")
+    parser.add_argument("--local_workers", type=int, default=0,
+                        help="Number of worker processes started on this host when using a coordinator")
+    parser.add_argument("--no_cache", action="store_true",
+                        help="Read all fields from the odb files instead of using previously extracted fields")
+    parser.add_argument("--odb_server", action="store_true",
+                        help="Read and write the odb files through one long-lived Abaqus python process that keeps "
+                             "the odb files open, instead of starting Abaqus python for each read and write")
+    parser.add_argument("--checkpoint_directory", type=pathlib.Path,
+                        help="Write the effective stress of each evaluated chunk of points, see --chunk_size, to a "
+                             "checkpoint in this directory. The checkpoint is removed when the analysis is completed")
+    parser.add_argument("--resume", action="store_true",
+                        help="Resume an interrupted analysis by only evaluating the chunks of points missing in the "
+                             "checkpoint given by --checkpoint_directory")
+    parser.add_argument("--profile", type=pathlib.Path,
+                        help="Write a json report with wall time, cpu time, memory usage, data sent to the worker "
+                             "processes and throughput of each phase of the analysis to this file")
+    parser.add_argument("--cprofile_directory", type=pathlib.Path,
+                        help="Dump cProfile statistics of the criterion evaluations, also in the worker processes, "
+                             "to this directory")
     args = parser.parse_args()
+    stage_executors = dict(args.executor or [])
+    if set(stage_executors) - set(fatigue_analysis_stages):
+        parser.error("Valid stages for --executor are " + ", ".join(fatigue_analysis_stages))
+    if (args.coordinator or args.local_workers) and "evaluate" in stage_executors:
+        parser.error("--executor evaluate=... can not be combined with --coordinator or --local_workers, the criterion "
+                     "is evaluated by the workers of the coordinator")
+    if args.resume and args.checkpoint_directory is None:
+        parser.error("--resume needs the --checkpoint_directory of the interrupted analysis")
     try:
         fatigue_analysis_data = parse_fatigue_file(args.input_file)
     except FatigueFileReadingError as e:
         print("Problems when reading the file" + str(args.input_file))
         print(e)
         sys.exit(1)
+    profiler = Profiler(args.cprofile_directory, enabled=args.profile is not None)
+    coordinator = None
+    if args.coordinator or args.local_workers:
+        coordinator = Coordinator(args.coordinator or ("localhost", 0))
+        print("Coordinator listening for workers at " + ":".join(str(part) for part in coordinator.address))
+        coordinator.start_local_workers(args.local_workers)
     try:
-        perform_fatigue_analysis(fatigue_analysis_data, cpus=args.cpus)
+        perform_fatigue_analysis(fatigue_analysis_data, cpus=args.cpus, shared_memory=args.shared_memory,
+                                 use_cache=not args.no_cache, chunk_size=args.chunk_size, profiler=profiler,
+                                 odb_server=args.odb_server, checkpoint_directory=args.checkpoint_directory,
+                                 resume=args.resume, coordinator=coordinator, scheduler=args.scheduler,
+                                 executors=stage_executors, executor_timeout=args.executor_timeout)
     except OdbReadingError as e:
         print("Problems when reading odb files when performing fatigue analysis")
         print(e)
         sys.exit(1)
+    except CheckpointMismatchError as e:
+        print(e)
+        sys.exit(1)
+    finally:
+        if coordinator is not None:
+            coordinator.close()
+        if args.profile:
+            profiler.write_report(args.profile)
 
 
 if __name__ == '__main__':
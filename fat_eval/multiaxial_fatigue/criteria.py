@@ -1,5 +1,5 @@
-from fat_eval.multiaxial_fatigue.haigh import haigh
+from fat_eval.multiaxial_fatigue.haigh import haigh, Haigh
 from fat_eval.multiaxial_fatigue.findley import findley, Findley
 
 
-criteria = {'Findley': Findley}
+criteria = {'Findley': Findley, 'Haigh': Haigh}
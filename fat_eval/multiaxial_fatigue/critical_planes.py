@@ -0,0 +1,132 @@
+from functools import lru_cache
+
+import numpy as np
+
+
+def get_transform_matrices(theta_deg, phi_deg):
+    """
+    Vectorized version of fat_eval.multiaxial_fatigue.findley.get_transform_matrix
+    :param theta_deg:   numpy array with theta angles in degrees
+    :param phi_deg:     numpy array with phi angles in degrees, same shape as theta_deg
+    :return:            numpy array with shape theta_deg.shape + (6, 6)
+    """
+    theta_r = np.pi*np.asarray(theta_deg, dtype=float)/180.0
+    phi_r = np.pi*np.asarray(phi_deg, dtype=float)/180.0
+
+    # Multiaxial fatigue, Marquis, Eq 1.3 & 1.5
+    a11 = np.cos(theta_r) * np.sin(phi_r)
+    a12 = np.sin(theta_r) * np.sin(phi_r)
+    a13 = np.cos(phi_r)
+    a21 = -np.sin(theta_r)
+    a22 = np.cos(theta_r)
+    a23 = 0*theta_r
+    a31 = -np.cos(theta_r) * np.cos(phi_r)
+    a32 = -np.sin(theta_r) * np.cos(phi_r)
+    a33 = np.sin(phi_r)
+
+    rows = [[a11**2, a12**2, a13**2, 2*a11*a12, 2*a11*a13, 2*a13*a12],
+            [a21**2, a22**2, a23**2, 2*a21*a22, 2*a21*a23, 2*a23*a22],
+            [a31**2, a32**2, a33**2, 2*a31*a32, 2*a31*a33, 2*a33*a32],
+            [a11*a21, a12*a22, a13*a23, a11*a22 + a12*a21, a13*a21 + a11*a23, a12*a23 + a13*a22],
+            [a11*a31, a12*a32, a13*a33, a11*a32 + a12*a31, a13*a31 + a11*a33, a13*a32 + a12*a33],
+            [a21*a31, a22*a32, a23*a33, a21*a32 + a22*a31, a23*a31 + a21*a33, a22*a33 + a23*a32]]
+    return np.stack([np.stack(row, axis=-1) for row in rows], axis=-2)
+
+
+def normal_vectors(theta_deg, phi_deg):
+    """
+    The normal vectors of the planes given by the angles theta and phi, i.e. the first row of the rotation matrix used
+    in get_transform_matrices
+    :param theta_deg:   numpy array with theta angles in degrees
+    :param phi_deg:     numpy array with phi angles in degrees, same shape as theta_deg
+    :return:            numpy array with shape theta_deg.shape + (3, )
+    """
+    theta_r = np.pi*np.asarray(theta_deg, dtype=float)/180.0
+    phi_r = np.pi*np.asarray(phi_deg, dtype=float)/180.0
+    return np.stack([np.cos(theta_r)*np.sin(phi_r), np.sin(theta_r)*np.sin(phi_r), np.cos(phi_r)], axis=-1)
+
+
+def _unique_planes(theta, phi):
+    # Planes with the normals n and -n are the same plane, the normals are therefore flipped so that the first
+    # non-zero component is positive before removing duplicates. The order of the first occurrences is kept
+    normals = normal_vectors(theta, phi)
+    normals[np.abs(normals) < 1e-12] = 0.
+    first_non_zero = np.argmax(normals != 0, axis=1)
+    sign = np.sign(normals[np.arange(normals.shape[0]), first_non_zero])
+    normals = np.round(normals*sign[:, None], 9) + 0.
+    _, idx = np.unique(normals, axis=0, return_index=True)
+    idx = np.sort(idx)
+    return theta[idx], phi[idx]
+
+
+def _grid_planes(resolution):
+    theta, phi = np.meshgrid(np.arange(0, 180 + resolution, resolution),
+                             np.arange(-90, 90 + resolution, resolution), indexing='ij')
+    return _unique_planes(theta.flatten(), phi.flatten())
+
+
+def _sphere_planes(resolution):
+    # Fibonacci lattice on the upper half sphere with approximately one point per resolution x resolution area
+    points = int(np.ceil(2*np.pi/(np.pi*resolution/180)**2))
+    i = np.arange(points) + 0.5
+    phi = np.arccos(1 - i/points)
+    theta = np.pi*(1 + 5**0.5)*i
+    theta = np.mod(theta, 2*np.pi)
+    return 180*theta/np.pi, 180*phi/np.pi
+
+
+sampling_methods = {"grid": _grid_planes, "sphere": _sphere_planes}
+
+
+def plane_angles(resolution, sampling="grid"):
+    """
+    The planes evaluated by the critical plane search, with duplicated planes removed. The arrays are computed once
+    per resolution and sampling method and are read only
+    :param resolution:  angle increment in degrees between the planes
+    :param sampling:    "grid" for a regular grid in theta and phi or "sphere" for near uniform sampling of the normals
+    :return:            theta and phi in degrees as two numpy arrays with shape (planes, )
+    """
+    return _plane_angles(float(resolution), sampling)
+
+
+@lru_cache(maxsize=None)
+def _plane_angles(resolution, sampling):
+    try:
+        theta, phi = sampling_methods[sampling](resolution)
+    except KeyError:
+        raise ValueError("The plane sampling method " + str(sampling) + " is not supported, valid methods are "
+                         + ", ".join(sampling_methods))
+    theta.flags.writeable = False
+    phi.flags.writeable = False
+    return theta, phi
+
+
+def plane_normals(resolution, sampling="grid"):
+    """
+    The normal vectors of the planes given by plane_angles, computed once per resolution and sampling method
+    :return:    read only numpy array with shape (planes, 3)
+    """
+    return _plane_normals(float(resolution), sampling)
+
+
+@lru_cache(maxsize=None)
+def _plane_normals(resolution, sampling):
+    normals = normal_vectors(*plane_angles(resolution, sampling))
+    normals.flags.writeable = False
+    return normals
+
+
+def plane_transform_matrices(resolution, sampling="grid"):
+    """
+    The stacked transformation matrices of the planes given by plane_angles, computed once per resolution and sampling
+    method
+    :return:    read only numpy array with shape (planes, 6, 6)
+    """
+    return _plane_transform_matrices(float(resolution), sampling)
+
+
+@lru_cache(maxsize=None)
+def _plane_transform_matrices(resolution, sampling):
+    matrices = get_transform_matrices(*plane_angles(resolution, sampling))
+    matrices.flags.writeable = False
+    return matrices
@@ -0,0 +1,297 @@
+"""
+Distributed evaluation of fatigue criteria. A Coordinator splits the stress history into chunks of points and serves
+them to worker processes over sockets, the workers can run on other hosts or as local processes. A worker is started
+on another host by
+    FAT_EVAL_AUTHKEY=<key> python -m fat_eval.multiaxial_fatigue.distributed <coordinator host>:<port>
+where the authentication key is the same as for the coordinator
+"""
+import argparse
+import multiprocessing
+import os
+import pickle
+import queue
+import sys
+import threading
+import time
+import traceback
+
+from multiprocessing.connection import Client, Listener
+
+import numpy as np
+
+authkey_variable = "FAT_EVAL_AUTHKEY"
+
+
+class DistributedEvaluationError(RuntimeError):
+    pass
+
+
+def parse_address(address):
+    """
+    Converts an address "host:port" to a tuple (host, port)
+    """
+    host, _, port = str(address).rpartition(":")
+    return host, int(port)
+
+
+def default_authkey():
+    """
+    The authentication key given by the environment variable FAT_EVAL_AUTHKEY or a random key, which can only be
+    used by local workers
+    """
+    authkey = os.environ.get(authkey_variable)
+    if authkey is None:
+        return os.urandom(16)
+    return authkey.encode()
+
+
+class _DistributedJob:
+    def __init__(self, criterion, stress_history, steel_data, kw_args, chunks):
+        self.criterion = criterion
+        self.stress_history = stress_history
+        self.steel_data = steel_data
+        self.kw_args = kw_args
+        self.chunks = chunks
+        self.results = [None]*len(chunks)
+        self.remaining = len(chunks)
+        self.error = None
+        self.done = threading.Event()
+        self.lock = threading.Lock()
+
+    def message(self, index):
+        start, stop = self.chunks[index]
+        return ("evaluate", index, self.criterion, self.stress_history[:, start:stop, :],
+                self.steel_data[start:stop], self.kw_args)
+
+    def complete(self, index, result):
+        with self.lock:
+            if self.results[index] is None:
+                self.results[index] = result
+                self.remaining -= 1
+            if self.remaining == 0:
+                self.done.set()
+
+    def fail(self, error):
+        with self.lock:
+            if self.error is None:
+                self.error = error
+            self.done.set()
+
+
+class Coordinator:
+    """
+    Serves chunks of points to worker processes connecting to address and gathers the results. A chunk sent to a
+    worker that is lost, i.e. the connection is closed or no result is received within timeout seconds, is sent to
+    another worker. Workers can connect at any time, also during an evaluation
+    """
+    def __init__(self, address=("", 0), authkey=None, chunk_size=1000, retries=3, timeout=None, worker_wait=300.,
+                 evaluation_timeout=None):
+        """
+        :param address:             (host, port) where the coordinator listens for workers, port 0 selects a free
+                                    port
+        :param authkey:             authentication key of the connections, default is given by default_authkey
+        :param chunk_size:          number of points in each chunk sent to a worker
+        :param retries:             number of times a lost chunk is sent again before the evaluation fails
+        :param timeout:             time in seconds to wait for the result of a chunk, default is to wait until the
+                                    worker closes the connection
+        :param worker_wait:         time in seconds an evaluation waits while no worker is connected before it fails,
+                                    None waits until a worker connects
+        :param evaluation_timeout:  time in seconds allowed for an evaluation, default is no limit
+        """
+        self.authkey = default_authkey() if authkey is None else authkey
+        self.listener = Listener(address, authkey=self.authkey)
+        self.address = self.listener.address
+        self.chunk_size = chunk_size
+        self.retries = retries
+        self.timeout = timeout
+        self.worker_wait = worker_wait
+        self.evaluation_timeout = evaluation_timeout
+        self.tasks = queue.Queue()
+        self.worker_threads = []
+        self.connected_workers = 0
+        self.workers_lock = threading.Lock()
+        self.local_workers = []
+        self.closed = False
+        threading.Thread(target=self._accept_workers, daemon=True).start()
+
+    def _accept_workers(self):
+        while True:
+            try:
+                connection = self.listener.accept()
+            except (OSError, EOFError, multiprocessing.AuthenticationError):
+                if self.closed:
+                    return
+                continue
+            with self.workers_lock:
+                self.connected_workers += 1
+            thread = threading.Thread(target=self._serve_worker, args=(connection, ), daemon=True)
+            self.worker_threads.append(thread)
+            thread.start()
+
+    def _serve_worker(self, connection):
+        try:
+            self._serve_tasks(connection)
+        finally:
+            with self.workers_lock:
+                self.connected_workers -= 1
+
+    def _serve_tasks(self, connection):
+        while True:
+            task = self.tasks.get()
+            if task is None:
+                try:
+                    connection.send(("stop", ))
+                except OSError:
+                    pass
+                connection.close()
+                return
+            job, index, attempt = task
+            if job.done.is_set():
+                continue
+            try:
+                connection.send(job.message(index))
+                if not self._wait_for_result(connection):
+                    if self.closed:
+                        connection.close()
+                        return
+                    raise TimeoutError("No result within " + str(self.timeout) + " s")
+                status, result_index, result = connection.recv()
+            except (OSError, EOFError, TimeoutError) as e:
+                self._retry(job, index, attempt, e)
+                connection.close()
+                return
+            if status == "error":
+                job.fail(result)
+            else:
+                job.complete(result_index, result)
+
+    def _wait_for_result(self, connection):
+        # Polled in short intervals so that the thread stops waiting for a hung worker when the coordinator is closed
+        deadline = None if self.timeout is None else time.monotonic() + self.timeout
+        while not self.closed:
+            interval = 0.1 if deadline is None else min(0.1, max(deadline - time.monotonic(), 0.))
+            if connection.poll(interval):
+                return True
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+        return False
+
+    def _retry(self, job, index, attempt, error):
+        start, stop = job.chunks[index]
+        if attempt >= self.retries:
+            job.fail(DistributedEvaluationError("The points " + str(start) + " to " + str(stop - 1) + " were lost "
+                                                + str(attempt + 1) + " times, last error: " + str(error)))
+        else:
+            print("Lost a worker when evaluating the points " + str(start) + " to " + str(stop - 1)
+                  + ", the points are sent to another worker")
+            self.tasks.put((job, index, attempt + 1))
+
+    def start_local_workers(self, processes):
+        """
+        Starts worker processes on this host
+        """
+        host, port = self.address
+        address = ("localhost" if host in ("", "0.0.0.0") else host, port)
+        for _ in range(processes):
+            worker = multiprocessing.Process(target=run_worker, args=(address, self.authkey), daemon=True)
+            worker.start()
+            self.local_workers.append(worker)
+
+    def evaluate(self, criterion, stress_history, steel_data, kw_args, timeout=None):
+        """
+        Evaluates criterion(stress_history, steel_data, **kw_args) by the workers, one chunk of points at a time
+        :param timeout: time in seconds allowed for this evaluation, default is the evaluation_timeout of the
+                        coordinator
+        :return:        numpy array with the results of all points
+        """
+        if timeout is None:
+            timeout = self.evaluation_timeout
+        points = stress_history.shape[1]
+        if points == 0:
+            # Nothing to distribute, the criterion gives the shape of the empty result
+            return criterion(stress_history, steel_data, **kw_args)
+        chunks = [(start, min(start + self.chunk_size, points)) for start in range(0, points, self.chunk_size)]
+        job = _DistributedJob(criterion, stress_history, steel_data, kw_args, chunks)
+        for index in range(len(chunks)):
+            self.tasks.put((job, index, 0))
+        start_time = time.monotonic()
+        no_workers_since = None
+        while not job.done.wait(0.1):
+            now = time.monotonic()
+            if timeout is not None and now - start_time > timeout:
+                job.fail(DistributedEvaluationError(str(job.remaining) + " of " + str(len(chunks)) + " chunks were "
+                                                    "not evaluated within " + str(timeout) + " s"))
+            elif self.connected_workers > 0:
+                no_workers_since = None
+            elif no_workers_since is None:
+                no_workers_since = now
+            elif self.worker_wait is not None and now - no_workers_since > self.worker_wait:
+                job.fail(DistributedEvaluationError("No worker has been connected to the coordinator at "
+                                                    + ":".join(str(part) for part in self.address) + " for "
+                                                    + str(self.worker_wait) + " s"))
+        if job.error is not None:
+            raise job.error
+        return np.concatenate(job.results)
+
+    def close(self, timeout=5.):
+        """
+        Stops the workers, local workers that have not stopped within timeout seconds are terminated
+        """
+        self.closed = True
+        for _ in self.worker_threads:
+            self.tasks.put(None)
+        self.listener.close()
+        # The threads serving workers close their connections within the poll interval, also for hung workers
+        for thread in self.worker_threads:
+            thread.join(timeout)
+        for worker in self.local_workers:
+            worker.join(timeout)
+            if worker.is_alive():
+                worker.terminate()
+                worker.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+def run_worker(address, authkey):
+    """
+    Evaluates chunks received from the coordinator at address until the coordinator stops the worker
+    """
+    with Client(tuple(address), authkey=authkey) as connection:
+        while True:
+            try:
+                message = connection.recv()
+            except EOFError:
+                return
+            if message[0] == "stop":
+                return
+            _, index, criterion, stress_history, steel_data, kw_args = message
+            try:
+                connection.send(("result", index, criterion(stress_history, steel_data, **kw_args)))
+            except Exception as e:
+                # Errors of the criterion are not retried, the error is raised by the coordinator
+                traceback.print_exc()
+                try:
+                    connection.send(("error", index, e))
+                except (pickle.PicklingError, TypeError, AttributeError):
+                    connection.send(("error", index, DistributedEvaluationError(traceback.format_exc())))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Worker evaluating fatigue criteria for a coordinator started by "
+                                                 "fat_eval.multiaxial_fatigue. The authentication key is given by "
+                                                 "the environment variable " + authkey_variable)
+    parser.add_argument("address", type=parse_address, help="host:port of the coordinator")
+    args = parser.parse_args()
+    if authkey_variable not in os.environ:
+        print("The environment variable " + authkey_variable + " must be set to the key of the coordinator")
+        sys.exit(1)
+    run_worker(args.address, default_authkey())
+
+
+if __name__ == '__main__':
+    main()
@@ -1,15 +1,19 @@
 import numpy as np
 
-import multiprocesser
-
+from fat_eval.multiaxial_fatigue.scheduling import DynamicScheduler, schedulers
+from fat_eval.utilities.executors import ProcessExecutor
+from fat_eval.utilities.shared_arrays import SharedArray
 from fat_eval.utilities.steel_data import SteelData
 
 
-def evaluate_effective_stress(stress_history, material, criterion, cpus=1, search_grid=None, **steel_data):
+def evaluate_effective_stress(stress_history, material, criterion, cpus=1, search_grid=None, tolerance=None,
+                              shared_memory=False, coordinator=None, scheduler="static", executor=None,
+                              **steel_data):
     """
     Function for evaluating different effective fatigue stresses using multiple cpus
     :param stress_history:  3d - numpy_array with the stress history, first index represent the time, second index the
-                            points and the third index the stress components
+                            points and the third index the stress components. Can also be a SharedArray, which is
+                            given to the workers without copying it when shared_memory is used
     :param steel_data:      keyword arguments for providing needed data of the steel to determine material properties
     :param material:        name of the material, used for looking up a material object to get material data from
     :param criterion        the criterion to be evaluated, current implemented criteria can be imported from
@@ -17,11 +21,97 @@ def evaluate_effective_stress(stress_history, material, criterion, cpus=1, searc
     :param cpus             The number of cpus used for the evaluation
     :param search_grid      Parameter controlling the angle increment when evaluating critical plane criteria
                             Default is none which sets to a suitable value in each criterion
+    :param tolerance        Requested convergence of the effective stress, selects an adaptive critical plane search
+                            for critical plane criteria. Default is None which uses a fixed search grid
+    :param shared_memory    If True the stress history, the steel data and the results are placed in shared memory
+                            and the worker processes only receive descriptors and point ranges instead of pickled
+                            copies of the data
+    :param coordinator      A fat_eval.multiaxial_fatigue.distributed.Coordinator, if given the points are evaluated
+                            in chunks by the workers of the coordinator instead of by cpus local processes
+    :param scheduler        How the points are distributed over the cpus, "static" splits the points in one equal
+                            slice per cpu and "dynamic" evaluates many small chunks taken from a shared queue by the
+                            workers with chunk sizes tuned from the measured throughput, see
+                            fat_eval.multiaxial_fatigue.scheduling. A DynamicScheduler object can also be given.
+                            The dynamic scheduler does not use shared memory
+    :param executor         Executor running the slices of the static scheduler, or selecting the workers of the
+                            dynamic scheduler, see fat_eval.utilities.executors. Default is a ProcessExecutor with
+                            cpus processes. Shared memory is only used together with worker processes. With a
+                            coordinator only the timeout of the executor is used
     :returns                A numpy array with effective fatigue stress values
     """
     kw_args = {"material_name": material, "search_grid": search_grid}
-    return multiprocesser.apply(criterion, [stress_history, SteelData(steel_data)], keyword_data=kw_args, axis_split=1,
-                                cpus=cpus, timeout=1e9, delay=0.)
+    if tolerance is not None:
+        kw_args["tolerance"] = tolerance
+    shared_history = stress_history
+    if isinstance(stress_history, SharedArray):
+        stress_history = stress_history.array
+    if coordinator is not None:
+        timeout = None if executor is None else executor.timeout
+        return coordinator.evaluate(criterion, stress_history, SteelData(steel_data), kw_args, timeout)
+    if scheduler == "dynamic":
+        scheduler = DynamicScheduler()
+    elif scheduler != "static" and not hasattr(scheduler, "evaluate"):
+        raise ValueError("The scheduler " + str(scheduler) + " is not supported, valid schedulers are "
+                         + ", ".join(schedulers))
+    if executor is None:
+        executor = ProcessExecutor(cpus)
+    if scheduler != "static":
+        return scheduler.evaluate(criterion, stress_history, SteelData(steel_data), kw_args, cpus, executor)
+    if shared_memory and not executor.in_process:
+        return _evaluate_in_shared_memory(shared_history, SteelData(steel_data), criterion, kw_args, executor)
+    steel_data = SteelData(steel_data)
+    points = stress_history.shape[1]
+    point_ranges = [(int(r[0]), int(r[-1]) + 1) for r in np.array_split(np.arange(points), executor.workers) if len(r)]
+    jobs = [(criterion, [stress_history[:, start:stop, :], steel_data[start:stop]], kw_args)
+            for start, stop in point_ranges]
+    return np.concatenate(executor.run(jobs))
+
+
+def _evaluate_in_shared_memory(stress_history, steel_data, criterion, kw_args, executor):
+    # A stress history already in shared memory is used as it is, and closed by the caller, other arrays are copied to
+    # shared memory for the duration of the evaluation
+    shared_arrays = []
+    if isinstance(stress_history, SharedArray):
+        shared_history = stress_history
+    else:
+        shared_history = SharedArray.from_array(stress_history)
+        shared_arrays.append(shared_history)
+    points = shared_history.array.shape[1]
+    try:
+        # The number of output variables are given by evaluating the criterion at the first point
+        first_point = criterion(shared_history.array[:, :1, :], steel_data[:1], **kw_args)
+        steel_data_descriptors = {}
+        for label, values in steel_data.data.items():
+            shared_arrays.append(SharedArray.from_array(values))
+            steel_data_descriptors[label] = shared_arrays[-1].descriptor
+        output = SharedArray((points, ) + first_point.shape[1:], first_point.dtype)
+        shared_arrays.append(output)
+
+        point_ranges = [(int(r[0]), int(r[-1]) + 1) for r in np.array_split(np.arange(points), executor.workers)
+                        if len(r)]
+        jobs = [(_evaluate_shared_chunk, (criterion, shared_history.descriptor, steel_data_descriptors,
+                                          output.descriptor, start, stop, kw_args), {})
+                for start, stop in point_ranges]
+        executor.run(jobs)
+        return np.array(output.array)
+    finally:
+        for shared_array in shared_arrays:
+            shared_array.close()
+
+
+def _evaluate_shared_chunk(criterion, history_descriptor, steel_data_descriptors, output_descriptor, start, stop,
+                           kw_args):
+    shared_arrays = [SharedArray.attach(history_descriptor), SharedArray.attach(output_descriptor)]
+    try:
+        steel_data = {}
+        for label, descriptor in steel_data_descriptors.items():
+            shared_arrays.append(SharedArray.attach(descriptor))
+            steel_data[label] = shared_arrays[-1].array[start:stop]
+        history = shared_arrays[0].array[:, start:stop, :]
+        shared_arrays[1].array[start:stop] = criterion(history, SteelData(steel_data), **kw_args)
+    finally:
+        for shared_array in shared_arrays:
+            shared_array.close()
 
 
 def main():
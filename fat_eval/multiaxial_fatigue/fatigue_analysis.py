@@ -1,25 +1,242 @@
 import itertools
 import sys
 
-import numpy as np
+from concurrent.futures import ThreadPoolExecutor
 
-import multiprocesser
+import numpy as np
 
 from fat_eval.multiaxial_fatigue.criteria import criteria
 from fat_eval.multiaxial_fatigue.evaluation import evaluate_effective_stress
-from abaqus_python_interface import ABQInterface, OdbWritingError
+from fat_eval.utilities.checkpoint import ResultCheckpoint
+from fat_eval.utilities.executors import create_stage_executors
+from fat_eval.utilities.odb_batches import close_odb_interface, OdbWriteBatch, read_odb_fields
+from fat_eval.utilities.odb_cache import odb_file_signature
+from fat_eval.utilities.odb_server import create_odb_interface
+from fat_eval.utilities.profiling import nbytes, Profiler
+from fat_eval.utilities.shared_arrays import SharedArray
 from fat_eval.utilities.steel_data import abaqus_fields
 
 
+# The stages of a fatigue analysis where the executor can be selected, the odb reads and the criterion evaluation
+fatigue_analysis_stages = ("read", "evaluate")
+
+
 class StressFieldError(ValueError):
     pass
 
 
-def perform_fatigue_analysis(fatigue_analysis_data, cpus=1):
-    abq = ABQInterface(fatigue_analysis_data.abaqus, output=False)
-    if fatigue_analysis_data.copy_odb:
-        abq.create_empty_odb_from_odb(new_odb_filename=fatigue_analysis_data.copy_odb.new_odb,
-                                      odb_to_copy=fatigue_analysis_data.copy_odb.odb_to_copy)
+def perform_fatigue_analysis(fatigue_analysis_data, cpus=1, shared_memory=False, use_cache=True, chunk_size=None,
+                             profiler=None, odb_server=False, checkpoint_directory=None, resume=False,
+                             coordinator=None, scheduler="static", executors=None, executor_timeout=None):
+    """
+    Reads the stress fields, evaluates the effective stress and writes the results to odb files.
+    :param fatigue_analysis_data:   FatigueAnalysisData object defining the analysis
+    :param cpus:                    Number of cpus used
+    :param shared_memory:           Share the stress history with the worker processes using shared memory
+    :param use_cache:               Use the on-disk cache of fields extracted from odb files
+    :param chunk_size:              If given, the integration points are processed in chunks of this size, i.e. the
+                                    stress history is built, evaluated and stored for one chunk at a time. Together
+                                    with the cache the fields are memory mapped from disk and only sliced per chunk,
+                                    without the cache the complete fields are read into memory
+    :param profiler:                Profiler object recording the time and memory usage of the phases of the analysis
+    :param odb_server:              Read and write the odb files through one long-lived odb server process
+    :param checkpoint_directory:    If given, the effective stress of each evaluated chunk is written to a checkpoint
+                                    in this directory, which is removed when the analysis is completed. Use chunk_size
+                                    to checkpoint the evaluation in several steps
+    :param resume:                  Only evaluate the chunks missing in the checkpoint of an earlier run of the same
+                                    analysis, a checkpoint with other inputs, see analysis_signature, raises
+                                    CheckpointMismatchError
+    :param coordinator:             fat_eval.multiaxial_fatigue.distributed.Coordinator, if given the criterion is
+                                    evaluated by the workers of the coordinator, which can not be combined with an
+                                    executor for the evaluate stage
+    :param scheduler:               "static" or "dynamic" distribution of the points over the cpus, see
+                                    fat_eval.multiaxial_fatigue.evaluation.evaluate_effective_stress
+    :param executors:               dict with the executor backend, "serial", "thread" or "process", or an executor
+                                    object for the stages in fatigue_analysis_stages. The default is "process"
+    :param executor_timeout:        time in seconds allowed for the jobs of a stage, default is no limit. Also limits
+                                    the evaluations by the coordinator and by the dynamic scheduler
+    """
+    if cpus is None:
+        cpus = 1
+    if coordinator is not None and "evaluate" in (executors or {}):
+        raise ValueError("The criterion is evaluated by the workers of the coordinator, an executor for the evaluate "
+                         "stage can not be given together with a coordinator")
+    stage_executors = create_stage_executors(fatigue_analysis_stages, executors, cpus, executor_timeout)
+    abq = create_odb_interface(fatigue_analysis_data.abaqus, use_cache, odb_server, output=False)
+    try:
+        _perform_fatigue_analysis(abq, fatigue_analysis_data, cpus, shared_memory, use_cache, chunk_size, profiler,
+                                  checkpoint_directory, resume, coordinator, scheduler, stage_executors)
+    finally:
+        close_odb_interface(abq)
+
+
+def _perform_fatigue_analysis(abq, fatigue_analysis_data, cpus, shared_memory, use_cache, chunk_size, profiler,
+                              checkpoint_directory=None, resume=False, coordinator=None, scheduler="static",
+                              stage_executors=None):
+    if stage_executors is None:
+        stage_executors = create_stage_executors(fatigue_analysis_stages, workers=cpus)
+    if profiler is None:
+        profiler = Profiler(enabled=False)
+    # The odb files are written by a background thread while the criterion is evaluated. The odb operations are
+    # queued in the same order as they would be done without the thread, so that an odb file written both by the
+    # stress history and by the fatigue results gets the same frames. The stress history of the next chunk is built
+    # by a second thread while the current chunk is evaluated
+    with ThreadPoolExecutor(max_workers=1) as odb_io, ThreadPoolExecutor(max_workers=1) as chunk_builder:
+        odb_tasks = []
+        if fatigue_analysis_data.copy_odb:
+            odb_tasks.append(odb_io.submit(abq.create_empty_odb_from_odb,
+                                           new_odb_filename=fatigue_analysis_data.copy_odb.new_odb,
+                                           odb_to_copy=fatigue_analysis_data.copy_odb.odb_to_copy))
+
+        streaming = chunk_size is not None and use_cache
+        with profiler.phase("read_fields", cpus=cpus):
+            cyclic_fields, static_fields, heat_treatment_data = read_fatigue_fields(abq, fatigue_analysis_data, cpus,
+                                                                                    streaming=streaming,
+                                                                                    executor=stage_executors["read"])
+        if cpus > 1 and not streaming and not stage_executors["read"].in_process:
+            profiler.add_bytes("read_fields", from_workers=nbytes(cyclic_fields, static_fields, heat_treatment_data))
+        points = check_fatigue_fields(fatigue_analysis_data, cyclic_fields, static_fields, heat_treatment_data)
+        odb_tasks.append(odb_io.submit(_run_phase, profiler, "write_stress_history", write_stress_history, abq,
+                                       fatigue_analysis_data, cyclic_fields, static_fields))
+        output_frames = odb_io.submit(_run_phase, profiler, "prepare_output", prepare_fatigue_output, abq,
+                                      fatigue_analysis_data)
+
+        criterion = criteria[fatigue_analysis_data.effective_stress]
+        criterion_function = profiler.profiled_function(criterion.evaluate, criterion.name)
+        checkpoint = None
+        if checkpoint_directory is not None:
+            checkpoint = ResultCheckpoint(checkpoint_directory, analysis_signature(fatigue_analysis_data), points,
+                                          resume)
+        if chunk_size is None:
+            chunk_size = points
+        chunks = [(start, min(start + chunk_size, points)) for start in range(0, points, chunk_size)]
+        # Shared memory is only used when the slices of the static scheduler are evaluated by worker processes
+        shared_memory = (shared_memory and cpus > 1 and coordinator is None and scheduler == "static"
+                         and not stage_executors["evaluate"].in_process)
+        s = None
+        if checkpoint is not None and checkpoint.completed:
+            s = np.array(checkpoint.results)
+            chunks = [(start, stop) for start, stop in chunks if not checkpoint.is_completed(start, stop)]
+            print("Resuming from the checkpoint in " + str(checkpoint.directory) + ", " + str(len(chunks))
+                  + " chunks remain to be evaluated")
+        try:
+            print("Evaluating criterion " + criterion.name + " at " + str(sum(stop - start for start, stop in chunks))
+                  + " positions using " + str(cpus) + " cpus")
+            print("\tThis might take a while...")
+            if chunks:
+                next_chunk = chunk_builder.submit(_build_chunk, profiler, fatigue_analysis_data, cyclic_fields,
+                                                  static_fields, heat_treatment_data, *chunks[0], shared_memory)
+            for k, (start, stop) in enumerate(chunks):
+                if chunk_size < points:
+                    print("\tEvaluating points " + str(start) + " to " + str(stop - 1))
+                stress_history, chunk_data = next_chunk.result()
+                if k + 1 < len(chunks):
+                    next_chunk = chunk_builder.submit(_build_chunk, profiler, fatigue_analysis_data, cyclic_fields,
+                                                      static_fields, heat_treatment_data, *chunks[k + 1],
+                                                      shared_memory)
+                try:
+                    with profiler.phase("evaluate_criterion", points=stop - start, cpus=cpus):
+                        s_chunk = evaluate_effective_stress(stress_history, fatigue_analysis_data.material,
+                                                            criterion_function, cpus,
+                                                            search_grid=fatigue_analysis_data.search_grid,
+                                                            tolerance=fatigue_analysis_data.tolerance,
+                                                            shared_memory=shared_memory, coordinator=coordinator,
+                                                            scheduler=scheduler,
+                                                            executor=stage_executors["evaluate"], **chunk_data)
+                except BaseException:
+                    # The shared memory of the prefetched chunk is released as it is never evaluated
+                    if shared_memory and k + 1 < len(chunks):
+                        next_chunk.result()[0].close()
+                    raise
+                finally:
+                    if shared_memory:
+                        stress_history.close()
+                # The data is not sent to threads or to the workers of the dynamic scheduler or shared memory
+                if coordinator is not None or (cpus > 1 and not shared_memory and scheduler == "static"
+                                               and not stage_executors["evaluate"].in_process):
+                    profiler.add_bytes("evaluate_criterion", to_workers=nbytes(stress_history, chunk_data),
+                                       from_workers=nbytes(s_chunk))
+                if s is None:
+                    s = np.zeros((points, ) + s_chunk.shape[1:])
+                s[start:stop] = s_chunk
+                if checkpoint is not None:
+                    checkpoint.store(start, stop, s_chunk)
+            # Only criteria with an adaptive search return its convergence, as the last variable
+            if (fatigue_analysis_data.tolerance is not None and "SFCONV" in criterion.variables
+                    and s.shape[1] == len(criterion.variables)):
+                print("Adaptive critical plane search with requested tolerance "
+                      + str(fatigue_analysis_data.tolerance) + " converged to a spread of " + str(np.max(s[:, -1]))
+                      + " (mean " + str(np.mean(s[:, -1])) + ") around the refined critical planes")
+            invalid_points = np.count_nonzero(~np.isfinite(s[:, 0]))
+            if invalid_points > 0:
+                print("Warning: numerical issues at", invalid_points, "points when evaluating the effective stress, "
+                                                                      "creating Infs and NaNs")
+                print("These values are set to zero")
+            s[~np.isfinite(s)] = 0
+        except ValueError as e:
+            print("Problem when evaluating the criterion " + criterion.name)
+            print("\t" + str(e))
+            sys.exit()
+
+        odb_tasks.append(odb_io.submit(_run_phase, profiler, "write_results", write_fatigue_results, abq,
+                                       fatigue_analysis_data, criterion, s, output_frames.result()))
+        # Raises the errors of the odb operations done by the background thread
+        for task in odb_tasks:
+            task.result()
+    if checkpoint is not None:
+        checkpoint.remove(directory=True)
+    print("Done")
+
+
+def analysis_signature(fatigue_analysis_data):
+    """
+    Signature of the inputs of the effective stress evaluated by an analysis, i.e. the criterion, the material, the
+    search parameters, the fields read by the input file and the versions of the odb files they are read from
+    :return:    dict with json serializable values
+    """
+    fields = (list(fatigue_analysis_data.cyclic_stresses) + list(fatigue_analysis_data.static_stresses)
+              + [fatigue_analysis_data.heat_treatment])
+    odb_signatures = []
+    for field in fields:
+        try:
+            odb_signatures.append(odb_file_signature(field.odb_file_name))
+        except OSError:
+            odb_signatures.append(str(field.odb_file_name))
+    return {"criterion": fatigue_analysis_data.effective_stress, "material": fatigue_analysis_data.material,
+            "search_grid": fatigue_analysis_data.search_grid, "tolerance": fatigue_analysis_data.tolerance,
+            "fields": [{key: str(value) for key, value in vars(field).items()} for field in fields],
+            "odb_files": odb_signatures}
+
+
+def _run_phase(profiler, phase, func, *args):
+    with profiler.phase(phase):
+        return func(*args)
+
+
+def _build_chunk(profiler, fatigue_analysis_data, cyclic_fields, static_fields, heat_treatment_data, start, stop,
+                 shared_memory=False):
+    # With shared memory the stress history is built directly in a SharedArray, closed by the caller, so that it is
+    # not held twice in memory when it is handed to the worker processes
+    with profiler.phase("stress_history", points=stop - start):
+        if shared_memory:
+            shape = (len(cyclic_fields), stop - start, cyclic_fields[0].shape[1])
+            stress_history = SharedArray(shape)
+            stress_history_chunk(fatigue_analysis_data, cyclic_fields, static_fields, start, stop,
+                                 out=stress_history.array)
+        else:
+            stress_history = stress_history_chunk(fatigue_analysis_data, cyclic_fields, static_fields, start, stop)
+    return stress_history, {field: values[start:stop] for field, values in heat_treatment_data.items()}
+
+
+def read_fatigue_fields(abq, fatigue_analysis_data, cpus, streaming=False, executor=None):
+    """
+    Reads the cyclic stresses, the static stresses and the heat treatment fields from the odb files
+    :param streaming:   If True, the fields are only extracted to the cache by the worker processes and then memory
+                        mapped from the cache instead of being sent back to the main process
+    :param executor:    executor running the reads, see fat_eval.utilities.odb_batches.read_odb_fields
+    :return:            list with cyclic stress fields, list with static stress fields and a dict with heat treatment
+                        fields
+    """
     read_odb_jobs = []
     for read_job in itertools.chain(fatigue_analysis_data.cyclic_stresses, fatigue_analysis_data.static_stresses):
         kw_args = {
@@ -32,7 +249,7 @@ def perform_fatigue_analysis(fatigue_analysis_data, cpus=1):
             "coordinate_system": read_job.coordinate_system,
             "deform_system": read_job.deform_system
         }
-        read_odb_jobs.append((abq.read_data_from_odb, [], kw_args))
+        read_odb_jobs.append(kw_args)
 
     heat_treatment = fatigue_analysis_data.heat_treatment
     for heat_treatment_field in abaqus_fields:
@@ -40,81 +257,103 @@ def perform_fatigue_analysis(fatigue_analysis_data, cpus=1):
             "odb_file_name": heat_treatment.odb_file_name,
             "field_id": heat_treatment_field,
             "step_name": heat_treatment.step_name,
-            "frame_number": heat_treatment.frame_number,
+            "frame_number": int(heat_treatment.frame_number),
             "set_name": heat_treatment.element_set,
             "instance_name": heat_treatment.instance
         }
-        read_odb_jobs.append((abq.read_data_from_odb, [], kw_args))
-    print("Reading " + str(len(read_odb_jobs)) + " fields from odb files using " + str(min(len(read_odb_jobs), cpus))
-          + " cpus")
-    odb_fields = multiprocesser.multi_processer(read_odb_jobs, cpus=cpus, timeout=1e9, delay=0.)
-
-    stress_history = None
-    for i, cyclic_stress in enumerate(fatigue_analysis_data.cyclic_stresses):
-        stress = odb_fields[i]*cyclic_stress.factor
-        if stress_history is None:
-            points, components = stress.shape
-            stress_history = np.zeros((len(fatigue_analysis_data.cyclic_stresses), points, components))
-        if stress.shape != stress_history[i, :, :].shape:
-            raise StressFieldError("The stress in *cyclic_stress " + str(i + 1) + " has wrong shape")
-
-        stress_history[i, :, :] = stress
+        read_odb_jobs.append(kw_args)
+    odb_files = len({str(kw_args["odb_file_name"]) for kw_args in read_odb_jobs})
+    print("Reading " + str(len(read_odb_jobs)) + " fields from " + str(odb_files) + " odb files using "
+          + str(min(len(read_odb_jobs), cpus)) + " cpus")
+    odb_fields = read_odb_fields(abq, read_odb_jobs, cpus, extract_only=streaming, executor=executor)
 
-    for k, static_stress in enumerate(fatigue_analysis_data.static_stresses):
-        stress = odb_fields[k + len(fatigue_analysis_data.cyclic_stresses)]*static_stress.factor
-        for i in range(len(fatigue_analysis_data.cyclic_stresses)):
-            try:
-                stress_history[i, :, :] += stress
-            except ValueError:
-                raise StressFieldError("Problems when adding the stress field in *static_stress " + str(k + 1)
-                                       + " to the stress history")
+    cyclic_stresses = len(fatigue_analysis_data.cyclic_stresses)
+    static_stresses = len(fatigue_analysis_data.static_stresses)
+    heat_treatment_data = {field: odb_fields[i + cyclic_stresses + static_stresses]
+                           for i, field in enumerate(abaqus_fields)}
+    return (odb_fields[:cyclic_stresses], odb_fields[cyclic_stresses:cyclic_stresses + static_stresses],
+            heat_treatment_data)
 
-    for output in fatigue_analysis_data.stress_history_data:
-        print("Writing the stress history to", output.odb_file_name)
-        for time_step in range(stress_history.shape[0]):
-            print("Writing history step", time_step, "of", stress_history.shape[0] - 1)
-            try:
-                abq.write_data_to_odb(stress_history[time_step, :, :], "S", output.odb_file_name,
-                                      step_name=output.step_name, instance_name=output.instance,
-                                      frame_number=time_step, set_name=output.element_set,
-                                      field_description="Raw data for the stress history. Be aware that coordinate "
-                                                        "systems is not accounted for",
-                                      invariants=["MISES", "MAX_PRINCIPAL", "MID_PRINCIPAL", "MIN_PRINCIPAL"])
-            except OdbWritingError as e:
-                print("Problem when writing the stress history field  to the odb file " + str(output.odb_file_name))
-                print('\t', e)
 
+def check_fatigue_fields(fatigue_analysis_data, cyclic_fields, static_fields, heat_treatment_data):
+    """
+    Checks that all fields have consistent shapes
+    :return: The number of points in the stress fields
+    """
+    points, components = cyclic_fields[0].shape
+    for i, stress in enumerate(cyclic_fields):
+        if stress.shape != (points, components):
+            raise StressFieldError("The stress in *cyclic_stress " + str(i + 1) + " has wrong shape")
+    for k, stress in enumerate(static_fields):
+        if stress.shape != (points, components):
+            raise StressFieldError("Problems when adding the stress field in *static_stress " + str(k + 1)
+                                   + " to the stress history")
     heat_treatment = fatigue_analysis_data.heat_treatment
-    heat_treatment_data = {}
-    for i, heat_treatment_field in enumerate(abaqus_fields):
-        field = odb_fields[i + len(fatigue_analysis_data.cyclic_stresses) + len(fatigue_analysis_data.static_stresses)]
-        if field.shape[0] != stress_history.shape[1]:
+    for heat_treatment_field, field in heat_treatment_data.items():
+        if field.shape[0] != points:
             raise StressFieldError("The field " + heat_treatment_field + "  in " + str(heat_treatment.odb_file_name)
                                    + " has a different shape than the stress field")
-        heat_treatment_data[heat_treatment_field] = field
-    criterion = criteria[fatigue_analysis_data.effective_stress]
+    return points
 
-    if cpus is None:
-        cpus = 1
-    try:
-        print("Evaluating criterion " + criterion.name + " at " + str(stress_history.shape[1]) + " positions using "
-              + str(cpus) + " cpus")
-        print("\tThis might take a while...")
-        s = evaluate_effective_stress(stress_history, fatigue_analysis_data.material, criterion.evaluate, cpus,
-                                      **heat_treatment_data)
-        invalid_points = np.count_nonzero(~np.isfinite(s[:, 0]))
-        if invalid_points > 0:
-            print("Warning: numerical issues at", invalid_points, "points when evaluating the effective stress, "
-                                                                  "creating Infs and NaNs")
-            print("These values are set to zero")
-        s[~np.isfinite(s)] = 0
-    except ValueError as e:
-        print("Problem when evaluating the criterion " + criterion.name)
-        print("\t" + str(e))
-        sys.exit()
 
+def stress_history_chunk(fatigue_analysis_data, cyclic_fields, static_fields, start, stop, time_steps=None,
+                         out=None):
+    """
+    Builds the stress history, with the static stresses superposed, for the points start:stop
+    :param time_steps:  The time steps, i.e. the cyclic stresses, to include. Default is all of them
+    :param out:         array with shape (time_steps, stop - start, components) where the stress history is built,
+                        for instance the array of a SharedArray. Default is a new array
+    :return:            numpy array with shape (time_steps, stop - start, components)
+    """
+    if time_steps is None:
+        time_steps = range(len(cyclic_fields))
+    components = cyclic_fields[0].shape[1]
+    if out is None:
+        stress_history = np.zeros((len(time_steps), stop - start, components))
+    else:
+        stress_history = out
+        stress_history[...] = 0
+    for i, time_step in enumerate(time_steps):
+        factor = fatigue_analysis_data.cyclic_stresses[time_step].factor
+        stress_history[i, :, :] = cyclic_fields[time_step][start:stop]*factor
+    for static_stress, field in zip(fatigue_analysis_data.static_stresses, static_fields):
+        stress_history += field[start:stop]*static_stress.factor
+    return stress_history
+
+
+def write_stress_history(abq, fatigue_analysis_data, cyclic_fields, static_fields):
+    """
+    Writes the stress history to the stress history odb files. The time steps written to an odb file are collected
+    in batches, see fat_eval.utilities.odb_batches.OdbWriteBatch
+    """
+    points = cyclic_fields[0].shape[0]
+
+    def writing_error(kw_args, e):
+        print("Problem when writing the stress history field  to the odb file " + str(kw_args["odb_file_name"]))
+        print('\t', e)
+
+    for output in fatigue_analysis_data.stress_history_data:
+        print("Writing the stress history to", output.odb_file_name)
+        with OdbWriteBatch(abq, error_handler=writing_error) as writes:
+            for time_step in range(len(cyclic_fields)):
+                print("Writing history step", time_step, "of", len(cyclic_fields) - 1)
+                stress = stress_history_chunk(fatigue_analysis_data, cyclic_fields, static_fields, 0, points,
+                                              time_steps=[time_step])[0]
+                writes.write_data_to_odb(field=stress, field_id="S", odb_file_name=output.odb_file_name,
+                                         step_name=output.step_name, instance_name=output.instance,
+                                         frame_number=time_step, set_name=output.element_set,
+                                         field_description="Raw data for the stress history. Be aware that "
+                                                           "coordinate systems is not accounted for",
+                                         invariants=["MISES", "MAX_PRINCIPAL", "MID_PRINCIPAL", "MIN_PRINCIPAL"])
+
+
+def prepare_fatigue_output(abq, fatigue_analysis_data):
+    """
+    Creates the output odb files that do not exist and finds the frames where the fatigue results are written
+    :return:    list with the frame number of each output in fatigue_analysis_data.output_data
+    """
+    frame_numbers = []
     for output_step in fatigue_analysis_data.output_data:
-        print("Writing data to the odb file " + str(output_step.odb_file_name))
         if not output_step.odb_file_name.is_file():
             abq.create_empty_odb_from_odb(new_odb_filename=output_step.odb_file_name,
                                           odb_to_copy=fatigue_analysis_data.static_stresses[0].odb_file_name)
@@ -129,15 +368,29 @@ def perform_fatigue_analysis(fatigue_analysis_data, cpus=1):
                 frame_number = frames[-1]
             else:
                 frame_number = 0
+        frame_numbers.append(frame_number)
+    return frame_numbers
 
-        for i in range(s.shape[1]):
-            try:
-                abq.write_data_to_odb(s[:, i], criterion.variables[i], output_step.odb_file_name,
-                                      step_name=output_step.step_name, instance_name=output_step.instance,
-                                      frame_number=frame_number, set_name=output_step.element_set,
-                                      field_description=criterion.field_descriptions[i])
-            except OdbWritingError as e:
-                print("Problem when writing the fatigue field " + criterion.variables[i] + " to the odb file "
-                      + str(output_step.odb_file_name))
-                print('\t', e)
-    print("Done")
+
+def write_fatigue_results(abq, fatigue_analysis_data, criterion, s, frame_numbers=None):
+    """
+    Writes the fatigue results to the output odb files, all variables written to an odb file are sent as one batch
+    :param frame_numbers:   The frame numbers of the outputs given by prepare_fatigue_output, which is called if not
+                            given
+    """
+    def writing_error(kw_args, e):
+        print("Problem when writing the fatigue field " + kw_args["field_id"] + " to the odb file "
+              + str(kw_args["odb_file_name"]))
+        print('\t', e)
+
+    if frame_numbers is None:
+        frame_numbers = prepare_fatigue_output(abq, fatigue_analysis_data)
+    for output_step, frame_number in zip(fatigue_analysis_data.output_data, frame_numbers):
+        print("Writing data to the odb file " + str(output_step.odb_file_name))
+        with OdbWriteBatch(abq, error_handler=writing_error) as writes:
+            for i in range(s.shape[1]):
+                writes.write_data_to_odb(field=s[:, i], field_id=criterion.variables[i],
+                                         odb_file_name=output_step.odb_file_name, step_name=output_step.step_name,
+                                         instance_name=output_step.instance, frame_number=frame_number,
+                                         set_name=output_step.element_set,
+                                         field_description=criterion.field_descriptions[i])
@@ -3,32 +3,49 @@ from math import cos, sin, pi
 import numpy as np
 
 from fat_eval.fatigue_materials import materials
+from fat_eval.multiaxial_fatigue.critical_planes import get_transform_matrices, plane_angles, plane_normals
+from fat_eval.multiaxial_fatigue.critical_planes import plane_transform_matrices
+
+# Upper limit in bytes of the transformed stress array held in memory when evaluating the Findley criterion
+max_chunk_memory = 2**27
 
 
 class Findley:
     name = 'Findley'
-    variables = ["SF", "SFI"]
+    variables = ["SF", "SFI", "SFCONV"]
     field_descriptions = ["Findley effective stress",
-                          "Normalized effective Findley stress, SFI > 1 means fatigue failures"]
+                          "Normalized effective Findley stress, SFI > 1 means fatigue failures",
+                          "Local convergence of the adaptive critical plane search, spread of the Findley stress "
+                          "around the refined critical plane"]
 
     @staticmethod
-    def evaluate(stress_history, steel_data, material_name, search_grid=None):
+    def evaluate(stress_history, steel_data, material_name, search_grid=None, tolerance=None):
         material = materials[material_name]
         try:
             k = material.findley_k(steel_data)
         except AttributeError:
             raise ValueError("The Findley effective stress criterion is not implemented for material " + material.name
                              + " as it does not have any attribute findley_k")
+        critical_findley_stress = getattr(material, "critical_findley_stress", None)
+        if tolerance is not None and critical_findley_stress is None:
+            # The convergence of the search is written as the third variable, SFCONV, after the normalized stress SFI
+            raise ValueError("The adaptive critical plane search requires the normalized Findley stress, which is not "
+                             "implemented for material " + material.name + " as it does not have any attribute "
+                             "critical_findley_stress")
         if search_grid is None:
             search_grid = 10
-        s = findley(stress_history, k, search_grid)
-        try:
-            sf = material.critical_findley_stress(steel_data)
-        except AttributeError:
+        if tolerance is None:
+            s = findley(stress_history, k, search_grid)
+        else:
+            s, convergence = findley_adaptive(stress_history, k, tolerance, search_grid)
+        if critical_findley_stress is None:
             return s
-        data = np.zeros((s.shape[0], 2))
+        sf = critical_findley_stress(steel_data)
+        data = np.zeros((s.shape[0], 2 if tolerance is None else 3))
         data[:, 0] = s[:, 0]
         data[:, 1] = s[:, 0]/sf
+        if tolerance is not None:
+            data[:, 2] = convergence
         return data
 
 
@@ -114,6 +131,108 @@ def smallest_enclosing_circle(xp, yp, xo=None, yo=None):
     return xc, yc, radius
 
 
+# Pairs and triples of points among four candidate points, pairs are padded to three indices
+_circle_candidates = [(0, 1, 1), (0, 2, 2), (0, 3, 3), (1, 2, 2), (1, 3, 3), (2, 3, 3),
+                      (0, 1, 2), (0, 1, 3), (0, 2, 3), (1, 2, 3)]
+
+
+def _circle_from_two_points(xa, ya, xb, yb):
+    xc = (xa + xb)/2
+    yc = (ya + yb)/2
+    return xc, yc, (xa - xc)**2 + (ya - yc)**2
+
+
+def _circle_from_three_points(xa, ya, xb, yb, xc, yc, scale):
+    # Circumcircle evaluated relative to point a, collinear points gives an infinite radius
+    bx, by = xb - xa, yb - ya
+    cx, cy = xc - xa, yc - ya
+    d = 2*(bx*cy - by*cx)
+    collinear = np.abs(d) <= 1e-12*scale**2
+    d[collinear] = 1.
+    b2 = bx**2 + by**2
+    c2 = cx**2 + cy**2
+    ux = (cy*b2 - by*c2)/d
+    uy = (bx*c2 - cx*b2)/d
+    r2 = ux**2 + uy**2
+    r2[collinear] = np.inf
+    return xa + ux, ya + uy, r2
+
+
+def _smallest_circle_of_few_points(xp, yp, scale):
+    """
+    Smallest enclosing circles for many sets of at most four points by testing all circles defined by pairs and
+    triples of the points
+    :param xp:      numpy array with shape (sets, n) with n <= 4
+    :param yp:      numpy array with shape (sets, n)
+    :param scale:   numpy array with shape (sets, ) with the size of the coordinates, used for tolerances
+    :return:        xc, yc, squared radius and the indices of the two or three points defining the circle
+    """
+    n = xp.shape[1]
+    candidates = np.array([c for c in _circle_candidates if max(c) < n])
+    pairs = candidates[:, 1] == candidates[:, 2]
+    xc = np.zeros((xp.shape[0], len(candidates)))
+    yc = np.zeros_like(xc)
+    r2 = np.zeros_like(xc)
+    for j, (a, b, c) in enumerate(candidates):
+        if pairs[j]:
+            xc[:, j], yc[:, j], r2[:, j] = _circle_from_two_points(xp[:, a], yp[:, a], xp[:, b], yp[:, b])
+        else:
+            xc[:, j], yc[:, j], r2[:, j] = _circle_from_three_points(xp[:, a], yp[:, a], xp[:, b], yp[:, b],
+                                                                     xp[:, c], yp[:, c], scale)
+    dist2 = (xp[:, None, :] - xc[:, :, None])**2 + (yp[:, None, :] - yc[:, :, None])**2
+    encloses = np.all(dist2 <= r2[:, :, None] + 1e-12*scale[:, None, None]**2, axis=2)
+    r2[~encloses] = np.inf
+    best = np.argmin(r2, axis=1)
+    rows = np.arange(xp.shape[0])
+    return xc[rows, best], yc[rows, best], r2[rows, best], candidates[best]
+
+
+def smallest_enclosing_circles(xp, yp):
+    """
+    Calculates the smallest enclosing circles of many point sets simultaneously. Closed form expressions are used for
+    one, two and three points and for more points an iterative algorithm (Elzinga and Hearn) is used where the point
+    furthest away from the current circle is added to the points defining the circle until all points are enclosed.
+    Collinear points are handled by using the circle spanned by the outermost points
+    :param xp:  numpy array with the x-coordinates of the points, the points of one set are along the last axis
+    :param yp:  numpy array with the y-coordinates, same shape as xp
+    :return:    xc, yc and radius of the circles as numpy arrays with shape xp.shape[:-1]
+    """
+    shape = xp.shape[:-1]
+    time_points = xp.shape[-1]
+    x = np.asarray(xp, dtype=float).reshape(-1, time_points)
+    y = np.asarray(yp, dtype=float).reshape(-1, time_points)
+    if time_points == 1:
+        return x[:, 0].reshape(shape), y[:, 0].reshape(shape), np.zeros(shape)
+    if time_points == 2:
+        xc, yc, r2 = _circle_from_two_points(x[:, 0], y[:, 0], x[:, 1], y[:, 1])
+        return xc.reshape(shape), yc.reshape(shape), np.sqrt(r2).reshape(shape)
+
+    scale = np.maximum(np.abs(x).max(axis=1), np.abs(y).max(axis=1)) + 1e-300
+    if time_points == 3:
+        xc, yc, r2, _ = _smallest_circle_of_few_points(x, y, scale)
+        return xc.reshape(shape), yc.reshape(shape), np.sqrt(r2).reshape(shape)
+
+    # Start with the circle spanned by the first point and the point furthest away from it
+    rows = np.arange(x.shape[0])
+    furthest = np.argmax((x - x[:, :1])**2 + (y - y[:, :1])**2, axis=1)
+    support = np.column_stack([0*furthest, furthest, furthest])
+    xc, yc, r2 = _circle_from_two_points(x[:, 0], y[:, 0], x[rows, furthest], y[rows, furthest])
+    active = rows
+    for _ in range(10*time_points):
+        dist2 = (x[active] - xc[active, None])**2 + (y[active] - yc[active, None])**2
+        furthest = np.argmax(dist2, axis=1)
+        outside = dist2[np.arange(active.shape[0]), furthest] > r2[active] + 1e-12*scale[active]**2
+        active = active[outside]
+        if active.shape[0] == 0:
+            break
+        points = np.column_stack([support[active], furthest[outside]])
+        xc[active], yc[active], r2[active], local_support = _smallest_circle_of_few_points(
+            np.take_along_axis(x[active], points, axis=1), np.take_along_axis(y[active], points, axis=1),
+            scale[active])
+        support[active] = np.take_along_axis(points, local_support, axis=1)
+    return xc.reshape(shape), yc.reshape(shape), np.sqrt(r2).reshape(shape)
+
+
 def get_transform_matrix(theta_deg, phi_deg):
     # Radians
     theta_r = pi*theta_deg/180.0
@@ -140,38 +259,166 @@ def get_transform_matrix(theta_deg, phi_deg):
     return trans_matrix
 
 
-def findley(stress_history, k, search_grid):
-    phi_space = 90
-    theta_space = 180
+def shear_amplitudes(tau_1, tau_2):
+    """
+    Evaluates the shear stress amplitude, i.e. the radius of the smallest enclosing circle, for a set of shear stress
+    paths
+    :param tau_1:   numpy array with the first shear stress component, time is along the last axis
+    :param tau_2:   numpy array with the second shear stress component, same shape as tau_1
+    :return:        numpy array with the shear stress amplitudes, shape is tau_1.shape[:-1]
+    """
+    return smallest_enclosing_circles(tau_1, tau_2)[2]
+
 
+def findley(stress_history, k, search_grid, chunk_size=None, sampling="grid"):
+    """
+    Evaluates the Findley effective stress by transforming the stress history of all points to all planes in the
+    critical plane search as array operations. The points are processed in chunks to bound the memory usage
+    :param stress_history:  numpy array with shape (time, points, 6)
+    :param k:               the findley parameter k, a scalar or one value per point
+    :param search_grid:     angle increment in degrees between the planes
+    :param chunk_size:      number of points evaluated simultaneously, default is set by max_chunk_memory
+    :param sampling:        sampling of the planes, see fat_eval.multiaxial_fatigue.critical_planes.plane_angles
+    :return:                numpy array with shape (points, 1) with the Findley stress
+    """
     #     Get shape of stress matrix
     load_steps, points, no_stress_components = stress_history.shape
+    k = np.broadcast_to(k, (points, ))
+    q = plane_transform_matrices(search_grid, sampling)
+    if chunk_size is None:
+        chunk_size = max(1, int(max_chunk_memory//(3*q.shape[0]*load_steps*8)))
 
-    # Result array [theta, phi, max_sigma_n, max_tau_amplitude, F]
     findley_vec = np.zeros((points, 1)) - 1e6
+    for start in range(0, points, chunk_size):
+        stop = min(start + chunk_size, points)
+        sf = _findley_on_common_planes(stress_history[:, start:stop, :], k[start:stop], q)
+        findley_vec[start:stop, 0] = sf.max(axis=0)
 
-    for theta in np.arange(0, theta_space + search_grid, search_grid):
-        for phi in np.arange(-phi_space, phi_space + search_grid, search_grid):
+    return findley_vec
 
-            # Compute the transformation matrix for the considered plane
-            q = get_transform_matrix(theta, phi)
 
-            # For the currently considered planed, evaluate sigma_n, tau_1, tau_2,
-            # Delta_tau, F for every node for the load history (time domain)
-            for j, node_s_hist_vector in enumerate(np.rollaxis(stress_history, 1)):
+def _findley_on_common_planes(stress_history, k, q):
+    """
+    Evaluates the Findley stress for all points on the same set of planes
+    :param stress_history:  numpy array with shape (time, points, 6)
+    :param k:               numpy array with shape (points, )
+    :param q:               numpy array with shape (planes, 6, 6) with the transformation matrices of the planes
+    :return:                numpy array with shape (planes, points)
+    """
+    load_steps, points, no_stress_components = stress_history.shape
+    planes = q.shape[0]
 
-                # Compute shear stress and normal stresses for the load history
-                s_prim = np.dot(node_s_hist_vector, q.T)
-                # Evaluate the smallest enclosing circle to get the shear stress amplitude
-                # (i.e. the radius of the circle)
-                x, y, max_tau_amplitude = smallest_enclosing_circle(s_prim[:, 3], s_prim[:, 4])
+    # Only the normal stress and the two shear stresses on the plane are needed
+    q = q[:, [0, 3, 4], :].reshape(3*planes, no_stress_components).T
 
-                # Evaluate the largest normal stress on the plane for the load history
-                max_sigma_n = s_prim[:, 0].max()
+    # Stresses on all planes for the load history, shape (time, points, planes, 3) transposed to
+    # (3, planes, points, time)
+    s_prim = np.dot(stress_history, q).reshape(load_steps, points, planes, 3).transpose(3, 2, 1, 0)
+    return shear_amplitudes(s_prim[1], s_prim[2]) + k*s_prim[0].max(axis=-1)
 
-                # Store result if the are larger than the current value (except for first plane, then just store data)
-                sf = max_tau_amplitude + k[j]*max_sigma_n
-                if sf > findley_vec[j, 0]:
-                    findley_vec[j, 0] = sf
 
-    return findley_vec
+def _findley_on_planes(stress_history, k, theta, phi):
+    """
+    Evaluates the Findley stress for each point on individual planes
+    :param stress_history:  numpy array with shape (time, points, 6)
+    :param k:               numpy array with shape (points, )
+    :param theta:           numpy array with shape (planes, points) with the theta angles of the planes of each point
+    :param phi:             numpy array with shape (planes, points) with the phi angles of the planes of each point
+    :return:                numpy array with shape (planes, points)
+    """
+    q = get_transform_matrices(theta, phi)[:, :, [0, 3, 4], :]
+    s_prim = np.einsum('cpkj,tpj->kcpt', q, stress_history)
+    return shear_amplitudes(s_prim[1], s_prim[2]) + k*s_prim[0].max(axis=-1)
+
+
+def findley_adaptive(stress_history, k, tolerance, search_grid=10, candidates=3, chunk_size=None, sampling="grid"):
+    """
+    Evaluates the Findley effective stress with an adaptive critical plane search. A coarse sweep over all planes with
+    the angle increment search_grid is followed by a local pattern search around the best planes of each point. The
+    candidate planes are taken from separate peaks of the coarse sweep to avoid refining the same local maximum several
+    times. The pattern search moves to the best neighbouring plane if it is better than the current one and halves the
+    angle increment otherwise. A point is converged when the spread of the Findley stress over the neighbouring planes
+    of the best plane is smaller than tolerance. The spread is a measure of the local convergence around the refined
+    plane and not a bound on the error of the Findley stress, a peak of the Findley stress falling between the planes
+    of the coarse sweep is not found, which happens more often for larger search_grid
+    :param stress_history:  numpy array with shape (time, points, 6)
+    :param k:               the findley parameter k, a scalar or one value per point
+    :param tolerance:       the requested spread of the Findley stress around the refined plane
+    :param search_grid:     angle increment in degrees of the coarse sweep
+    :param candidates:      number of planes of the coarse sweep that are refined for each point
+    :param chunk_size:      number of points evaluated simultaneously, default is set by max_chunk_memory
+    :param sampling:        sampling of the planes in the coarse sweep
+    :return:                numpy array with shape (points, 1) with the Findley stress and numpy array with shape
+                            (points, ) with the spread of the Findley stress around the refined plane of each point
+    """
+    load_steps, points, _ = stress_history.shape
+    k = np.broadcast_to(k, (points, ))
+    plane_theta, plane_phi = plane_angles(search_grid, sampling)
+    planes = plane_transform_matrices(search_grid, sampling)
+    candidates = min(candidates, plane_theta.shape[0])
+    if chunk_size is None:
+        chunk_size = max(1, int(max_chunk_memory//(3*plane_theta.shape[0]*load_steps*8)))
+    normals = plane_normals(search_grid, sampling)
+    neighbour_planes = np.abs(np.dot(normals, normals.T)) > np.cos(1.5*np.pi*search_grid/180)
+    stencil = np.array([(i, j) for i in [-1, 0, 1] for j in [-1, 0, 1] if i != 0 or j != 0])
+    minimum_increment = 1e-4*search_grid
+
+    findley_vec = np.zeros((points, 1))
+    convergence = np.zeros(points)
+    for start in range(0, points, chunk_size):
+        stop = min(start + chunk_size, points)
+        n = stop - start
+        chunk_history = stress_history[:, start:stop, :]
+        chunk_k = k[start:stop]
+        sf_planes = _findley_on_common_planes(chunk_history, chunk_k, planes)
+        # The candidates are picked among separate peaks by excluding the neighbours of already picked planes
+        best = np.zeros((candidates, n), dtype=int)
+        masked_sf = sf_planes.T.copy()
+        for i in range(candidates):
+            best[i] = np.argmax(masked_sf, axis=1)
+            masked_sf[neighbour_planes[best[i]]] = -np.inf
+        theta = plane_theta[best]
+        phi = plane_phi[best]
+        sf = np.take_along_axis(sf_planes, best, axis=0)
+        increment = np.full(theta.shape, search_grid/2.)
+        spread = np.full(theta.shape, np.inf)
+
+        active = np.arange(n)
+        while active.shape[0]:
+            neighbour_theta = theta[:, active][None] + stencil[:, 0, None, None]*increment[:, active][None]
+            neighbour_phi = phi[:, active][None] + stencil[:, 1, None, None]*increment[:, active][None]
+            neighbour_sf = _findley_on_planes(
+                chunk_history[:, active, :], chunk_k[active],
+                neighbour_theta.reshape(-1, active.shape[0]), neighbour_phi.reshape(-1, active.shape[0])
+            ).reshape(neighbour_theta.shape)
+
+            best_neighbour = np.argmax(neighbour_sf, axis=0)
+            best_neighbour_sf = np.take_along_axis(neighbour_sf, best_neighbour[None], axis=0)[0]
+            move = best_neighbour_sf > sf[:, active]
+            sub_theta = theta[:, active]
+            sub_phi = phi[:, active]
+            sub_theta[move] = np.take_along_axis(neighbour_theta, best_neighbour[None], axis=0)[0][move]
+            sub_phi[move] = np.take_along_axis(neighbour_phi, best_neighbour[None], axis=0)[0][move]
+            theta[:, active] = sub_theta
+            phi[:, active] = sub_phi
+
+            sub_sf = sf[:, active]
+            sub_spread = spread[:, active]
+            sub_increment = increment[:, active]
+            sub_sf[move] = best_neighbour_sf[move]
+            sub_spread[~move] = (sub_sf - neighbour_sf.min(axis=0))[~move]
+            sub_increment[~move] /= 2
+            sf[:, active] = sub_sf
+            spread[:, active] = sub_spread
+            increment[:, active] = sub_increment
+
+            best_candidate = np.argmax(sub_sf, axis=0)
+            converged = np.logical_or(
+                np.take_along_axis(sub_spread, best_candidate[None], axis=0)[0] <= tolerance,
+                np.take_along_axis(sub_increment, best_candidate[None], axis=0)[0] < minimum_increment)
+            active = active[~converged]
+
+        best_candidate = np.argmax(sf, axis=0)
+        findley_vec[start:stop, 0] = np.take_along_axis(sf, best_candidate[None], axis=0)[0]
+        convergence[start:stop] = np.take_along_axis(spread, best_candidate[None], axis=0)[0]
+    return findley_vec, convergence
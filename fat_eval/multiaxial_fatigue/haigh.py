@@ -1,15 +1,20 @@
 import numpy as np
 
-from scipy.linalg import eigh
+from fat_eval.fatigue_materials import materials
+from fat_eval.multiaxial_fatigue.findley import max_chunk_memory
 
 
 class Haigh:
-    def __init__(self):
-        self.name = 'HAIGH'
-        self.variable = 'SH'
+    name = 'Haigh'
+    variables = ["SH", "SHI"]
+    field_descriptions = ["Haigh effective stress",
+                          "Normalized effective Haigh stress, SHI > 1 means fatigue failures"]
 
     @staticmethod
-    def evaluate(stress_history, steel_data, material):
+    def evaluate(stress_history, steel_data, material_name, search_grid=None, tolerance=None):
+        # The critical direction is given by the largest principal stress, search_grid and tolerance of the critical
+        # plane search are not used
+        material = materials[material_name]
         try:
             mean_stress_sensitivities = material.mean_stress_sensitivity(steel_data)
         except AttributeError:
@@ -19,52 +24,68 @@ class Haigh:
         try:
             su = material.uniaxial_fatigue_limit(steel_data)
         except AttributeError:
-            return s
+            return s[:, None]
         data = np.zeros((s.shape[0], 2))
         data[:, 0] = s
         data[:, 1] = s/su
         return data
 
 
-def haigh(stress_history, mean_stress_sensitivities):
-    time_points = stress_history.shape[0]
-    effective_stress = 0*np.array(mean_stress_sensitivities)
-    for i, mean_stress_k in enumerate(mean_stress_sensitivities):
-
-        # Calculating the maximum principal stress at each time step
-        s_max = np.zeros(time_points)
-        stress_tensors = []
-        directions = []
-        for j in range(time_points):
-            stress_tensor = np.zeros((3, 3))
-            np.fill_diagonal(stress_tensor, stress_history[j, i, :3])
-            stress_tensor[0, 1] = stress_history[j, i, 3]
-            stress_tensor[0, 2] = stress_history[j, i, 4]
-            stress_tensor[1, 2] = stress_history[j, i, 5]
-
-            stress_tensor[1, 0] = stress_tensor[0, 1]
-            stress_tensor[2, 0] = stress_tensor[0, 2]
-            stress_tensor[2, 1] = stress_tensor[1, 2]
-            stress_tensors.append(stress_tensor)
-            eigen_vals, eigen_dirs = eigh(stress_tensor)
-
-            idx = np.argmax(eigen_vals)
-            s_max[j] = eigen_vals[idx]
-            directions.append(eigen_dirs[:, idx])
-        max_inc = np.argmax(s_max)
-        s_max = s_max[max_inc]
-        n = directions[max_inc]
-
-        min_stresses = []
-        for j in range(time_points):
-            if j != max_inc:
-                min_stresses.append(np.dot(np.dot(n, stress_tensors[j]), n))
-        sa = (s_max - min(min_stresses))/2
-        sm = (s_max + min(min_stresses))/2
-        effective_stress[i] = sa + mean_stress_k*sm
+def stress_tensors(stress_history):
+    """
+    Assembles the symmetric stress tensors of a stress history
+    :param stress_history:  numpy array with shape (time, points, 6) with the components 11, 22, 33, 12, 13, 23
+    :return:                numpy array with shape (time, points, 3, 3)
+    """
+    tensors = np.empty(stress_history.shape[:2] + (3, 3))
+    for i, (j, k) in enumerate([(0, 0), (1, 1), (2, 2), (0, 1), (0, 2), (1, 2)]):
+        tensors[:, :, j, k] = stress_history[:, :, i]
+        tensors[:, :, k, j] = stress_history[:, :, i]
+    return tensors
+
+
+def haigh(stress_history, mean_stress_sensitivities, chunk_size=None):
+    """
+    Evaluates the Haigh effective stress sa + k*sm where the amplitude and mean stress are evaluated in the direction
+    of the largest principal stress during the load history. The points are evaluated in chunks with all time steps
+    and points of a chunk evaluated simultaneously
+    :param stress_history:              numpy array with shape (time, points, 6)
+    :param mean_stress_sensitivities:   numpy array with the mean stress sensitivity k for each point
+    :param chunk_size:                  number of points evaluated simultaneously, default is set by max_chunk_memory
+    :return:                            numpy array with shape (points, ) with the effective stress
+    """
+    time_points, points, _ = stress_history.shape
+    if time_points < 2:
+        raise ValueError("The Haigh effective stress needs a stress history with at least two time steps")
+    mean_stress_sensitivities = np.broadcast_to(mean_stress_sensitivities, (points, ))
+    if chunk_size is None:
+        chunk_size = max(1, int(max_chunk_memory//(3*9*time_points*8)))
+    effective_stress = np.zeros(points)
+    for start in range(0, points, chunk_size):
+        stop = min(start + chunk_size, points)
+        sa, sm = _haigh_amplitude_and_mean(stress_history[:, start:stop, :])
+        effective_stress[start:stop] = sa + mean_stress_sensitivities[start:stop]*sm
     return effective_stress
 
 
+def _haigh_amplitude_and_mean(stress_history):
+    points = stress_history.shape[1]
+    tensors = stress_tensors(stress_history)
+
+    # Principal stresses are sorted in ascending order by eigh, the last one is the maximum principal stress
+    eigen_vals, eigen_dirs = np.linalg.eigh(tensors)
+    max_inc = np.argmax(eigen_vals[:, :, -1], axis=0)
+    point_idx = np.arange(points)
+    s_max = eigen_vals[max_inc, point_idx, -1]
+    n = eigen_dirs[max_inc, point_idx, :, -1]
+
+    # Normal stresses in the critical direction for all time steps except the one with the maximum principal stress
+    normal_stresses = np.einsum('pi,tpij,pj->tp', n, tensors, n)
+    normal_stresses[max_inc, point_idx] = np.inf
+    s_min = normal_stresses.min(axis=0)
+    return (s_max - s_min)/2, (s_max + s_min)/2
+
+
 def main():
     pass
 
@@ -0,0 +1,135 @@
+import time
+
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import numpy as np
+
+from fat_eval.utilities.executors import ExecutorTimeoutError, ProcessExecutor
+
+# static: the points are split into one equal slice per cpu
+# dynamic: the points are evaluated in many small chunks taken from a shared queue by the workers
+schedulers = ("static", "dynamic")
+
+
+class ChunkSizeTuner:
+    """
+    Chooses the number of points of the next chunk from the measured throughput of the evaluated chunks. The chunks
+    aim at taking target_time seconds but are never larger than half the remaining points per worker, so that the
+    chunks get smaller towards the end and no worker is left with a long chunk when the others are done
+    """
+    def __init__(self, workers, initial_size=32, target_time=0.5, min_size=1, max_size=None):
+        self.workers = workers
+        self.initial_size = initial_size
+        self.target_time = target_time
+        self.min_size = min_size
+        self.max_size = max_size
+        # Points per second and worker, exponential moving average of the evaluated chunks
+        self.throughput = None
+
+    def record(self, points, seconds):
+        throughput = points/max(seconds, 1e-9)
+        if self.throughput is None:
+            self.throughput = throughput
+        else:
+            self.throughput = 0.7*self.throughput + 0.3*throughput
+
+    def next_size(self, remaining_points):
+        if self.throughput is None:
+            size = self.initial_size
+        else:
+            size = int(self.throughput*self.target_time)
+        size = min(size, remaining_points//(2*self.workers))
+        if self.max_size is not None:
+            size = min(size, self.max_size)
+        return min(max(size, self.min_size), remaining_points)
+
+
+class DynamicScheduler:
+    """
+    Evaluates a criterion with many small chunks of points. The stress history and the steel data are installed once
+    in each worker and the workers take the point ranges from the shared task queue of a pool, so a worker that
+    finishes early takes the next chunk instead of waiting for the slowest worker. The chunk sizes are tuned by a
+    ChunkSizeTuner
+    """
+    def __init__(self, initial_chunk_size=32, target_chunk_time=0.5, max_chunk_size=None):
+        self.initial_chunk_size = initial_chunk_size
+        self.target_chunk_time = target_chunk_time
+        self.max_chunk_size = max_chunk_size
+        # (start, stop, seconds) of the chunks of the last evaluation
+        self.chunks = []
+
+    def evaluate(self, criterion, stress_history, steel_data, kw_args, cpus, executor=None):
+        """
+        :param executor:    executor from fat_eval.utilities.executors selecting the workers, the chunks are
+                            evaluated by worker processes for the process executor and by threads in the calling
+                            process for the thread executor. The timeout of the executor applies to the whole
+                            evaluation. Default is a ProcessExecutor with cpus processes
+        """
+        if executor is None:
+            executor = ProcessExecutor(cpus)
+        points = stress_history.shape[1]
+        self.chunks = []
+        if executor.workers <= 1 or points <= 1:
+            start_time = time.perf_counter()
+            result = criterion(stress_history, steel_data, **kw_args)
+            self.chunks.append((0, points, time.perf_counter() - start_time))
+            return result
+        workers = executor.workers
+        tuner = ChunkSizeTuner(workers, self.initial_chunk_size, self.target_chunk_time, max_size=self.max_chunk_size)
+        worker_state = (criterion, stress_history, steel_data, kw_args)
+        if executor.in_process:
+            pool = ThreadPoolExecutor(max_workers=workers)
+            state = dict(zip(("criterion", "stress_history", "steel_data", "kw_args"), worker_state))
+        else:
+            # A worker process that dies raises BrokenProcessPool for its chunk instead of the chunk being lost
+            pool = executor.pool(_install_worker_state, worker_state)
+            state = None
+        deadline = None if executor.timeout is None else time.perf_counter() + executor.timeout
+        results = {}
+        pending = set()
+        try:
+            start = 0
+            while start < points or pending:
+                # Two chunks per worker are queued so that the workers never wait for the next chunk
+                while start < points and len(pending) < 2*workers:
+                    stop = start + tuner.next_size(points - start)
+                    pending.add(pool.submit(_evaluate_chunk, start, stop, state))
+                    start = stop
+                timeout = None if deadline is None else max(deadline - time.perf_counter(), 0.)
+                done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+                if not done:
+                    raise ExecutorTimeoutError(str(points - sum(chunk[1] - chunk[0] for chunk in self.chunks))
+                                               + " points were not evaluated within " + str(executor.timeout) + " s")
+                for future in done:
+                    chunk_start, chunk_stop, values, seconds = future.result()
+                    tuner.record(chunk_stop - chunk_start, seconds)
+                    self.chunks.append((chunk_start, chunk_stop, seconds))
+                    results[chunk_start] = values
+        except BaseException:
+            for future in pending:
+                future.cancel()
+            if state is None:
+                # The chunks still running in the worker processes are not waited for
+                pool.terminate()
+            else:
+                # Threads running a chunk after an error or the timeout are not waited for
+                pool.shutdown(wait=False)
+            raise
+        pool.shutdown()
+        return np.concatenate([results[chunk_start] for chunk_start in sorted(results)])
+
+
+_worker_state = {}
+
+
+def _install_worker_state(criterion, stress_history, steel_data, kw_args):
+    _worker_state.update(criterion=criterion, stress_history=stress_history, steel_data=steel_data, kw_args=kw_args)
+
+
+def _evaluate_chunk(start, stop, state=None):
+    # The threads of the thread executor are given the state, the worker processes use the installed state
+    state = _worker_state if state is None else state
+    start_time = time.perf_counter()
+    values = state["criterion"](state["stress_history"][:, start:stop, :], state["steel_data"][start:stop],
+                                **state["kw_args"])
+    return start, stop, values, time.perf_counter() - start_time
@@ -0,0 +1,237 @@
+"""
+Odb server backend running in the Abaqus python interpreter, started by fat_eval.utilities.odb_server with
+    abaqus python abaqus_odb_server.py
+The odb files are kept open between the requests and the odb files that have been written to are saved after each
+request or batch of requests. The script is run by Abaqus python, which can be python 2, and only depends on the
+Abaqus python modules, numpy and odb_server_protocol in the same directory
+"""
+from __future__ import print_function
+
+import os
+import sys
+
+import numpy as np
+
+from abaqusConstants import CENTROID, DEFORMABLE_BODY, ELEMENT_NODAL, INTEGRATION_POINT, NODAL, SCALAR
+from abaqusConstants import TENSOR_3D_FULL, THREE_D, TIME
+from abaqusConstants import MAX_PRINCIPAL, MID_PRINCIPAL, MIN_PRINCIPAL, MISES, TRESCA, PRESS
+import odbAccess
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from odb_server_protocol import serve  # noqa
+
+positions = {"INTEGRATION_POINT": INTEGRATION_POINT, "CENTROID": CENTROID, "NODAL": NODAL,
+             "ELEMENT_NODAL": ELEMENT_NODAL}
+invariant_constants = {"MISES": MISES, "MAX_PRINCIPAL": MAX_PRINCIPAL, "MID_PRINCIPAL": MID_PRINCIPAL,
+                       "MIN_PRINCIPAL": MIN_PRINCIPAL, "TRESCA": TRESCA, "PRESS": PRESS}
+
+
+class OdbReadingError(Exception):
+    pass
+
+
+class OdbWritingError(Exception):
+    pass
+
+
+class AbaqusOdbBackend:
+    def __init__(self):
+        self.odbs = {}
+        self.modified = set()
+
+    def _open(self, odb_file_name, read_only=True):
+        odb_file_name = os.path.abspath(os.path.expanduser(str(odb_file_name)))
+        odb = self.odbs.get(odb_file_name)
+        if odb is not None and odb.isReadOnly and not read_only:
+            odb.close()
+            odb = None
+        if odb is None:
+            if not os.path.isfile(odb_file_name):
+                raise OdbReadingError("The odb file " + odb_file_name + " does not exist")
+            if odbAccess.isUpgradeRequiredForOdb(odb_file_name):
+                raise OdbReadingError("The odb file " + odb_file_name + " needs to be upgraded")
+            try:
+                odb = odbAccess.openOdb(odb_file_name, readOnly=read_only)
+            except Exception as e:
+                raise OdbReadingError("Problems when opening the odb file " + odb_file_name + ": " + str(e))
+            self.odbs[odb_file_name] = odb
+        return odb_file_name, odb
+
+    def _close(self, odb_file_name):
+        odb = self.odbs.pop(odb_file_name, None)
+        if odb is not None:
+            if odb_file_name in self.modified:
+                odb.save()
+                self.modified.discard(odb_file_name)
+            odb.close()
+
+    def flush(self):
+        for odb_file_name in list(self.modified):
+            self.odbs[odb_file_name].save()
+        self.modified.clear()
+
+    def close(self):
+        for odb_file_name in list(self.odbs):
+            self._close(odb_file_name)
+
+    @staticmethod
+    def _instance(odb, instance_name):
+        if instance_name:
+            return odb.rootAssembly.instances[instance_name]
+        return odb.rootAssembly.instances[list(odb.rootAssembly.instances.keys())[0]]
+
+    def _element_set(self, odb, set_name, instance_name):
+        if not set_name:
+            return None
+        if instance_name:
+            return odb.rootAssembly.instances[instance_name].elementSets[set_name]
+        if set_name in odb.rootAssembly.elementSets:
+            return odb.rootAssembly.elementSets[set_name]
+        return self._instance(odb, None).elementSets[set_name]
+
+    def _elements(self, odb, set_name, instance_name):
+        instance = self._instance(odb, instance_name)
+        if not set_name:
+            return instance.elements
+        if not instance_name and set_name in odb.rootAssembly.elementSets:
+            # Assembly sets have one sequence of elements per instance
+            return odb.rootAssembly.elementSets[set_name].elements[0]
+        return instance.elementSets[set_name].elements
+
+    def get_steps(self, odb_file_name):
+        _, odb = self._open(odb_file_name)
+        return list(odb.steps.keys())
+
+    def get_frames(self, odb_file_name, step_name):
+        _, odb = self._open(odb_file_name)
+        try:
+            return [frame.frameId for frame in odb.steps[step_name].frames]
+        except Exception as e:
+            raise OdbReadingError("Problems when reading the frames of step " + str(step_name) + " in "
+                                  + str(odb_file_name) + ": " + str(e))
+
+    def read_data_from_odb(self, field_id, odb_file_name, step_name=None, frame_number=-1, set_name='',
+                           instance_name=None, get_position_numbers=False, get_frame_value=False,
+                           position='INTEGRATION_POINT', coordinate_system=None, rotating_system=False,
+                           deform_system=True):
+        _, odb = self._open(odb_file_name)
+        try:
+            if step_name is None:
+                step_name = list(odb.steps.keys())[-1]
+            frame = odb.steps[step_name].frames[int(frame_number)]
+            field = frame.fieldOutputs[field_id]
+        except (KeyError, IndexError, TypeError, ValueError) as e:
+            raise OdbReadingError("The field " + str(field_id) + " in step " + str(step_name) + ", frame "
+                                  + str(frame_number) + " does not exist in " + str(odb_file_name) + ": " + str(e))
+        # Any other failure of the odb api, like an unknown set or coordinate system, is also a reading error
+        try:
+            element_set = self._element_set(odb, set_name, instance_name)
+            if element_set is not None:
+                field = field.getSubset(region=element_set)
+            field = field.getSubset(position=positions[position])
+            if coordinate_system is not None:
+                system = odb.rootAssembly.datumCsyses[coordinate_system]
+                if deform_system:
+                    field = field.getTransformedField(datumCsys=system, deformationField=frame.fieldOutputs["U"])
+                else:
+                    field = field.getTransformedField(datumCsys=system)
+            values = field.bulkDataBlocks
+            data = np.concatenate([np.array(block.data) for block in values], axis=0)
+            if data.ndim == 2 and data.shape[1] == 1:
+                data = data[:, 0]
+            output = [data]
+            if get_position_numbers:
+                output.append(np.concatenate([np.array(block.integrationPoints) for block in values]))
+                output.append(np.concatenate([np.array(block.elementLabels) for block in values]))
+            if get_frame_value:
+                output.append(frame.frameValue)
+        except Exception as e:
+            raise OdbReadingError("Problems when reading the field " + str(field_id) + " in step " + str(step_name)
+                                  + ", frame " + str(frame_number) + " from " + str(odb_file_name) + ": " + str(e))
+        if len(output) == 1:
+            return output[0]
+        return tuple(output)
+
+    def write_data_to_odb(self, field, field_id, odb_file_name, step_name=None, instance_name=None,
+                          frame_number=None, set_name='', field_description='', invariants=None,
+                          position='INTEGRATION_POINT', frame_value=None):
+        odb_file_name, odb = self._open(odb_file_name, read_only=False)
+        field = np.asarray(field, dtype=float)
+        try:
+            if step_name is None:
+                step_name = "fat_eval"
+            if step_name not in odb.steps:
+                odb.Step(name=step_name, description='', domain=TIME, timePeriod=1.)
+            step = odb.steps[step_name]
+            frame_ids = [frame.frameId for frame in step.frames]
+            if frame_number is None:
+                frame_number = frame_ids[-1] + 1 if frame_ids else 0
+            if frame_number in frame_ids:
+                frame = step.frames[frame_ids.index(frame_number)]
+            else:
+                frame = step.Frame(incrementNumber=frame_number,
+                                   frameValue=float(frame_number if frame_value is None else frame_value),
+                                   description='')
+            instance = self._instance(odb, instance_name)
+            labels = [element.label for element in self._elements(odb, set_name, instance_name)]
+            field_type = SCALAR if field.ndim == 1 else TENSOR_3D_FULL
+            if field_id in frame.fieldOutputs:
+                field_output = frame.fieldOutputs[field_id]
+            else:
+                valid_invariants = [invariant_constants[invariant] for invariant in (invariants or [])]
+                field_output = frame.FieldOutput(name=field_id, description=field_description, type=field_type,
+                                                 validInvariants=valid_invariants)
+            # The values of the integration points of each element are consecutive in field
+            data = tuple((float(value), ) for value in field) if field_type == SCALAR else tuple(
+                tuple(float(component) for component in value) for value in field)
+            field_output.addData(position=positions[position], instance=instance, labels=labels, data=data)
+        except Exception as e:
+            raise OdbWritingError("Problems when writing the field " + str(field_id) + " to " + odb_file_name + ": "
+                                  + str(e))
+        self.modified.add(odb_file_name)
+
+    def create_empty_odb_from_odb(self, new_odb_filename, odb_to_copy):
+        new_odb_filename = os.path.abspath(os.path.expanduser(str(new_odb_filename)))
+        _, odb = self._open(odb_to_copy)
+        self._close(new_odb_filename)
+        # The new odb has the parts, instances and element sets of odb_to_copy but no steps
+        new_odb = odbAccess.Odb(name=os.path.splitext(os.path.basename(new_odb_filename))[0], path=new_odb_filename)
+        for instance_name, instance in odb.rootAssembly.instances.items():
+            part = new_odb.Part(name=str(instance_name), embeddedSpace=THREE_D, type=DEFORMABLE_BODY)
+            part.addNodes(labels=[node.label for node in instance.nodes],
+                          coordinates=[tuple(node.coordinates) for node in instance.nodes])
+            elements = {}
+            for element in instance.elements:
+                elements.setdefault(str(element.type), []).append(element)
+            for element_type, type_elements in elements.items():
+                part.addElements(labels=[element.label for element in type_elements],
+                                 connectivity=[tuple(element.connectivity) for element in type_elements],
+                                 type=element_type)
+            new_instance = new_odb.rootAssembly.Instance(name=str(instance_name), object=part)
+            for set_name, element_set in instance.elementSets.items():
+                if len(element_set.elements):
+                    new_instance.ElementSetFromElementLabels(
+                        name=str(set_name), elementLabels=[element.label for element in element_set.elements])
+        new_odb.save()
+        new_odb.close()
+
+    def get_element_data(self, odb_file_name, element_set_name=None, instance_name=None):
+        _, odb = self._open(odb_file_name)
+        try:
+            instance = self._instance(odb, instance_name)
+            nodal_coordinates = dict((node.label, node.coordinates) for node in instance.nodes)
+            element_data = {}
+            for element in self._elements(odb, element_set_name, instance_name):
+                element_data.setdefault(str(element.type), {})[element.label] = np.array(
+                    [nodal_coordinates[label] for label in element.connectivity])
+        except Exception as e:
+            raise OdbReadingError("Problems when reading the elements of " + str(element_set_name) + " in "
+                                  + str(odb_file_name) + ": " + str(e))
+        return element_data
+
+
+if __name__ == '__main__':
+    output_stream = getattr(sys.stdout, "buffer", sys.stdout)
+    # Messages from Abaqus are sent to stderr so that they do not corrupt the messages
+    sys.stdout = sys.stderr
+    serve(AbaqusOdbBackend(), getattr(sys.stdin, "buffer", sys.stdin), output_stream)
@@ -0,0 +1,118 @@
+import json
+import os
+import pathlib
+
+import numpy as np
+
+
+class CheckpointMismatchError(ValueError):
+    pass
+
+
+class ResultCheckpoint:
+    """
+    Checkpoint of results evaluated in chunks of points. The results are written to a memory mapped .npy file and the
+    completed point ranges are recorded in a json manifest together with a signature of the inputs of the analysis,
+    so that an interrupted analysis only has to evaluate the missing chunks
+    """
+    def __init__(self, directory, signature, points, resume=False):
+        """
+        :param directory:   directory where the results file and the manifest are written
+        :param signature:   json serializable data identifying the inputs of the analysis, values that are not
+                            serializable are represented by their string representation
+        :param points:      number of points of the results
+        :param resume:      If True, the completed chunks of an existing checkpoint are kept. A checkpoint with
+                            another signature or number of points raises CheckpointMismatchError. Otherwise an
+                            existing checkpoint is discarded
+        """
+        self.directory = pathlib.Path(directory).expanduser()
+        self.manifest_file = self.directory / "manifest.json"
+        self.results_file = self.directory / "results.npy"
+        self.signature = json.loads(json.dumps(signature, sort_keys=True, default=str))
+        self.points = points
+        self.completed = []
+        self.results = None
+        manifest = self._read_manifest()
+        if resume and manifest is None:
+            print("There is no checkpoint to resume in " + str(self.directory) + ", all points are evaluated")
+        elif resume:
+            self._check_manifest(manifest)
+            try:
+                self.results = np.load(self.results_file, mmap_mode='r+')
+                self.completed = [tuple(chunk) for chunk in manifest["completed"]]
+            except (OSError, ValueError, KeyError):
+                print("The results file of the checkpoint in " + str(self.directory) + " cannot be read and "
+                      "the checkpoint is discarded")
+        if not self.completed:
+            self.remove()
+
+    def _check_manifest(self, manifest):
+        differences = []
+        if manifest.get("points") != self.points:
+            differences.append("points")
+        stored_signature = manifest.get("signature")
+        if not isinstance(stored_signature, dict) or not isinstance(self.signature, dict):
+            if stored_signature != self.signature:
+                differences.append("signature")
+        else:
+            differences.extend(key for key in sorted(set(stored_signature) | set(self.signature))
+                               if stored_signature.get(key) != self.signature.get(key))
+        if differences:
+            raise CheckpointMismatchError("The checkpoint in " + str(self.directory) + " belongs to another "
+                                          "analysis and cannot be resumed, differences in: " + ", ".join(differences)
+                                          + ". Remove the checkpoint or run without resuming")
+
+    def _read_manifest(self):
+        try:
+            with open(self.manifest_file, 'r') as manifest_file:
+                return json.load(manifest_file)
+        except (OSError, ValueError):
+            return None
+
+    def _write_manifest(self):
+        # The manifest is replaced atomically so that an interruption never leaves a partly written manifest
+        temp_file = self.manifest_file.with_suffix(".tmp")
+        with open(temp_file, 'w') as manifest_file:
+            json.dump({"signature": self.signature, "points": self.points, "completed": self.completed},
+                      manifest_file)
+        os.replace(temp_file, self.manifest_file)
+
+    def is_completed(self, start, stop):
+        """
+        True if the points start:stop are covered by the completed chunks
+        """
+        for completed_start, completed_stop in sorted(self.completed):
+            if completed_start <= start < completed_stop:
+                start = completed_stop
+            if start >= stop:
+                return True
+        return start >= stop
+
+    def store(self, start, stop, values):
+        """
+        Writes the results of the points start:stop to the results file and records the chunk as completed
+        """
+        if self.results is None:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            self.results = np.lib.format.open_memmap(self.results_file, mode='w+', dtype=values.dtype,
+                                                     shape=(self.points, ) + values.shape[1:])
+        self.results[start:stop] = values
+        self.results.flush()
+        self.completed.append((start, stop))
+        self._write_manifest()
+
+    def remove(self, directory=False):
+        """
+        Removes the results file and the manifest
+        :param directory:   If True, also removes the checkpoint directory if it is empty
+        """
+        self.results = None
+        self.completed = []
+        for checkpoint_file in [self.manifest_file, self.results_file]:
+            if checkpoint_file.is_file():
+                checkpoint_file.unlink()
+        if directory:
+            try:
+                self.directory.rmdir()
+            except OSError:
+                pass
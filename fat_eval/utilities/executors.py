@@ -0,0 +1,223 @@
+"""
+Executors running lists of jobs, tuples (func, args, kw_args), with the same timeout and error handling for all
+backends. The result of run is the list of the return values of the jobs in the order of the jobs. An exception raised
+by a job is raised by run and the jobs not yet started are cancelled. If the jobs are not done within timeout seconds,
+ExecutorTimeoutError is raised.
+"""
+import multiprocessing
+import os
+import signal
+import time
+
+from concurrent.futures import FIRST_EXCEPTION, ProcessPoolExecutor, ThreadPoolExecutor, wait
+
+from fat_eval.utilities.shared_arrays import fork_lock
+
+
+class ExecutorTimeoutError(TimeoutError):
+    pass
+
+
+def process_context():
+    """
+    The multiprocessing context of worker processes, fork if available so that the workers inherit the data of the
+    calling process instead of receiving pickled copies
+    """
+    if "fork" in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("fork")
+    return multiprocessing.get_context()
+
+
+class WorkerPool:
+    """
+    Pool of worker processes based on concurrent.futures.ProcessPoolExecutor, so that a worker that dies, for instance
+    killed when running out of memory, raises BrokenProcessPool for its jobs instead of leaving them unfinished. The
+    process ids of the workers are recorded when they start so that terminate can stop workers that are still running
+    jobs after an error or a timeout. Used as a context manager the workers are terminated when an exception is raised
+    """
+    def __init__(self, workers, initializer=None, initargs=()):
+        context = process_context()
+        self._pids = context.SimpleQueue()
+        self.pool = ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=_start_worker,
+                                        initargs=(self._pids, initializer, initargs))
+
+    def submit(self, func, *args, **kw_args):
+        # The workers are forked by the first submit, see fork_lock
+        with fork_lock:
+            return self.pool.submit(func, *args, **kw_args)
+
+    def shutdown(self, wait=True):
+        self.pool.shutdown(wait=wait)
+
+    def terminate(self):
+        while not self._pids.empty():
+            try:
+                os.kill(self._pids.get(), signal.SIGTERM)
+            except OSError:
+                # The worker has already exited
+                pass
+        self.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None:
+            self.shutdown()
+        else:
+            self.terminate()
+
+
+def _start_worker(pids, initializer, initargs):
+    pids.put(os.getpid())
+    if initializer is not None:
+        initializer(*initargs)
+
+
+def _deadline(timeout):
+    return None if timeout is None else time.perf_counter() + timeout
+
+
+def _remaining_time(deadline):
+    return None if deadline is None else max(deadline - time.perf_counter(), 0.)
+
+
+class SerialExecutor:
+    """
+    Runs the jobs one at a time in the calling process. The timeout is checked before each job is started
+    """
+    name = "serial"
+    in_process = True
+
+    def __init__(self, workers=1, timeout=None):
+        self.workers = 1
+        self.timeout = timeout
+
+    def run(self, jobs, initializer=None, initargs=()):
+        """
+        :param initializer: function called with initargs once in each worker before the jobs are run, in the calling
+                            process for the serial and the thread executor
+        """
+        if initializer is not None:
+            initializer(*initargs)
+        deadline = _deadline(self.timeout)
+        results = []
+        for func, args, kw_args in jobs:
+            if deadline is not None and _remaining_time(deadline) == 0.:
+                raise ExecutorTimeoutError(str(len(jobs) - len(results)) + " jobs were not started within "
+                                           + str(self.timeout) + " s")
+            results.append(func(*args, **kw_args))
+        return results
+
+
+class ThreadExecutor(SerialExecutor):
+    """
+    Runs the jobs in a pool of threads in the calling process. Suitable for jobs waiting for other processes, like
+    odb reads, and for numpy kernels releasing the GIL. Jobs that are running when the timeout is reached are not
+    interrupted, their results are discarded
+    """
+    name = "thread"
+    in_process = True
+
+    def __init__(self, workers=1, timeout=None):
+        super().__init__(workers, timeout)
+        self.workers = max(1, workers or 1)
+
+    def run(self, jobs, initializer=None, initargs=()):
+        if self.workers == 1 or len(jobs) <= 1:
+            return super().run(jobs, initializer, initargs)
+        if initializer is not None:
+            initializer(*initargs)
+        pool = ThreadPoolExecutor(max_workers=min(self.workers, len(jobs)))
+        futures = []
+        try:
+            futures.extend(pool.submit(func, *args, **kw_args) for func, args, kw_args in jobs)
+            done, not_done = wait(futures, timeout=self.timeout, return_when=FIRST_EXCEPTION)
+            for future in futures:
+                if future in done and future.exception() is not None:
+                    raise future.exception()
+            if not_done:
+                raise ExecutorTimeoutError(str(len(not_done)) + " jobs were not done within " + str(self.timeout)
+                                           + " s")
+            return [future.result() for future in futures]
+        finally:
+            # The jobs not yet started are cancelled here, shutdown(cancel_futures=True) needs python 3.9
+            for future in futures:
+                future.cancel()
+            pool.shutdown(wait=False)
+
+
+class ProcessExecutor(SerialExecutor):
+    """
+    Runs the jobs in a WorkerPool of worker processes. The jobs and their results are pickled, data given to the
+    initializer is inherited by the workers when they are forked. A worker that dies raises BrokenProcessPool and the
+    workers are terminated when a job fails or the timeout is reached. With one worker, or one job, the jobs are run in
+    the calling process
+    """
+    name = "process"
+    in_process = False
+
+    def __init__(self, workers=1, timeout=None):
+        super().__init__(workers, timeout)
+        self.workers = max(1, workers or 1)
+
+    def pool(self, initializer=None, initargs=()):
+        return WorkerPool(self.workers, initializer, initargs)
+
+    def run(self, jobs, initializer=None, initargs=()):
+        if self.workers == 1 or len(jobs) <= 1:
+            return super().run(jobs, initializer, initargs)
+        with WorkerPool(min(self.workers, len(jobs)), initializer, initargs) as pool:
+            futures = [pool.submit(func, *args, **kw_args) for func, args, kw_args in jobs]
+            done, not_done = wait(futures, timeout=self.timeout, return_when=FIRST_EXCEPTION)
+            for future in futures:
+                if future in done and future.exception() is not None:
+                    raise future.exception()
+            if not_done:
+                raise ExecutorTimeoutError(str(len(not_done)) + " jobs were not done within " + str(self.timeout)
+                                           + " s")
+            return [future.result() for future in futures]
+
+
+executors = {SerialExecutor.name: SerialExecutor, ThreadExecutor.name: ThreadExecutor,
+             ProcessExecutor.name: ProcessExecutor}
+
+
+def create_executor(backend="process", workers=1, timeout=None):
+    """
+    :param backend: name of the backend in executors, or an executor object which is returned unchanged
+    :param workers: number of threads or processes used
+    :param timeout: time in seconds for running all jobs given to run, default is no timeout
+    """
+    if not isinstance(backend, str):
+        return backend
+    if backend not in executors:
+        raise ValueError("The executor " + backend + " is not supported, valid executors are "
+                         + ", ".join(executors))
+    return executors[backend](workers, timeout)
+
+
+def create_stage_executors(stages, backends=None, workers=1, timeout=None, default_backend="process"):
+    """
+    Creates one executor for each stage of an analysis
+    :param stages:      names of the stages
+    :param backends:    dict with the backend name, or executor object, of the stages that do not use default_backend
+    :return:            dict with the executor of each stage
+    """
+    backends = dict(backends or {})
+    unknown_stages = set(backends) - set(stages)
+    if unknown_stages:
+        raise ValueError("The stages " + ", ".join(sorted(unknown_stages)) + " do not exist, valid stages are "
+                         + ", ".join(stages))
+    return {stage: create_executor(backends.get(stage, default_backend), workers, timeout) for stage in stages}
+
+
+def parse_stage_executor(argument):
+    """
+    Converts a command line argument "stage=backend" to a tuple (stage, backend)
+    """
+    stage, _, backend = argument.partition("=")
+    if backend not in executors:
+        raise ValueError("The executor " + backend + " is not supported, valid executors are "
+                         + ", ".join(executors))
+    return stage, backend
@@ -0,0 +1,165 @@
+import copy
+
+from collections import OrderedDict
+
+from abaqus_python_interface import OdbReadingError, OdbWritingError
+
+from fat_eval.utilities.executors import ProcessExecutor
+from fat_eval.utilities.profiling import nbytes
+
+# Upper limit in bytes of the field data collected in one batch of writes
+max_batch_memory = 2**27
+
+# The position of the odb file in the positional arguments of the odb interface methods
+_odb_file_arguments = {"read_data_from_odb": ("odb_file_name", 1), "write_data_to_odb": ("odb_file_name", 2),
+                       "create_empty_odb_from_odb": ("new_odb_filename", 0), "get_steps": ("odb_file_name", 0),
+                       "get_frames": ("odb_file_name", 0), "get_element_data": ("odb_file_name", 0)}
+
+
+def request_odb_file(request):
+    """
+    The odb file a request, a tuple (method, args, kwargs), operates on
+    """
+    method, args, kwargs = request
+    name, position = _odb_file_arguments.get(method, ("odb_file_name", 0))
+    if name in kwargs:
+        return str(kwargs[name])
+    if len(args) > position:
+        return str(args[position])
+    return None
+
+
+def group_by_odb_file(requests):
+    """
+    :return:    OrderedDict with the odb files as keys and the indices of the requests on each file as values, in the
+                order of the first request on each file
+    """
+    groups = OrderedDict()
+    for i, request in enumerate(requests):
+        groups.setdefault(request_odb_file(request), []).append(i)
+    return groups
+
+
+def execute_requests(abq, requests, return_errors=False):
+    """
+    Executes requests, tuples (method, args, kwargs), by abq. If abq supports batches, like OdbServerInterface,
+    all requests are sent as one batch, otherwise the requests are executed one at a time
+    :param return_errors:   If True, an odb reading or writing error is returned as the result of the request
+                            instead of being raised
+    :return:                list with the result of each request
+    """
+    batch = getattr(abq, "batch", None)
+    if batch is not None:
+        return batch(requests, return_errors=return_errors)
+    results = []
+    for method, args, kwargs in requests:
+        try:
+            results.append(getattr(abq, method)(*args, **kwargs))
+        except (OdbReadingError, OdbWritingError) as e:
+            if not return_errors:
+                raise
+            results.append(e)
+    return results
+
+
+def close_odb_interface(abq):
+    """
+    Stops the odb server process if abq is, or wraps, an OdbServerInterface
+    """
+    close = getattr(abq, "close", None)
+    if close is not None:
+        close()
+
+
+def _execute_read_job(abq, requests, extract_only=False, close=True):
+    try:
+        results = execute_requests(abq, requests)
+    finally:
+        # An odb server started by the job is stopped when the job is done
+        if close:
+            close_odb_interface(abq)
+    if not extract_only:
+        return results
+
+
+def read_odb_fields(abq, requests, cpus=1, extract_only=False, executor=None):
+    """
+    Reads many fields in parallel. If abq supports batches of reads, like OdbServerInterface, the reads are planned
+    into one job per odb file, where all fields of a file are read by one server process that opens the file once.
+    Otherwise each field is read by its own job. The jobs are run in the calling process if cpus is 1
+    :param requests:        list of dicts with keyword arguments to read_data_from_odb
+    :param executor:        executor running the jobs, see fat_eval.utilities.executors, default is a ProcessExecutor
+                            with cpus processes
+    :param extract_only:    Only extract the fields in the worker processes, used together with the odb cache where
+                            the fields are then memory mapped from the cache by the calling process
+    :return:                list with the fields, in the order of requests
+    """
+    if executor is None:
+        executor = ProcessExecutor(cpus)
+    requests = [("read_data_from_odb", [], kw_args) for kw_args in requests]
+    if executor.workers <= 1 or len(requests) <= 1:
+        return execute_requests(abq, requests)
+    batch_reads = getattr(abq, "batch_reads", False)
+    if batch_reads:
+        groups = list(group_by_odb_file(requests).values())
+    else:
+        groups = [[i] for i in range(len(requests))]
+    if len(groups) == 1:
+        return execute_requests(abq, requests)
+    jobs = []
+    for indices in groups:
+        job_abq = abq
+        if batch_reads and executor.in_process:
+            # Each thread reads through its own odb server
+            job_abq = copy.deepcopy(abq)
+        jobs.append((_execute_read_job, [job_abq, [requests[i] for i in indices], extract_only,
+                                         job_abq is not abq or not executor.in_process], {}))
+    job_results = executor.run(jobs)
+    if extract_only:
+        return execute_requests(abq, requests)
+    results = [None]*len(requests)
+    for indices, group_results in zip(groups, job_results):
+        for i, result in zip(indices, group_results):
+            results[i] = result
+    return results
+
+
+class OdbWriteBatch:
+    """
+    Collects writes to odb files and sends them as batches, where each written odb file is saved once per batch. The
+    collected writes are sent when the collected field data exceeds max_memory bytes and by flush()
+    """
+    def __init__(self, abq, max_memory=None, error_handler=None):
+        """
+        :param error_handler:   function called with the keyword arguments and the error for each failed write,
+                                default is to raise the error
+        """
+        self.abq = abq
+        self.max_memory = max_batch_memory if max_memory is None else max_memory
+        self.error_handler = error_handler
+        self.requests = []
+        self.memory = 0
+
+    def write_data_to_odb(self, **kw_args):
+        self.requests.append(("write_data_to_odb", [], kw_args))
+        self.memory += nbytes(kw_args["field"])
+        if self.memory > self.max_memory:
+            self.flush()
+
+    def flush(self):
+        requests = self.requests
+        self.requests = []
+        self.memory = 0
+        if not requests:
+            return
+        for (_, _, kw_args), result in zip(requests, execute_requests(self.abq, requests,
+                                                                      return_errors=self.error_handler is not None)):
+            if isinstance(result, Exception):
+                self.error_handler(kw_args, result)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None:
+            self.flush()
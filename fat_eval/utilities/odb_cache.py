@@ -0,0 +1,196 @@
+import hashlib
+import inspect
+import json
+import os
+import pathlib
+import shutil
+import tempfile
+
+import numpy as np
+
+from fat_eval.utilities.odb_batches import execute_requests
+
+default_cache_directory = pathlib.Path(os.environ.get("FAT_EVAL_CACHE_DIR", "~/.cache/fat_eval/odb")).expanduser()
+default_max_cache_size = float(os.environ.get("FAT_EVAL_CACHE_SIZE", 20e9))
+
+
+def odb_file_signature(odb_file_name):
+    """
+    Data identifying a version of an odb file, the resolved path, the modification time and the size
+    """
+    path = pathlib.Path(odb_file_name).expanduser().resolve()
+    stat = path.stat()
+    return {"path": str(path), "mtime": stat.st_mtime_ns, "size": stat.st_size}
+
+
+def cache_key(*data):
+    """
+    Hash of json serializable data, values that are not serializable are represented by their string representation
+    """
+    return hashlib.sha1(json.dumps(data, sort_keys=True, default=str).encode()).hexdigest()
+
+
+class OdbFieldCache:
+    """
+    On-disk cache of arrays extracted from odb-files. Each entry is a directory with one .npy file per array and a
+    small json manifest. The arrays are loaded memory-mapped, empty arrays, which cannot be memory-mapped, are stored
+    in the manifest. An entry is stored by writing new array files and then replacing the manifest atomically, so
+    that a stale or corrupt entry is always replaced by the fresh one. The least recently used entries are removed
+    when the total size of the cache exceeds max_size bytes
+    """
+    def __init__(self, directory=None, max_size=None):
+        self.directory = pathlib.Path(directory or default_cache_directory).expanduser()
+        self.max_size = default_max_cache_size if max_size is None else max_size
+
+    def load(self, key):
+        entry = self.directory / key
+        try:
+            manifest = self._read_manifest(entry)
+            data = [self._load_item(entry, item) for item in manifest["items"]]
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+        os.utime(entry / "entry.json")
+        if manifest["tuple"]:
+            return tuple(data)
+        return data[0]
+
+    @staticmethod
+    def _read_manifest(entry):
+        with open(entry / "entry.json", 'r') as manifest_file:
+            return json.load(manifest_file)
+
+    @staticmethod
+    def _load_item(entry, item):
+        if item is None:
+            return None
+        if isinstance(item, dict):
+            return np.empty(item["shape"], dtype=np.lib.format.descr_to_dtype(item["dtype"]))
+        return np.load(entry / item, mmap_mode='r')
+
+    def store(self, key, data, description=None):
+        is_tuple = isinstance(data, tuple)
+        items = data if is_tuple else (data, )
+        arrays = [None if item is None else np.asarray(item) for item in items]
+        if any(array is not None and array.dtype.hasobject for array in arrays):
+            return False
+        entry = self.directory / key
+        entry.mkdir(parents=True, exist_ok=True)
+        # The array files of each store get unique names, the files of an earlier version of the entry are removed
+        # when the manifest has been replaced
+        file_descriptor, temp_manifest = tempfile.mkstemp(dir=entry, prefix=".tmp_", suffix=".json")
+        os.close(file_descriptor)
+        prefix = pathlib.Path(temp_manifest).stem[len(".tmp_"):]
+        manifest = {"tuple": is_tuple, "items": [], "description": description,
+                    "size": sum(0 if array is None else array.nbytes for array in arrays)}
+        try:
+            for i, array in enumerate(arrays):
+                if array is None:
+                    manifest["items"].append(None)
+                elif array.size == 0:
+                    manifest["items"].append({"shape": array.shape,
+                                              "dtype": np.lib.format.dtype_to_descr(array.dtype)})
+                else:
+                    np.save(entry / (prefix + "_" + str(i) + ".npy"), array)
+                    manifest["items"].append(prefix + "_" + str(i) + ".npy")
+            with open(temp_manifest, 'w') as manifest_file:
+                json.dump(manifest, manifest_file, default=str)
+            try:
+                old_items = list(self._read_manifest(entry)["items"])
+            except (OSError, ValueError, KeyError, TypeError):
+                old_items = []
+            os.replace(temp_manifest, entry / "entry.json")
+        except OSError:
+            for item in manifest["items"]:
+                if isinstance(item, str):
+                    (entry / item).unlink(missing_ok=True)
+            pathlib.Path(temp_manifest).unlink(missing_ok=True)
+            return False
+        for item in old_items:
+            if isinstance(item, str) and item not in manifest["items"]:
+                (entry / item).unlink(missing_ok=True)
+        self.evict()
+        return True
+
+    def entries(self):
+        entries = []
+        if self.directory.is_dir():
+            for entry in self.directory.iterdir():
+                manifest_file = entry / "entry.json"
+                if manifest_file.is_file():
+                    size = sum(f.stat().st_size for f in entry.iterdir())
+                    entries.append((manifest_file.stat().st_mtime, size, entry))
+        return entries
+
+    def evict(self):
+        entries = sorted(self.entries(), key=lambda entry: entry[0])
+        total_size = sum(size for _, size, _ in entries)
+        for _, size, entry in entries:
+            if total_size <= self.max_size:
+                break
+            shutil.rmtree(entry, ignore_errors=True)
+            total_size -= size
+
+    def clear(self):
+        for _, _, entry in self.entries():
+            shutil.rmtree(entry, ignore_errors=True)
+
+
+class CachedABQInterface:
+    """
+    Wrapper around an ABQInterface object that caches the fields read by read_data_from_odb in an OdbFieldCache.
+    The cache is keyed on the odb file (path, modification time and size) and all arguments to read_data_from_odb, i.e.
+    step, frame, element set, instance, field, coordinate system and deform flag. All other methods are forwarded to
+    the wrapped object
+    """
+    def __init__(self, abq, cache=None):
+        self.abq = abq
+        self.cache = cache if cache is not None else OdbFieldCache()
+
+    def __getattr__(self, item):
+        if item in ("abq", "cache"):
+            raise AttributeError(item)
+        return getattr(self.abq, item)
+
+    def _read_cache_key(self, args, kwargs):
+        """
+        The cache key and description of a read_data_from_odb call, None if the call cannot be cached
+        """
+        try:
+            arguments = inspect.signature(self.abq.read_data_from_odb).bind(*args, **kwargs)
+            arguments.apply_defaults()
+            arguments = dict(arguments.arguments)
+            odb_signature = odb_file_signature(arguments["odb_file_name"])
+        except (TypeError, ValueError, KeyError, OSError):
+            return None, None
+        return cache_key(odb_signature, arguments), {"odb": odb_signature, "arguments": arguments}
+
+    def read_data_from_odb(self, *args, **kwargs):
+        key, description = self._read_cache_key(args, kwargs)
+        if key is None:
+            return self.abq.read_data_from_odb(*args, **kwargs)
+        data = self.cache.load(key)
+        if data is None:
+            data = self.abq.read_data_from_odb(*args, **kwargs)
+            self.cache.store(key, data, description=description)
+        return data
+
+    def batch(self, requests, return_errors=False):
+        """
+        Executes a batch of requests, see fat_eval.utilities.odb_batches.execute_requests. Cached fields are loaded
+        from the cache and the remaining requests are sent to the wrapped object as one batch
+        """
+        results = [None]*len(requests)
+        remaining = []
+        for i, (method, args, kwargs) in enumerate(requests):
+            key, description = (None, None)
+            if method == "read_data_from_odb":
+                key, description = self._read_cache_key(args, kwargs)
+                results[i] = None if key is None else self.cache.load(key)
+            if results[i] is None:
+                remaining.append((i, key, description))
+        remaining_results = execute_requests(self.abq, [requests[i] for i, _, _ in remaining], return_errors)
+        for (i, key, description), result in zip(remaining, remaining_results):
+            results[i] = result
+            if key is not None and not isinstance(result, Exception):
+                self.cache.store(key, result, description=description)
+        return results
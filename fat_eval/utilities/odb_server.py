@@ -0,0 +1,308 @@
+import argparse
+import pathlib
+import subprocess
+import sys
+import threading
+
+import numpy as np
+
+from abaqus_python_interface import ABQInterface, OdbReadingError, OdbWritingError
+
+from fat_eval.utilities.odb_cache import CachedABQInterface
+from fat_eval.utilities.odb_server_protocol import read_message, serve, write_message
+
+abaqus_server_script = pathlib.Path(__file__).parent / "abaqus_odb_server.py"
+
+
+class OdbServerError(RuntimeError):
+    pass
+
+
+_errors = {"OdbReadingError": OdbReadingError, "OdbWritingError": OdbWritingError}
+
+
+class OdbServerInterface:
+    """
+    Client of a long-lived odb server process with the same methods as ABQInterface. The server keeps the odb files
+    open between the requests instead of starting a new Abaqus python process for each read and write. The server
+    process is started at the first request and is stopped by close(). Copies of the object, for instance in worker
+    processes, start their own server when used
+    """
+    # Reads are planned into one batch per odb file by fat_eval.utilities.odb_batches.read_odb_fields
+    batch_reads = True
+
+    def __init__(self, command):
+        """
+        :param command: command starting the server, as a list, see abaqus_odb_server_command and
+                        numpy_odb_server_command
+        """
+        self.command = list(command)
+        self.process = None
+        self.lock = threading.Lock()
+
+    def __reduce__(self):
+        return self.__class__, (self.command, )
+
+    def start(self):
+        if self.process is None or self.process.poll() is not None:
+            self.process = subprocess.Popen(self.command, stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+
+    def close(self):
+        with self.lock:
+            if self.process is not None and self.process.poll() is None:
+                try:
+                    write_message(self.process.stdin, {"method": "close", "args": [], "kwargs": {}})
+                    read_message(self.process.stdout)
+                except (OSError, EOFError):
+                    pass
+                self.process.stdin.close()
+                self.process.wait()
+                self.process.stdout.close()
+            self.process = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def _send(self, message):
+        with self.lock:
+            self.start()
+            try:
+                write_message(self.process.stdin, message)
+                return read_message(self.process.stdout)
+            except (OSError, EOFError) as e:
+                raise OdbServerError("Lost the connection to the odb server started by " + " ".join(self.command)
+                                     + ": " + str(e))
+
+    @staticmethod
+    def _result(response):
+        if "error" in response:
+            error_name, message = response["error"]
+            raise _errors.get(error_name, OdbServerError)(message)
+        return response["result"]
+
+    def request(self, method, *args, **kwargs):
+        return self._result(self._send({"method": method, "args": list(args), "kwargs": kwargs}))
+
+    def batch(self, requests, return_errors=False):
+        """
+        Sends many requests at once, each odb file is opened once and the written odb files are saved once after all
+        requests
+        :param requests:        list of (method, args, kwargs) tuples
+        :param return_errors:   If True, the errors of failed requests are returned as results instead of raised
+        :return:                list with the result of each request
+        """
+        if not requests:
+            return []
+        responses = self._result(self._send({"method": "batch", "args": [
+            {"method": method, "args": list(args), "kwargs": kwargs} for method, args, kwargs in requests]}))
+        results = []
+        for response in responses:
+            try:
+                results.append(self._result(response))
+            except (OdbReadingError, OdbWritingError, OdbServerError) as e:
+                if not return_errors:
+                    raise
+                results.append(e)
+        return results
+
+    def read_data_from_odb(self, field_id, odb_file_name, step_name=None, frame_number=-1, set_name='',
+                           instance_name=None, get_position_numbers=False, get_frame_value=False,
+                           position='INTEGRATION_POINT', coordinate_system=None, rotating_system=False,
+                           deform_system=True):
+        return self.request("read_data_from_odb", field_id=field_id, odb_file_name=odb_file_name,
+                            step_name=step_name, frame_number=frame_number, set_name=set_name,
+                            instance_name=instance_name, get_position_numbers=get_position_numbers,
+                            get_frame_value=get_frame_value, position=position, coordinate_system=coordinate_system,
+                            rotating_system=rotating_system, deform_system=deform_system)
+
+    def write_data_to_odb(self, field, field_id, odb_file_name, step_name=None, instance_name=None,
+                          frame_number=None, set_name='', field_description='', invariants=None,
+                          position='INTEGRATION_POINT', frame_value=None):
+        return self.request("write_data_to_odb", field=field, field_id=field_id, odb_file_name=odb_file_name,
+                            step_name=step_name, instance_name=instance_name, frame_number=frame_number,
+                            set_name=set_name, field_description=field_description, invariants=invariants,
+                            position=position, frame_value=frame_value)
+
+    def create_empty_odb_from_odb(self, new_odb_filename, odb_to_copy):
+        return self.request("create_empty_odb_from_odb", new_odb_filename=new_odb_filename, odb_to_copy=odb_to_copy)
+
+    def get_steps(self, odb_file_name):
+        return self.request("get_steps", odb_file_name)
+
+    def get_frames(self, odb_file_name, step_name):
+        return self.request("get_frames", odb_file_name, step_name=step_name)
+
+    def get_element_data(self, odb_file_name, element_set_name=None, instance_name=None):
+        return self.request("get_element_data", odb_file_name, element_set_name, instance_name)
+
+
+def abaqus_odb_server_command(abaqus):
+    """
+    Command starting the odb server in the Abaqus python interpreter
+    :param abaqus:  the Abaqus command, as given by the *abaqus keyword in the input files
+    """
+    return [abaqus, "python", str(abaqus_server_script)]
+
+
+def numpy_odb_server_command():
+    """
+    Command starting the odb server with the NumpyOdbBackend, for testing without Abaqus
+    """
+    return [sys.executable, "-m", "fat_eval.utilities.odb_server"]
+
+
+def create_odb_interface(abaqus, use_cache=True, odb_server=False, **abq_kwargs):
+    """
+    The object used for reading and writing odb files
+    :param abaqus:      the Abaqus command
+    :param use_cache:   Wrap the interface in a CachedABQInterface
+    :param odb_server:  Use a long-lived odb server process instead of one Abaqus process per request
+    :param abq_kwargs:  Keyword arguments to ABQInterface if the odb server is not used
+    """
+    if odb_server:
+        abq = OdbServerInterface(abaqus_odb_server_command(abaqus))
+    else:
+        abq = ABQInterface(abaqus, **abq_kwargs)
+    if use_cache:
+        abq = CachedABQInterface(abq)
+    return abq
+
+
+class NumpyOdbBackend:
+    """
+    Stand-in for the Abaqus backend of the odb server for testing the server without Abaqus. An "odb file" is a
+    .npz file with the fields stored as arrays named "step/frame/field/set/instance", the element labels of the
+    values, the frame values and the element data of the mesh. The files are kept in memory while the server is
+    running and the modified files are written by flush
+    """
+    def __init__(self):
+        self.odbs = {}
+        self.modified = set()
+
+    def _open(self, odb_file_name, create=False):
+        odb_file_name = str(pathlib.Path(odb_file_name).expanduser())
+        if odb_file_name not in self.odbs:
+            path = pathlib.Path(odb_file_name)
+            if path.is_file():
+                with np.load(path) as data:
+                    self.odbs[odb_file_name] = {key: data[key] for key in data.files}
+            elif create:
+                self.odbs[odb_file_name] = {}
+            else:
+                raise OdbReadingError("The odb file " + odb_file_name + " does not exist")
+        return odb_file_name, self.odbs[odb_file_name]
+
+    def flush(self):
+        for odb_file_name in self.modified:
+            with open(odb_file_name, 'wb') as odb_file:
+                np.savez(odb_file, **self.odbs[odb_file_name])
+        self.modified.clear()
+
+    def close(self):
+        self.flush()
+        self.odbs.clear()
+
+    @staticmethod
+    def _steps(odb):
+        steps = []
+        for key in odb:
+            if key.count("/") == 4 and key.split("/")[0] not in steps:
+                steps.append(key.split("/")[0])
+        return steps
+
+    @staticmethod
+    def _frames(odb, step_name):
+        return sorted({int(key.split("/")[1]) for key in odb
+                       if key.count("/") == 4 and key.startswith(step_name + "/")})
+
+    def get_steps(self, odb_file_name):
+        return self._steps(self._open(odb_file_name)[1])
+
+    def get_frames(self, odb_file_name, step_name):
+        return self._frames(self._open(odb_file_name)[1], step_name)
+
+    def read_data_from_odb(self, field_id, odb_file_name, step_name=None, frame_number=-1, set_name='',
+                           instance_name=None, get_position_numbers=False, get_frame_value=False, **_):
+        _, odb = self._open(odb_file_name)
+        if step_name is None:
+            step_name = self._steps(odb)[-1]
+        if frame_number == -1:
+            frames = self._frames(odb, step_name)
+            frame_number = frames[-1] if frames else 0
+        key = "/".join([step_name, str(frame_number), field_id, str(set_name or ''), str(instance_name or '')])
+        if key not in odb:
+            raise OdbReadingError("The field " + key + " does not exist in " + str(odb_file_name))
+        output = [odb[key]]
+        if get_position_numbers:
+            labels = odb[key + "/labels"]
+            # The values of an element are consecutive, the integration points are numbered from 1 in each element
+            first_value = np.r_[True, labels[1:] != labels[:-1]]
+            element_start = np.maximum.accumulate(np.where(first_value, np.arange(labels.shape[0]), 0))
+            output += [np.arange(labels.shape[0]) - element_start + 1, labels]
+        if get_frame_value:
+            output.append(float(odb.get(key.rsplit("/", 3)[0] + "/value", frame_number)))
+        if len(output) == 1:
+            return output[0]
+        return tuple(output)
+
+    def write_data_to_odb(self, field, field_id, odb_file_name, step_name=None, instance_name=None, frame_number=None,
+                          set_name='', field_description='', invariants=None, position='INTEGRATION_POINT',
+                          frame_value=None):
+        odb_file_name, odb = self._open(odb_file_name, create=True)
+        if step_name is None:
+            step_name = "step"
+        if frame_number is None:
+            frames = self._frames(odb, step_name)
+            frame_number = frames[-1] + 1 if frames else 0
+        key = "/".join([step_name, str(frame_number), field_id, str(set_name or ''), str(instance_name or '')])
+        field = np.asarray(field)
+        odb[key] = field
+        odb[key + "/labels"] = odb.get("elements/labels/" + str(set_name or ''), np.arange(1, field.shape[0] + 1))
+        odb["/".join([step_name, str(frame_number), "value"])] = np.array(frame_value or frame_number, dtype=float)
+        self.modified.add(odb_file_name)
+
+    def create_empty_odb_from_odb(self, new_odb_filename, odb_to_copy):
+        _, odb = self._open(odb_to_copy)
+        new_odb_filename, _ = self._open(new_odb_filename, create=True)
+        self.odbs[new_odb_filename] = {key: value for key, value in odb.items() if key.startswith("elements/")}
+        self.modified.add(new_odb_filename)
+
+    def set_element_data(self, odb_file_name, element_data, element_set_name=None, integration_point_labels=None):
+        """
+        Stores the mesh of an odb file, only supported by the stand-in backend
+        """
+        odb_file_name, odb = self._open(odb_file_name, create=True)
+        for element_type, element_coordinates in element_data.items():
+            odb["elements/" + element_type + "/labels"] = np.array(list(element_coordinates.keys()))
+            odb["elements/" + element_type + "/coordinates"] = np.array(list(element_coordinates.values()))
+        if integration_point_labels is not None:
+            odb["elements/labels/" + str(element_set_name or '')] = np.asarray(integration_point_labels)
+        self.modified.add(odb_file_name)
+
+    def get_element_data(self, odb_file_name, element_set_name=None, instance_name=None):
+        _, odb = self._open(odb_file_name)
+        element_data = {}
+        for key in odb:
+            parts = key.split("/")
+            if len(parts) == 3 and parts[0] == "elements" and parts[2] == "labels" and parts[1] != "labels":
+                coordinates = odb["elements/" + parts[1] + "/coordinates"]
+                element_data[parts[1]] = {int(label): coordinates[i] for i, label in enumerate(odb[key])}
+        return element_data
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Odb server using the numpy stand-in backend, communicating with "
+                                                 "the protocol in fat_eval.utilities.odb_server_protocol over "
+                                                 "stdin and stdout")
+    parser.parse_args()
+    output_stream = sys.stdout.buffer
+    # Anything printed by the backend is sent to stderr so that it does not corrupt the messages
+    sys.stdout = sys.stderr
+    serve(NumpyOdbBackend(), sys.stdin.buffer, output_stream)
+
+
+if __name__ == '__main__':
+    main()
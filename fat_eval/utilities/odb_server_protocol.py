@@ -0,0 +1,116 @@
+"""
+Message protocol between fat_eval and the odb server process. The server runs in the Abaqus python interpreter, which
+can be python 2, so this module is kept compatible with python 2 and only depends on numpy.
+
+Messages are pickled with protocol 2 and sent with an 8 byte length prefix. Numpy arrays and paths are converted to
+plain python types before pickling so that the messages do not depend on the numpy versions of the two interpreters.
+A request is a dict {"method": name, "args": list, "kwargs": dict}, the method "batch" has a list of requests in
+"args" and the method "close" stops the server. A response is a dict {"result": value} or
+{"error": [exception class name, message]}
+"""
+from __future__ import print_function
+
+import pickle
+import struct
+
+import numpy as np
+
+_header = struct.Struct(">Q")
+
+
+def encode(data):
+    if isinstance(data, np.ndarray):
+        data = np.ascontiguousarray(data)
+        return {"__ndarray__": [data.dtype.str, list(data.shape), data.tobytes()]}
+    if isinstance(data, np.generic):
+        return data.item()
+    if isinstance(data, dict):
+        return dict((encode(key), encode(value)) for key, value in data.items())
+    if isinstance(data, (list, tuple)):
+        encoded = [encode(item) for item in data]
+        return tuple(encoded) if isinstance(data, tuple) else encoded
+    if hasattr(data, "__fspath__"):
+        return data.__fspath__()
+    return data
+
+
+def decode(data):
+    if isinstance(data, dict):
+        if "__ndarray__" in data:
+            dtype, shape, buffer = data["__ndarray__"]
+            if not isinstance(buffer, bytes):
+                buffer = buffer.encode("latin1")
+            return np.frombuffer(buffer, dtype=np.dtype(dtype)).reshape(shape).copy()
+        return dict((decode(key), decode(value)) for key, value in data.items())
+    if isinstance(data, list):
+        return [decode(item) for item in data]
+    if isinstance(data, tuple):
+        return tuple(decode(item) for item in data)
+    return data
+
+
+def write_message(stream, message):
+    data = pickle.dumps(encode(message), 2)
+    stream.write(_header.pack(len(data)))
+    stream.write(data)
+    stream.flush()
+
+
+def _read_exactly(stream, size):
+    chunks = []
+    while size > 0:
+        chunk = stream.read(size)
+        if not chunk:
+            raise EOFError("The odb server connection was closed")
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b"".join(chunks)
+
+
+def read_message(stream):
+    size, = _header.unpack(_read_exactly(stream, _header.size))
+    data = _read_exactly(stream, size)
+    try:
+        message = pickle.loads(data, encoding="latin1")
+    except TypeError:
+        # python 2
+        message = pickle.loads(data)
+    return decode(message)
+
+
+def serve(backend, input_stream, output_stream):
+    """
+    Serves requests from input_stream until a close request is received or the stream is closed. The backend keeps
+    the odb files open between requests and saves the modified files by backend.flush() after each request, or
+    after all requests of a batch
+    """
+    while True:
+        try:
+            request = read_message(input_stream)
+        except EOFError:
+            break
+        if request["method"] == "close":
+            write_message(output_stream, {"result": None})
+            break
+        if request["method"] == "batch":
+            response = {"result": [_handle_request(backend, sub_request) for sub_request in request["args"]]}
+        else:
+            response = _handle_request(backend, request)
+        flush_error = _call_backend(backend.flush)
+        if "error" in flush_error and "error" not in response:
+            response = flush_error
+        write_message(output_stream, response)
+    backend.close()
+
+
+def _handle_request(backend, request):
+    if request["method"].startswith("_") or not hasattr(backend, request["method"]):
+        return {"error": ["OdbServerError", "The odb server does not support the method " + request["method"]]}
+    return _call_backend(getattr(backend, request["method"]), *request.get("args", []), **request.get("kwargs", {}))
+
+
+def _call_backend(method, *args, **kwargs):
+    try:
+        return {"result": method(*args, **kwargs)}
+    except Exception as e:
+        return {"error": [e.__class__.__name__, str(e)]}
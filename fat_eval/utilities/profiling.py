@@ -0,0 +1,163 @@
+import cProfile
+import itertools
+import json
+import os
+import pathlib
+import sys
+import time
+
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+
+def _peak_rss():
+    """
+    The peak resident set size in bytes of the process and of its terminated child processes, None if not available
+    """
+    if resource is None:
+        return None, None
+    # ru_maxrss is given in kilobytes on linux and in bytes on macOS
+    scale = 1 if sys.platform == "darwin" else 1024
+    return (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss*scale,
+            resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss*scale)
+
+
+def _cpu_times():
+    """
+    The cpu time of the calling thread and the cpu time of the terminated child processes. Phases overlapping in
+    different threads are only charged the cpu time of their own thread, which does not include the cpu time of the
+    threads of a thread executor used by the phase. The child cpu time is shared by the process and is charged to all
+    phases running when a child process terminates
+    """
+    return time.thread_time(), sum(os.times()[2:4])
+
+
+class Profiler:
+    """
+    Records wall time, cpu time, peak memory, bytes moved to and from worker processes and the number of evaluated
+    points for the phases of an analysis. A phase can be entered several times, for instance once per chunk, and the
+    values are then accumulated. The cpu time of a phase is the cpu time of the thread running it, see _cpu_times
+    """
+    def __init__(self, cprofile_directory=None, enabled=True):
+        """
+        :param cprofile_directory:  If given, the functions wrapped by profiled_function dump cProfile statistics to
+                                    this directory
+        :param enabled:             If False, no phases are recorded and the callers skip measurements that cost
+                                    time, like the size of pickled data sent to the workers
+        """
+        self.enabled = enabled
+        self.phases = {}
+        self.cprofile_directory = None if cprofile_directory is None else pathlib.Path(cprofile_directory)
+        self.start_time = time.perf_counter()
+
+    def _phase_data(self, name):
+        return self.phases.setdefault(name, {"calls": 0, "wall_time": 0., "cpu_time": 0., "child_cpu_time": 0.,
+                                             "points": 0, "bytes_to_workers": 0, "bytes_from_workers": 0,
+                                             "cpus": 1})
+
+    @contextmanager
+    def phase(self, name, points=0, cpus=1):
+        """
+        Context manager recording a phase
+        :param name:    name of the phase
+        :param points:  number of points evaluated in the phase, used for the throughput
+        :param cpus:    number of cpus used in the phase, used for the parallel efficiency
+        """
+        if not self.enabled:
+            yield self
+            return
+        wall_start = time.perf_counter()
+        cpu_start, child_cpu_start = _cpu_times()
+        try:
+            yield self
+        finally:
+            cpu_stop, child_cpu_stop = _cpu_times()
+            data = self._phase_data(name)
+            data["calls"] += 1
+            data["wall_time"] += time.perf_counter() - wall_start
+            data["cpu_time"] += cpu_stop - cpu_start
+            data["child_cpu_time"] += child_cpu_stop - child_cpu_start
+            data["points"] += points
+            data["cpus"] = max(data["cpus"], cpus or 1)
+            data["peak_rss"], data["peak_child_rss"] = _peak_rss()
+
+    def add_bytes(self, name, to_workers=0, from_workers=0):
+        """
+        Adds the number of bytes sent to and received from worker processes during the phase name
+        """
+        if not self.enabled:
+            return
+        data = self._phase_data(name)
+        data["bytes_to_workers"] += int(to_workers)
+        data["bytes_from_workers"] += int(from_workers)
+
+    def profiled_function(self, func, name=None):
+        """
+        Wraps func so that each call is profiled with cProfile and the statistics are dumped to the cprofile
+        directory, also when the function is called in a worker process. Returns func unchanged if no cprofile
+        directory is set
+        """
+        if self.cprofile_directory is None:
+            return func
+        self.cprofile_directory.mkdir(parents=True, exist_ok=True)
+        return ProfiledFunction(func, self.cprofile_directory, name or func.__name__)
+
+    def report(self):
+        phases = {}
+        for name, data in self.phases.items():
+            data = dict(data)
+            wall_time = data["wall_time"]
+            data["points_per_second"] = data["points"]/wall_time if data["points"] and wall_time else None
+            # Fraction of the available cpu time that was used by the process and its workers
+            data["parallel_efficiency"] = ((data["cpu_time"] + data["child_cpu_time"])/(wall_time*data["cpus"])
+                                           if wall_time else None)
+            phases[name] = data
+        return {"total_wall_time": time.perf_counter() - self.start_time, "phases": phases,
+                "cprofile_directory": None if self.cprofile_directory is None else str(self.cprofile_directory)}
+
+    def write_report(self, filename):
+        filename = pathlib.Path(filename)
+        filename.parent.mkdir(parents=True, exist_ok=True)
+        with open(filename, 'w') as report_file:
+            json.dump(self.report(), report_file, indent=2)
+        print("Profiling report written to " + str(filename))
+
+
+class ProfiledFunction:
+    """
+    Picklable wrapper of a function that dumps cProfile statistics of each call to a directory, one file per call
+    named by the function name, the process id and a counter
+    """
+    _calls = itertools.count()
+
+    def __init__(self, func, directory, name):
+        self.func = func
+        self.directory = directory
+        self.name = name
+
+    def __call__(self, *args, **kwargs):
+        profile = cProfile.Profile()
+        try:
+            return profile.runcall(self.func, *args, **kwargs)
+        finally:
+            profile.dump_stats(self.directory / (self.name + "_" + str(os.getpid()) + "_"
+                                                 + str(next(ProfiledFunction._calls)) + ".prof"))
+
+
+def nbytes(*data):
+    """
+    Number of bytes of the numpy arrays in data, nested lists, tuples and dicts are traversed
+    """
+    total = 0
+    for item in data:
+        if isinstance(item, dict):
+            total += nbytes(*item.values())
+        elif isinstance(item, (list, tuple)):
+            total += nbytes(*item)
+        else:
+            total += getattr(item, "nbytes", 0)
+    return total
@@ -0,0 +1,57 @@
+import threading
+
+from collections import namedtuple
+from multiprocessing import shared_memory
+
+import numpy as np
+
+SharedArrayDescriptor = namedtuple("SharedArrayDescriptor", ["name", "shape", "dtype"])
+
+# Creating and unlinking shared memory registers it with the resource tracker of multiprocessing, which holds a lock
+# that is also taken by the worker processes when attaching. A worker forked while another thread holds that lock
+# never gets it, so worker processes are forked while holding fork_lock, which is held when creating and unlinking
+fork_lock = threading.Lock()
+
+
+class SharedArray:
+    """
+    Small helper class for a numpy array placed in shared memory. Worker processes are given the descriptor and attach
+    to the same memory without copying or pickling the data
+    """
+    def __init__(self, shape, dtype=float, descriptor=None):
+        if descriptor is None:
+            dtype = np.dtype(dtype)
+            size = max(1, int(np.prod(shape))*dtype.itemsize)
+            with fork_lock:
+                self.shm = shared_memory.SharedMemory(create=True, size=size)
+            self.descriptor = SharedArrayDescriptor(self.shm.name, tuple(shape), dtype.str)
+            self.owner = True
+        else:
+            self.shm = shared_memory.SharedMemory(name=descriptor.name)
+            self.descriptor = descriptor
+            self.owner = False
+        self.array = np.ndarray(self.descriptor.shape, dtype=np.dtype(self.descriptor.dtype), buffer=self.shm.buf)
+
+    @classmethod
+    def from_array(cls, array):
+        array = np.asarray(array)
+        shared_array = cls(array.shape, array.dtype)
+        shared_array.array[...] = array
+        return shared_array
+
+    @classmethod
+    def attach(cls, descriptor):
+        return cls(None, descriptor=descriptor)
+
+    def close(self):
+        self.array = None
+        self.shm.close()
+        if self.owner:
+            with fork_lock:
+                self.shm.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
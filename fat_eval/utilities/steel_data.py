@@ -7,32 +7,63 @@ abaqus_fields = ["SDV_HARDNESS"]
 class SteelData:
     """
     Small helper class for handling different steel properties like hardness and retained austenite when
-    evaluating different fatigue criteria
+    evaluating different fatigue criteria. The fields are stored as arrays with one value per point and are accessed
+    as attributes. Derived fields, like HV, are computed once per object and memoized
     """
+    __slots__ = ("data", "_cache")
+
     def __init__(self, data):
         self.data = data
+        self._cache = {}
 
-    def __getattribute__(self, item):
+    def __getattr__(self, item):
+        # Only called when normal attribute lookup fails, i.e. for the fields in data
+        if item in SteelData.__slots__:
+            raise AttributeError(item)
         try:
-            return object.__getattribute__(self, "data")[item]
+            return self.data[item]
         except KeyError:
-            return object.__getattribute__(self, item)
+            raise AttributeError("SteelData has no field " + item)
 
-    def __reduce_ex__(self, protocol):
+    def __reduce__(self):
+        # The memoized fields are not pickled, they are cheaper to recompute than to transfer
         return self.__class__, (self.data, )
 
     def __getitem__(self, val):
+        """
+        Steel data for a subset of the points. Slices give views of the arrays and memoized point fields are sliced
+        along with the data so that they are not recomputed for the subset
+        """
         data = {}
         for label, values in self.data.items():
             data[label] = values[val]
-        return SteelData(data)
+        steel_data = SteelData(data)
+        for key, values in self._cache.items():
+            if isinstance(values, np.ndarray) and values.ndim == 1 and values.shape[0] == len(self):
+                steel_data._cache[key] = values[val]
+        return steel_data
 
     def __len__(self):
-        return len(next(iter(self.data.items()))[1])
+        for values in self.data.values():
+            return len(values)
+        return 0
+
+    def cached(self, key, func):
+        """
+        Returns the memoized value for key, calling func() to compute it the first time
+        :param key:     hashable key identifying the derived field, for instance ("SS2506", "findley_k")
+        :param func:    function without arguments computing the field
+        """
+        try:
+            return self._cache[key]
+        except KeyError:
+            value = func()
+            self._cache[key] = value
+            return value
 
     @property
     def HV(self):
-        return HRC2HV(self.SDV_HARDNESS)
+        return self.cached("HV", lambda: HRC2HV(self.SDV_HARDNESS))
 
 
 if __name__ == '__main__':
@@ -38,6 +38,17 @@ class Element:
         gp = self.gauss_points[i, :]
         return np.linalg.det(self.J(*gp))*self.gauss_weights[i]
 
+    @classmethod
+    def gauss_point_derivatives(cls):
+        """
+        Table with the derivatives of the shape functions at the gauss points, computed once per element type
+        :return:    numpy array with shape (gauss_points, 3, nodes)
+        """
+        if "_gauss_point_derivatives" not in cls.__dict__:
+            element = cls.__new__(cls)
+            cls._gauss_point_derivatives = np.array([element.d(*gp) for gp in cls.gauss_points])
+        return cls._gauss_point_derivatives
+
     def gauss_point_coordinates(self, i):
         gp = self.gauss_points[i, :]
         N_vec = self.N(*gp)  # noqa
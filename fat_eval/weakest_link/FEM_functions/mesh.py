@@ -0,0 +1,100 @@
+import numpy as np
+
+from fat_eval.weakest_link.FEM_functions.elements import element_types
+
+
+def gauss_point_volumes(element_type, coordinates):
+    """
+    Computes the gauss point volumes, det(J) times the gauss weight, of many elements of the same type
+    :param element_type:    element class, for instance C3D8
+    :param coordinates:     numpy array with shape (elements, nodes, 3) with the nodal coordinates
+    :return:                numpy array with shape (elements, gauss_points)
+    """
+    jacobians = np.einsum('gij,ejk->egik', element_type.gauss_point_derivatives(), coordinates)
+    return np.linalg.det(jacobians)*np.asarray(element_type.gauss_weights, dtype=float)
+
+
+class ElementBlock:
+    """
+    Struct of arrays representation of all elements of one element type
+    """
+    def __init__(self, element_type_name, labels, coordinates):
+        self.element_type_name = element_type_name
+        self.element_type = element_types[element_type_name]
+        self.labels = np.asarray(labels)
+        self.coordinates = np.asarray(coordinates, dtype=float).reshape(len(self.labels), -1, 3)
+        self.gauss_point_volumes = gauss_point_volumes(self.element_type, self.coordinates)
+
+    def __len__(self):
+        return self.labels.shape[0]
+
+
+class Mesh:
+    """
+    Mesh stored as one ElementBlock per element type. New element types are supported by adding the element class,
+    with gauss points, gauss weights and shape function derivatives, to element_types
+    """
+    def __init__(self, blocks):
+        self.blocks = blocks
+
+    @classmethod
+    def from_element_data(cls, element_data):
+        """
+        Creates a mesh from the element data given by ABQInterface.get_element_data
+        :param element_data:    dict with element types as keys and dicts {element_label: nodal_coordinates} as values
+        """
+        blocks = []
+        for element_type, element_coordinates in element_data.items():
+            if len(element_coordinates):
+                blocks.append(ElementBlock(element_type, list(element_coordinates.keys()),
+                                           np.array([element_coordinates[label] for label in element_coordinates])))
+        return cls(blocks)
+
+    @classmethod
+    def from_elements(cls, elements):
+        """
+        Creates a mesh from a dict with element objects with the element labels as keys
+        """
+        element_data = {}
+        for label, element in elements.items():
+            element_data.setdefault(type(element).__name__, {})[label] = element.xe
+        return cls.from_element_data(element_data)
+
+    def integration_weights(self, element_labels):
+        """
+        Computes the integration weight, the gauss point volume times the gauss weight, for each integration point
+        :param element_labels:  the element label for each integration point, the integration points of an element are
+                                given in the order of the gauss points of the element
+        :return:                numpy array with one weight for each element label
+        """
+        element_labels = np.asarray(element_labels)
+        max_gauss_points = max(block.gauss_point_volumes.shape[1] for block in self.blocks)
+        labels = np.concatenate([block.labels for block in self.blocks])
+        weights = np.zeros((labels.shape[0], max_gauss_points))
+        row = 0
+        for block in self.blocks:
+            gauss_points = block.gauss_point_volumes.shape[1]
+            weights[row:row + len(block), :gauss_points] = (block.gauss_point_volumes
+                                                            * np.asarray(block.element_type.gauss_weights))
+            row += len(block)
+
+        order = np.argsort(labels)
+        position = np.minimum(np.searchsorted(labels[order], element_labels), labels.shape[0] - 1)
+        missing = labels[order][position] != element_labels
+        if np.any(missing):
+            raise KeyError(element_labels[missing][0])
+        rows = order[position]
+
+        # The gauss point of each integration point is given by the number of earlier occurrences of the label
+        sorted_idx = np.argsort(element_labels, kind='stable')
+        sorted_labels = element_labels[sorted_idx]
+        counter = np.arange(sorted_labels.shape[0])
+        first_in_group = np.ones(sorted_labels.shape[0], dtype=bool)
+        first_in_group[1:] = sorted_labels[1:] != sorted_labels[:-1]
+        gauss_point = np.zeros(sorted_labels.shape[0], dtype=int)
+        gauss_point[sorted_idx] = counter - np.maximum.accumulate(np.where(first_in_group, counter, 0))
+
+        valid = gauss_point < max_gauss_points
+        integration_weights = np.zeros(element_labels.shape[0])
+        integration_weights[valid] = weights[rows[valid], gauss_point[valid]]
+        return integration_weights
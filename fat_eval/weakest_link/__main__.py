@@ -3,10 +3,12 @@ import pathlib
 import sys
 
 from fat_eval.utilities.input_file_functions import argparse_check_path, FatigueFileReadingError, read_input_file
+from fat_eval.utilities.executors import executors, parse_stage_executor
 from fat_eval.utilities.input_file_functions import OdbData
+from fat_eval.utilities.profiling import Profiler
 
 from fat_eval.weakest_link.calculate_pf import calculate_probability_of_failure
-from fat_eval.weakest_link.probabilistic_sn_curve import probabilistic_sn_curve
+from fat_eval.weakest_link.probabilistic_sn_curve import probabilistic_sn_curve, sn_curve_stages
 
 
 class LoadCase:
@@ -17,7 +19,8 @@ class LoadCase:
         self.frame = int(data[2])
 
 
-def parse_weakest_link_file(input_file, cpus):
+def parse_weakest_link_file(input_file, cpus, use_cache=True, profiler=None, odb_server=False, executors=None,
+                            executor_timeout=None):
     valid_keywords = {
         "abaqus",
         "heat_treatment",
@@ -42,7 +45,10 @@ def parse_weakest_link_file(input_file, cpus):
             instance_name=pf_calc_data.instance,
             symmetry_factor=float(pf_calc.parameters["symmetry_factor"]),
             load_cases=pf_calc.data,
-            abaqus=abaqus
+            abaqus=abaqus,
+            use_cache=use_cache,
+            profiler=profiler,
+            odb_server=odb_server
         ))
 
     for sn_curve in keywords["create_probabilistic_sn_curve"]:
@@ -59,7 +65,12 @@ def parse_weakest_link_file(input_file, cpus):
             load_cases=load_cases,
             abaqus=abaqus,
             cpus=cpus,
-            span=span
+            span=span,
+            use_cache=use_cache,
+            profiler=profiler,
+            odb_server=odb_server,
+            executors=executors,
+            executor_timeout=executor_timeout
         ))
 
     for output in keywords["output_file"]:
@@ -73,13 +84,39 @@ def main():
     parser.add_argument("input_file", type=argparse_check_path,
                         help="Path to the file defining the weakest-link evaluation")
     parser.add_argument("--cpus", type=int, help="Number of cpu cores used for the simulations")
+    parser.add_argument("--no_cache", action="store_true",
+                        help="Read all fields from the odb files instead of using previously extracted fields")
+    parser.add_argument("--odb_server", action="store_true",
+                        help="Read the odb files through one long-lived Abaqus python process that keeps the odb "
+                             "files open, instead of starting Abaqus python for each read")
+    parser.add_argument("--executor", type=parse_stage_executor, action="append",
+                        help="Backend running the jobs of a stage of the SN-curve evaluation, given as stage=backend "
+                             "with the stages " + ", ".join(sn_curve_stages) + " and the backends "
+                             + ", ".join(executors) + ". Can be given once per stage, default is process")
+    parser.add_argument("--executor_timeout", type=float,
+                        help="Time in seconds allowed for the jobs of a stage")
+    parser.add_argument("--profile", type=pathlib.Path,
+                        help="Write a json report with wall time, cpu time, memory usage, data sent to the worker "
+                             "processes and throughput of each phase of the evaluation to this file")
+    parser.add_argument("--cprofile_directory", type=pathlib.Path,
+                        help="Dump cProfile statistics of the weakest-link evaluations, also in the worker processes, "
+                             "to this directory")
     args = parser.parse_args()
+    stage_executors = dict(args.executor or [])
+    if set(stage_executors) - set(sn_curve_stages):
+        parser.error("Valid stages for --executor are " + ", ".join(sn_curve_stages))
+    profiler = Profiler(args.cprofile_directory, enabled=args.profile is not None)
     try:
-        parse_weakest_link_file(args.input_file, args.cpus)
+        parse_weakest_link_file(args.input_file, args.cpus, use_cache=not args.no_cache, profiler=profiler,
+                                odb_server=args.odb_server, executors=stage_executors,
+                                executor_timeout=args.executor_timeout)
     except FatigueFileReadingError as e:
         print("Problems when reading the file" + str(args.input_file))
         print(e)
         sys.exit(1)
+    finally:
+        if args.profile:
+            profiler.write_report(args.profile)
 
 
 if __name__ == '__main__':
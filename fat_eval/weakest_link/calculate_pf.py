@@ -1,12 +1,26 @@
-from abaqus_python_interface import ABQInterface
+from fat_eval.utilities.odb_batches import close_odb_interface
+from fat_eval.utilities.odb_server import create_odb_interface
+from fat_eval.utilities.profiling import Profiler
 
 from fat_eval.weakest_link.weakest_link_evaluator import setup_weakest_link_evaluator
 
 
 def calculate_probability_of_failure(odb_file, material, field, heat_treatment, element_set, instance_name,
-                                     load_cases, symmetry_factor, abaqus):
-    abq = ABQInterface(abaqus)
+                                     load_cases, symmetry_factor, abaqus, use_cache=True, profiler=None,
+                                     odb_server=False):
+    if profiler is None:
+        profiler = Profiler(enabled=False)
+    abq = create_odb_interface(abaqus, use_cache, odb_server)
+    try:
+        return _calculate_probability_of_failure(abq, odb_file, material, field, heat_treatment, element_set,
+                                                 instance_name, load_cases, symmetry_factor, abaqus, use_cache,
+                                                 profiler)
+    finally:
+        close_odb_interface(abq)
 
+
+def _calculate_probability_of_failure(abq, odb_file, material, field, heat_treatment, element_set, instance_name,
+                                      load_cases, symmetry_factor, abaqus, use_cache, profiler):
     evaluator = None
     output = []
     for load_case in load_cases:
@@ -14,12 +28,14 @@ def calculate_probability_of_failure(odb_file, material, field, heat_treatment,
         step = load_case_parameters[0]
         frame = int(load_case_parameters[1])
         load_cycles = [float(n) for n in load_case_parameters[2:]]
-        stress, _, element_labels = abq.read_data_from_odb(field, odb_file, step, frame, element_set, instance_name,
-                                                           get_position_numbers=True)
+        with profiler.phase("read_stress"):
+            stress, _, element_labels = abq.read_data_from_odb(field, odb_file, step, frame, element_set,
+                                                               instance_name, get_position_numbers=True)
         if evaluator is None:
             print("Setting up weakest-link evaluation")
-            evaluator = setup_weakest_link_evaluator(odb_file, heat_treatment, element_set,
-                                                     instance_name, symmetry_factor, abaqus)
+            with profiler.phase("setup_evaluator"):
+                evaluator = setup_weakest_link_evaluator(odb_file, heat_treatment, element_set,
+                                                         instance_name, symmetry_factor, abaqus, use_cache, abq)
         data_string = [
             f"The probability of failure for the step {step} frame {frame} field {field} "
             f"at".format(step=step, frame=frame, field=field)
@@ -27,8 +43,9 @@ def calculate_probability_of_failure(odb_file, material, field, heat_treatment,
         print("Calculating probability of failure for {step} step frame {frame} field {field} in odb "
               "file {odb_file}".format(step=step, frame=frame, field=field, odb_file=odb_file))
 
-        for cycles in load_cycles:
-            pf = evaluator.evaluate(stress, material, cycles=cycles)
+        with profiler.phase("evaluate_pf", points=stress.shape[0]*len(load_cycles)):
+            pf_values = profiler.profiled_function(evaluator.evaluate_many)(stress, material, cycles=load_cycles)
+        for cycles, pf in zip(load_cycles, pf_values):
             data_string.append("N={cycles}: {pf}".format(cycles=int(cycles), pf=round(pf, 3)))
         output.append(" ".join(data_string))
 
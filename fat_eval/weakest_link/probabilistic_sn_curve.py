@@ -1,20 +1,49 @@
+import pickle
+
 import numpy as np
 
-from abaqus_python_interface import ABQInterface
+from scipy.optimize import brentq
 
-from multiprocesser import multi_processer
+from fat_eval.fatigue_materials import materials, precompute_material_fields
+from fat_eval.utilities.executors import create_stage_executors, process_context
+from fat_eval.utilities.odb_batches import close_odb_interface, read_odb_fields
+from fat_eval.utilities.odb_server import create_odb_interface
+from fat_eval.utilities.profiling import nbytes, Profiler
 
 from fat_eval.weakest_link.weakest_link_evaluator import setup_weakest_link_evaluator, WeakestLinkEvaluator
 
 
+# The stages of an SN-curve evaluation where the executor can be selected, the odb reads and the life calculations
+sn_curve_stages = ("read", "lives")
+
+
 def probabilistic_sn_curve(odb_data, material, heat_treatment,
-                           pf_levels, load_cases, symmetry_factor, span, abaqus, cpus=None):
-    print("Setting up weakest-link evaluation")
-    evaluator = setup_weakest_link_evaluator(odb_data.odb_file_name, heat_treatment, odb_data.element_set,
-                                             odb_data.instance, symmetry_factor, abaqus)
+                           pf_levels, load_cases, symmetry_factor, span, abaqus, cpus=None, use_cache=True,
+                           profiler=None, odb_server=False, executors=None, executor_timeout=None):
+    """
+    :param executors:           dict with the executor backend, "serial", "thread" or "process", or an executor object
+                                for the stages in sn_curve_stages. The default is "process"
+    :param executor_timeout:    time in seconds allowed for the jobs of a stage, default is no limit
+    """
+    if profiler is None:
+        profiler = Profiler(enabled=False)
     if cpus is None:
         cpus = 1
-    abq = ABQInterface(abaqus)
+    stage_executors = create_stage_executors(sn_curve_stages, executors, cpus, executor_timeout)
+    abq = create_odb_interface(abaqus, use_cache, odb_server)
+    try:
+        return _probabilistic_sn_curve(abq, odb_data, material, heat_treatment, pf_levels, load_cases,
+                                       symmetry_factor, span, abaqus, cpus, use_cache, profiler, stage_executors)
+    finally:
+        close_odb_interface(abq)
+
+
+def _probabilistic_sn_curve(abq, odb_data, material, heat_treatment, pf_levels, load_cases, symmetry_factor, span,
+                            abaqus, cpus, use_cache, profiler, stage_executors):
+    print("Setting up weakest-link evaluation")
+    with profiler.phase("setup_evaluator"):
+        evaluator = setup_weakest_link_evaluator(odb_data.odb_file_name, heat_treatment, odb_data.element_set,
+                                                 odb_data.instance, symmetry_factor, abaqus, use_cache, abq)
     read_jobs = []
     for load_case in load_cases:
         kw_args = {
@@ -25,36 +54,52 @@ def probabilistic_sn_curve(odb_data, material, heat_treatment,
             "set_name": odb_data.element_set,
             "instance_name": odb_data.instance
         }
-        read_jobs.append((abq.read_data_from_odb, [], kw_args))
+        read_jobs.append(kw_args)
     print("Reading stress states")
-    stress_states = multi_processer(read_jobs, timeout=1e9, delay=0., cpus=min(cpus, len(read_jobs)))
+    read_cpus = min(cpus, len(read_jobs))
+    with profiler.phase("read_stress", cpus=read_cpus):
+        stress_states = read_odb_fields(abq, read_jobs, read_cpus, executor=stage_executors["read"])
+    if read_cpus > 1 and not stage_executors["read"].in_process:
+        profiler.add_bytes("read_stress", from_workers=nbytes(stress_states))
 
     output = ["Probabilistic SN-curve"]
     heading = ["Load"]
     heading.extend(["N at pf = " + str(int(pf*100)) + " %" for pf in pf_levels])
     output.append(", ".join(heading))
 
-    life_jobs = []
-
-    for stress_state in stress_states:
-        for pf in pf_levels:
-            kw_args = {
-                "stress_state": stress_state,
-                "evaluator": evaluator,
-                "pf": pf,
-                "span": span,
-                "material": material
-            }
-            life_jobs.append([calculate_life, [], kw_args])
+    # The evaluator and the stress states are installed once in each worker, the jobs only carry the index of the
+    # load case and the pf levels. All pf levels of a load case are solved in one job unless more cpus are available
+    if cpus > len(stress_states):
+        life_jobs = [(i, [pf]) for i in range(len(stress_states)) for pf in pf_levels]
+    else:
+        life_jobs = [(i, pf_levels) for i in range(len(stress_states))]
     print("Evaluating SN-curve")
-    lives = multi_processer(life_jobs, timeout=1e9, delay=0., cpus=min(cpus, len(life_jobs)))
-
-    job = 0
-    for stress_state, load_case in zip(stress_states, load_cases):
+    # The material fields are computed before the workers are forked so that they are shared by all workers
+    precompute_material_fields(evaluator.steel_data, material)
+    worker_state = (evaluator, stress_states, span, material)
+    processes = min(cpus, len(life_jobs))
+    calculate_load_case_lives = profiler.profiled_function(_calculate_load_case_lives)
+    executor = stage_executors["lives"]
+    with profiler.phase("calculate_lives", points=len(life_jobs), cpus=processes):
+        try:
+            job_lives = executor.run([(calculate_load_case_lives, job, {}) for job in life_jobs],
+                                     initializer=_install_worker_state, initargs=worker_state)
+        finally:
+            _worker_state.clear()
+        if profiler.enabled and processes > 1 and not executor.in_process:
+            # The worker state is only sent to the workers if it is not inherited by fork
+            state_bytes = (0 if process_context().get_start_method() == "fork"
+                           else processes*len(pickle.dumps(worker_state)))
+            profiler.add_bytes("calculate_lives", to_workers=len(pickle.dumps(life_jobs)) + state_bytes,
+                               from_workers=len(pickle.dumps(job_lives)))
+
+    lives = [[] for _ in stress_states]
+    for (load_case_idx, _), pf_lives in zip(life_jobs, job_lives):
+        lives[load_case_idx].extend(pf_lives)
+    for load_case_lives, load_case in zip(lives, load_cases):
         output_data = [str(load_case.load)]
-        for _ in pf_levels:
-            output_data.append(str(int(lives[job])))
-            job += 1
+        for life in load_case_lives:
+            output_data.append(str(int(life)))
         output.append(", ".join(output_data))
 
     for output_string in output:
@@ -62,25 +107,64 @@ def probabilistic_sn_curve(odb_data, material, heat_treatment,
     return output
 
 
-def calculate_life(stress_state, evaluator, pf, span, material):
-    def calculate_pf(cycles):
-        return evaluator.evaluate(stress_state, material, cycles=np.exp(cycles)) - pf
+_worker_state = {}
 
-    n1 = np.log(span[0])
-    n2 = np.log(span[1])
-    n = (n1 + n2)/2
-    while abs(n2 - n1) > 1e-3:
-        f = calculate_pf(n)
-        if f == 0:
-            return np.exp(n)
-        elif calculate_pf(n1)*f < 0:
-            n2 = n
-        else:
-            n1 = n
-        n = (n1 + n2) / 2
-    return np.exp(n)
+
+def _install_worker_state(evaluator, stress_states, span, material):
+    _worker_state.update(evaluator=evaluator, stress_states=stress_states, span=span, material=material)
 
 
+def _calculate_load_case_lives(load_case_idx, pf_levels):
+    return calculate_lives(_worker_state["stress_states"][load_case_idx], _worker_state["evaluator"], pf_levels,
+                           _worker_state["span"], _worker_state["material"])
 
 
+def calculate_life(stress_state, evaluator, pf, span, material):
+    return calculate_lives(stress_state, evaluator, [pf], span, material)[0]
+
+
+def calculate_lives(stress_state, evaluator, pf_levels, span, material):
+    """
+    Calculates the number of cycles where the probability of failure reaches the levels in pf_levels. The probability
+    of failure is monotonic in the number of cycles and smooth between the break points of the material, given by
+    the optional attribute cycle_breakpoints of the material. The probability of failure is evaluated at the span
+    limits and the break points and each level is then solved with Brent's method in log(N) on the segment
+    bracketing it. The evaluations of the weakest-link integral are shared between the pf levels
+    :param stress_state:    the stress at each integration point
+    :param evaluator:       WeakestLinkEvaluator object
+    :param pf_levels:       list with probabilities of failure
+    :param span:            the smallest and largest number of cycles considered
+    :param material:        name of the material
+    :return:                list with the number of cycles for each pf level
+    """
+    # The equation is solved for log(-log(1 - pf)) which is close to linear in log(N) and converges faster than pf
+    evaluations = {}
+
+    def log_hazard(log_cycles):
+        if log_cycles not in evaluations:
+            integral = evaluator.hazard_integral(stress_state, material, cycles=np.exp(log_cycles))
+            evaluations[log_cycles] = np.log(max(evaluator.symmetry_factor*integral, 1e-300))
+        return evaluations[log_cycles]
 
+    n1 = np.log(span[0])
+    n2 = np.log(span[1])
+    breakpoints = [np.log(n) for n in getattr(materials[material], "cycle_breakpoints", []) if span[0] < n < span[1]]
+    nodes = [n1] + sorted(breakpoints) + [n2]
+    integrals = evaluator.hazard_integrals(stress_state, material, cycles=np.exp(nodes))
+    for n, integral in zip(nodes, integrals):
+        evaluations[n] = np.log(max(evaluator.symmetry_factor*integral, 1e-300))
+    node_values = [log_hazard(n) for n in nodes]
+
+    lives = []
+    for pf in pf_levels:
+        target = np.log(max(-np.log(1 - pf), 1e-300))
+        if node_values[0] >= target:
+            lives.append(span[0])
+        elif node_values[-1] <= target:
+            lives.append(span[1])
+        else:
+            segment = next(i for i in range(len(nodes) - 1) if node_values[i] < target <= node_values[i + 1])
+            n = brentq(lambda log_cycles: log_hazard(log_cycles) - target, nodes[segment], nodes[segment + 1],
+                       xtol=1e-3)
+            lives.append(np.exp(n))
+    return lives
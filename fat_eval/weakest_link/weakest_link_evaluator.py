@@ -1,18 +1,37 @@
-from collections import defaultdict
-
 import numpy as np
 
-from abaqus_python_interface import ABQInterface
-
-from fat_eval.weakest_link.FEM_functions.elements import element_types
+from fat_eval.weakest_link.FEM_functions.mesh import Mesh
 from fat_eval.weakest_link.hazard_functions import weibull
 from fat_eval.fatigue_materials import materials
+from fat_eval.utilities.odb_cache import cache_key, odb_file_signature, OdbFieldCache
+from fat_eval.utilities.odb_server import create_odb_interface
 from fat_eval.utilities.steel_data import abaqus_fields, SteelData
 
+# Upper limit in bytes of the hazard function values held in memory when evaluating many numbers of cycles
+max_chunk_memory = 2**27
+
 
 def setup_weakest_link_evaluator(odb_file, heat_treatment, element_set, instance_name,
-                                 symmetry_factor, abaqus):
-    abq = ABQInterface(abaqus)
+                                 symmetry_factor, abaqus, use_cache=True, abq=None):
+    """
+    Sets up the weakest-link evaluator for an element set. With use_cache, the integration weights, element labels
+    and steel data are stored as a snapshot in the odb cache and later calls for the same odb files, which must be
+    unmodified, load the snapshot memory mapped instead of reading the mesh and heat treatment fields again
+    :param abq: object used for reading the odb files, for instance an odb server interface. Default is a new
+                ABQInterface using the command abaqus
+    """
+    snapshot_key = None
+    cache = None
+    if use_cache:
+        cache = OdbFieldCache()
+        snapshot_key = evaluator_snapshot_key(odb_file, heat_treatment, element_set, instance_name)
+        snapshot = None if snapshot_key is None else cache.load(snapshot_key)
+        if snapshot is not None:
+            print("\tLoading the weakest-link evaluator from the cache")
+            return WeakestLinkEvaluator.from_snapshot(snapshot, symmetry_factor)
+
+    if abq is None:
+        abq = create_odb_interface(abaqus, use_cache)
     element_data = abq.get_element_data(odb_file, element_set, instance_name)
     heat_treatment_data = {}
     element_labels = None
@@ -21,40 +40,115 @@ def setup_weakest_link_evaluator(odb_file, heat_treatment, element_set, instance
             odb_file_name=heat_treatment.odb_file_name,
             field_id=heat_treatment_field,
             step_name=heat_treatment.step_name,
-            frame_number=heat_treatment.frame_number,
+            frame_number=int(heat_treatment.frame_number),
             set_name=heat_treatment.element_set,
             instance_name=heat_treatment.instance,
             get_position_numbers=True
         )
         heat_treatment_data[heat_treatment_field] = field
-    elements = {}
-    for element_type, element_coordinates in element_data.items():
-        for element_label, coords in element_coordinates.items():
-            elements[element_label] = element_types[element_type](coords)
-
-    evaluator = WeakestLinkEvaluator(elements, element_labels, SteelData(heat_treatment_data),
-                                     symmetry_factor)
+    mesh = Mesh.from_element_data(element_data)
+    evaluator = WeakestLinkEvaluator(mesh, element_labels, SteelData(heat_treatment_data), symmetry_factor)
+    if snapshot_key is not None:
+        cache.store(snapshot_key, evaluator.snapshot(),
+                    description={"weakest_link_evaluator": str(odb_file), "element_set": element_set})
     return evaluator
 
 
+def evaluator_snapshot_key(odb_file, heat_treatment, element_set, instance_name):
+    """
+    Cache key of a weakest-link evaluator snapshot, based on the odb file with the mesh and the heat treatment data
+    :return:    The key or None if any of the odb files cannot be found
+    """
+    try:
+        odb_signatures = [odb_file_signature(odb_file), odb_file_signature(heat_treatment.odb_file_name)]
+    except OSError:
+        return None
+    return cache_key("weakest_link_evaluator", odb_signatures, element_set, instance_name, heat_treatment.step_name,
+                     int(heat_treatment.frame_number), heat_treatment.element_set, heat_treatment.instance,
+                     abaqus_fields)
+
+
 class WeakestLinkEvaluator:
-    def __init__(self, elements, element_labels, steel_data, symmetry_factor=1.):
-        self.elements = elements
+    def __init__(self, mesh, element_labels, steel_data, symmetry_factor=1.):
+        """
+        :param mesh:            Mesh object or a dict with element objects with the element labels as keys
+        :param element_labels:  the element label of each integration point
+        :param steel_data:      SteelData object with the steel data at each integration point
+        :param symmetry_factor: the probability of failure is scaled as for symmetry_factor identical components
+        """
+        if not isinstance(mesh, Mesh):
+            mesh = Mesh.from_elements(mesh)
         self.element_labels = element_labels
         self.symmetry_factor = symmetry_factor
         self.steel_data = steel_data
+        self.integration_weights = mesh.integration_weights(element_labels)
+
+    def snapshot(self):
+        """
+        The precomputed data of the evaluator, without the symmetry factor, as a tuple of arrays
+        :return:    integration weights, element labels and the steel data fields in the order of abaqus_fields
+        """
+        return ((np.asarray(self.integration_weights), np.asarray(self.element_labels))
+                + tuple(np.asarray(self.steel_data.data[field]) for field in abaqus_fields))
+
+    @classmethod
+    def from_snapshot(cls, snapshot, symmetry_factor=1.):
+        """
+        Creates an evaluator from the data given by snapshot without any mesh. The arrays, for instance memory mapped
+        from the cache, are used as they are
+        """
+        evaluator = cls.__new__(cls)
+        evaluator.integration_weights, evaluator.element_labels = snapshot[:2]
+        evaluator.steel_data = SteelData(dict(zip(abaqus_fields, snapshot[2:])))
+        evaluator.symmetry_factor = symmetry_factor
+        return evaluator
 
     def evaluate(self, stress_state, material_name, hazard_function=weibull, cycles=2e6):
+        integral = self.hazard_integral(stress_state, material_name, hazard_function, cycles)
+        pf = 1 - np.exp(-integral)
+        return 1 - (1 - pf)**self.symmetry_factor
+
+    def hazard_integral(self, stress_state, material_name, hazard_function=weibull, cycles=2e6):
+        """
+        The integral of the hazard function over the volume, the probability of failure of the component is
+        1 - exp(-integral)**symmetry_factor
+        """
         material = materials[material_name]
         functional_values = hazard_function(stress_state, self.steel_data, material, cycles=cycles)
-        values_dict = defaultdict(list)
-        for s, label in zip(functional_values, self.element_labels):
-            values_dict[label].append(s)
-        integral = 0
-        for e_label, values in values_dict.items():
-            element = self.elements[e_label]
-            for vol, w, val in zip(element.gauss_point_volumes, element.gauss_weights, values):
-                integral += val*w*vol
+        return np.dot(functional_values, self.integration_weights)
 
-        pf = 1 - np.exp(-integral)
+    def evaluate_many(self, stress_state, material_name, cycles, load_factors=None, hazard_function=weibull):
+        """
+        Evaluates the probability of failure for many numbers of cycles, and optionally load scale factors, at once
+        :param stress_state:    the stress at each integration point
+        :param material_name:   name of the material
+        :param cycles:          array with numbers of cycles
+        :param load_factors:    optional array with factors scaling stress_state
+        :param hazard_function: the hazard function, must support an array of cycles with shape (n, 1)
+        :return:                numpy array with pf with shape (cycles, ) or (load_factors, cycles) if load_factors
+                                is given
+        """
+        integrals = self.hazard_integrals(stress_state, material_name, cycles, load_factors, hazard_function)
+        pf = 1 - np.exp(-integrals)
         return 1 - (1 - pf)**self.symmetry_factor
+
+    def hazard_integrals(self, stress_state, material_name, cycles, load_factors=None, hazard_function=weibull):
+        """
+        Batched version of hazard_integral, see evaluate_many for the parameters. The hazard function is evaluated for
+        blocks of cycles with the block size limited by max_chunk_memory
+        """
+        material = materials[material_name]
+        cycles = np.atleast_1d(np.asarray(cycles, dtype=float))
+        factors = np.ones(1) if load_factors is None else np.atleast_1d(np.asarray(load_factors, dtype=float))
+        stress_state = np.asarray(stress_state)
+        chunk_size = max(1, int(max_chunk_memory//(8*max(stress_state.size, 1))))
+        integrals = np.zeros((factors.shape[0], cycles.shape[0]))
+        for i, factor in enumerate(factors):
+            for start in range(0, cycles.shape[0], chunk_size):
+                stop = min(start + chunk_size, cycles.shape[0])
+                functional_values = hazard_function(factor*stress_state, self.steel_data, material,
+                                                    cycles=cycles[start:stop, None])
+                integrals[i, start:stop] = np.dot(functional_values, self.integration_weights)
+        if load_factors is None:
+            return integrals[0]
+        return integrals
@@ -0,0 +1,52 @@
+import pathlib
+import tempfile
+import unittest
+
+import numpy as np
+
+from fat_eval.utilities.checkpoint import CheckpointMismatchError, ResultCheckpoint
+
+
+class TestResultCheckpoint(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.checkpoint_directory = pathlib.Path(self.directory.name) / "checkpoint"
+        self.results = np.random.rand(10, 3)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_resume(self):
+        checkpoint = ResultCheckpoint(self.checkpoint_directory, "analysis", 10)
+        checkpoint.store(0, 4, self.results[0:4])
+        checkpoint.store(4, 8, self.results[4:8])
+
+        resumed = ResultCheckpoint(self.checkpoint_directory, "analysis", 10, resume=True)
+        np.testing.assert_array_equal(resumed.results[:8], self.results[:8])
+        self.assertTrue(resumed.is_completed(2, 6))
+        self.assertTrue(resumed.is_completed(0, 8))
+        self.assertFalse(resumed.is_completed(6, 10))
+        resumed.store(8, 10, self.results[8:10])
+        self.assertTrue(resumed.is_completed(0, 10))
+        np.testing.assert_array_equal(resumed.results, self.results)
+
+    def test_other_analysis_is_not_resumed(self):
+        signature = {"criterion": "Findley", "odb_files": [{"path": "a.odb", "mtime": 1}]}
+        ResultCheckpoint(self.checkpoint_directory, signature, 10).store(0, 4, self.results[0:4])
+        modified_signature = {"criterion": "Findley", "odb_files": [{"path": "a.odb", "mtime": 2}]}
+        with self.assertRaisesRegex(CheckpointMismatchError, "odb_files"):
+            ResultCheckpoint(self.checkpoint_directory, modified_signature, 10, resume=True)
+        with self.assertRaisesRegex(CheckpointMismatchError, "points"):
+            ResultCheckpoint(self.checkpoint_directory, signature, 12, resume=True)
+        self.assertTrue((self.checkpoint_directory / "manifest.json").is_file())
+        self.assertEqual(ResultCheckpoint(self.checkpoint_directory, signature, 10, resume=True).completed, [(0, 4)])
+
+    def test_remove(self):
+        checkpoint = ResultCheckpoint(self.checkpoint_directory, "analysis", 10)
+        checkpoint.store(0, 10, self.results)
+        checkpoint.remove(directory=True)
+        self.assertFalse(self.checkpoint_directory.exists())
+
+    def test_checkpoint_is_discarded_without_resume(self):
+        ResultCheckpoint(self.checkpoint_directory, "analysis", 10).store(0, 4, self.results[0:4])
+        self.assertEqual(ResultCheckpoint(self.checkpoint_directory, "analysis", 10).completed, [])
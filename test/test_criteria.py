@@ -1,7 +1,8 @@
 import unittest
 import numpy as np
 
-from fat_eval.multiaxial_fatigue.haigh import evaluate_haigh
+from fat_eval.fatigue_materials import materials
+from fat_eval.multiaxial_fatigue.haigh import Haigh, haigh
 
 stress_history = np.array([
     [[1000, 0, 0, 0., 0, 0], [1000, 0, 0, 0., 0, 0]],    # Static loading
@@ -13,8 +14,8 @@ stress_history = np.array([
 ])
 
 stress_history = np.moveaxis(stress_history, 1, 0)
-sh_0 = evaluate_haigh(stress_history, 0*stress_history[0, :, 0])
-sh_1 = evaluate_haigh(stress_history, 0*stress_history[0, :, 0])
+sh_0 = haigh(stress_history, 0*stress_history[0, :, 0])
+sh_1 = haigh(stress_history, 0.5 + 0*stress_history[0, :, 0])
 
 
 class TestHaighAmplitude(unittest.TestCase):
@@ -25,4 +26,46 @@ class TestHaighAmplitude(unittest.TestCase):
         self.assertTrue(abs(sh_0[1] - 500) < 1e-6)
 
     def test_uniaxial_loading_compression(self):
-        self.assertTrue(abs(sh_0[2] - 500) < 1e-6)
+        # The largest principal stress is zero during the whole cycle, the direction of the compressive stress is
+        # never the critical direction
+        self.assertTrue(abs(sh_0[2] - 0) < 1e-6)
+
+    def test_uniaxial_alternating(self):
+        self.assertTrue(abs(sh_0[3] - 1000) < 1e-6)
+
+    def test_pulsating_shear(self):
+        self.assertTrue(abs(sh_0[4] - 500) < 1e-6)
+
+    def test_alternating_shear(self):
+        self.assertTrue(abs(sh_0[5] - 1000) < 1e-6)
+
+
+class TestHaighMeanStress(unittest.TestCase):
+    def test_uniaxial_loading_static(self):
+        self.assertTrue(abs(sh_1[0] - 500) < 1e-6)
+
+    def test_uniaxial_pulsating_tension(self):
+        self.assertTrue(abs(sh_1[1] - 750) < 1e-6)
+
+    def test_uniaxial_alternating(self):
+        self.assertTrue(abs(sh_1[3] - 1000) < 1e-6)
+
+    def test_pulsating_shear(self):
+        self.assertTrue(abs(sh_1[4] - 750) < 1e-6)
+
+
+class TestHaighCriterion(unittest.TestCase):
+    def test_tolerance_is_ignored(self):
+        class Material:
+            name = "Test"
+
+            @staticmethod
+            def mean_stress_sensitivity(steel_data):
+                return 0.5
+
+        materials["HaighTest"] = Material
+        try:
+            result = Haigh.evaluate(stress_history, None, "HaighTest", search_grid=None, tolerance=1e-3)
+        finally:
+            del materials["HaighTest"]
+        np.testing.assert_allclose(result[:, 0], sh_1)
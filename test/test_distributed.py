@@ -0,0 +1,99 @@
+import os
+import pathlib
+import tempfile
+import time
+import unittest
+
+import numpy as np
+
+from fat_eval.multiaxial_fatigue.distributed import Coordinator, DistributedEvaluationError
+from fat_eval.utilities.steel_data import SteelData
+
+
+def max_stress(stress_history, steel_data, material_name=None, search_grid=None, crash_file=None):
+    # A worker evaluating the first chunk dies once, when crash_file does not exist
+    if crash_file is not None and steel_data.HV[0] == 0 and not os.path.isfile(crash_file):
+        pathlib.Path(crash_file).touch()
+        os._exit(1)
+    return np.max(stress_history[:, :, 0], axis=0)[:, None] + steel_data.HV[:, None]
+
+
+def failing_criterion(stress_history, steel_data, **_):
+    raise ValueError("Invalid stress history")
+
+
+def slow_criterion(stress_history, steel_data, **_):
+    time.sleep(0.5)
+    return np.zeros((stress_history.shape[1], 1))
+
+
+def hanging_criterion(stress_history, steel_data, **_):
+    time.sleep(60)
+
+
+class TestCoordinator(unittest.TestCase):
+    def setUp(self):
+        self.stress_history = np.random.rand(4, 50, 6)
+        self.steel_data = SteelData({"HV": np.arange(50.)})
+        self.expected = np.max(self.stress_history[:, :, 0], axis=0)[:, None] + np.arange(50.)[:, None]
+
+    def test_evaluate_with_local_workers(self):
+        with Coordinator(("localhost", 0), chunk_size=7) as coordinator:
+            coordinator.start_local_workers(2)
+            result = coordinator.evaluate(max_stress, self.stress_history, self.steel_data, {"search_grid": None})
+        np.testing.assert_array_equal(result, self.expected)
+
+    def test_lost_worker_is_retried(self):
+        with tempfile.TemporaryDirectory() as directory:
+            kw_args = {"crash_file": os.path.join(directory, "crashed")}
+            with Coordinator(("localhost", 0), chunk_size=10) as coordinator:
+                coordinator.start_local_workers(2)
+                result = coordinator.evaluate(max_stress, self.stress_history, self.steel_data, kw_args)
+            self.assertTrue(os.path.isfile(kw_args["crash_file"]))
+        np.testing.assert_array_equal(result, self.expected)
+
+    def test_lost_chunks_fail_after_retries(self):
+        with tempfile.TemporaryDirectory() as directory:
+            kw_args = {"crash_file": os.path.join(directory, "crashed")}
+            with Coordinator(("localhost", 0), chunk_size=10, retries=0) as coordinator:
+                coordinator.start_local_workers(2)
+                with self.assertRaises(DistributedEvaluationError):
+                    coordinator.evaluate(max_stress, self.stress_history, self.steel_data, kw_args)
+
+    def test_criterion_errors_are_raised(self):
+        with Coordinator(("localhost", 0), chunk_size=10) as coordinator:
+            coordinator.start_local_workers(1)
+            with self.assertRaises(ValueError):
+                coordinator.evaluate(failing_criterion, self.stress_history, self.steel_data, {})
+
+    def test_no_workers(self):
+        with Coordinator(("localhost", 0), chunk_size=10, worker_wait=0.3) as coordinator:
+            with self.assertRaisesRegex(DistributedEvaluationError, "No worker"):
+                coordinator.evaluate(max_stress, self.stress_history, self.steel_data, {})
+
+    def test_evaluation_timeout(self):
+        with Coordinator(("localhost", 0), chunk_size=10, evaluation_timeout=0.3) as coordinator:
+            coordinator.start_local_workers(1)
+            with self.assertRaisesRegex(DistributedEvaluationError, "not evaluated within"):
+                coordinator.evaluate(slow_criterion, self.stress_history, self.steel_data, {})
+
+    def test_evaluation_timeout_argument(self):
+        with Coordinator(("localhost", 0), chunk_size=10) as coordinator:
+            coordinator.start_local_workers(1)
+            with self.assertRaisesRegex(DistributedEvaluationError, "not evaluated within 0.3 s"):
+                coordinator.evaluate(slow_criterion, self.stress_history, self.steel_data, {}, timeout=0.3)
+
+    def test_no_points(self):
+        with Coordinator(("localhost", 0), chunk_size=10, worker_wait=0.3) as coordinator:
+            result = coordinator.evaluate(max_stress, self.stress_history[:, :0, :], self.steel_data[:0], {})
+        self.assertEqual(result.shape, (0, 1))
+
+    def test_close_with_hung_worker(self):
+        coordinator = Coordinator(("localhost", 0), chunk_size=10, evaluation_timeout=0.3)
+        coordinator.start_local_workers(1)
+        with self.assertRaises(DistributedEvaluationError):
+            coordinator.evaluate(hanging_criterion, self.stress_history, self.steel_data, {})
+        start_time = time.perf_counter()
+        coordinator.close(timeout=0.5)
+        self.assertLess(time.perf_counter() - start_time, 5.)
+        self.assertFalse(coordinator.local_workers[0].is_alive())
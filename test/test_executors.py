@@ -0,0 +1,77 @@
+import os
+import time
+import unittest
+
+from concurrent.futures.process import BrokenProcessPool
+
+from fat_eval.utilities.executors import create_executor, create_stage_executors, ExecutorTimeoutError
+from fat_eval.utilities.executors import ProcessExecutor, SerialExecutor, ThreadExecutor
+
+_state = {}
+
+
+def install_offset(offset):
+    _state["offset"] = offset
+
+
+def add_offset(value):
+    return value + _state.get("offset", 0)
+
+
+def fail(value):
+    raise ValueError("Job " + str(value) + " failed")
+
+
+def exit_worker(value):
+    os._exit(1)
+
+
+def sleep(seconds):
+    time.sleep(seconds)
+    return seconds
+
+
+class TestExecutors(unittest.TestCase):
+    def tearDown(self):
+        _state.clear()
+
+    def test_results_and_initializer(self):
+        for backend in ["serial", "thread", "process"]:
+            executor = create_executor(backend, workers=2)
+            results = executor.run([(add_offset, [i], {}) for i in range(5)], initializer=install_offset,
+                                   initargs=(10, ))
+            self.assertEqual(results, [10, 11, 12, 13, 14], backend)
+
+    def test_errors_are_raised(self):
+        for backend in ["serial", "thread", "process"]:
+            with self.assertRaises(ValueError, msg=backend):
+                create_executor(backend, workers=2).run([(add_offset, [1], {}), (fail, [2], {})])
+
+    def test_timeout(self):
+        jobs = [(sleep, [0.], {}), (sleep, [0.5], {}), (sleep, [0.5], {})]
+        for executor in [SerialExecutor(timeout=0.1), ThreadExecutor(1, timeout=0.1),
+                         ThreadExecutor(2, timeout=0.1), ProcessExecutor(2, timeout=0.1)]:
+            with self.assertRaises(ExecutorTimeoutError, msg=executor.name + str(executor.workers)):
+                executor.run(jobs)
+
+    def test_lost_worker(self):
+        with self.assertRaises(BrokenProcessPool):
+            ProcessExecutor(2).run([(add_offset, [1], {}), (exit_worker, [2], {})])
+
+    def test_timeout_terminates_workers(self):
+        start_time = time.perf_counter()
+        with self.assertRaises(ExecutorTimeoutError):
+            ProcessExecutor(2, timeout=0.1).run([(sleep, [5.], {}), (sleep, [5.], {})])
+        self.assertLess(time.perf_counter() - start_time, 2.)
+
+    def test_stage_executors(self):
+        executor = ThreadExecutor(4)
+        stage_executors = create_stage_executors(("read", "evaluate"), {"read": "serial", "evaluate": executor},
+                                                 workers=2)
+        self.assertIsInstance(stage_executors["read"], SerialExecutor)
+        self.assertIs(stage_executors["evaluate"], executor)
+        self.assertIsInstance(create_stage_executors(("read", ))["read"], ProcessExecutor)
+        with self.assertRaises(ValueError):
+            create_stage_executors(("read", ), {"write": "thread"})
+        with self.assertRaises(ValueError):
+            create_executor("gpu")
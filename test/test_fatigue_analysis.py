@@ -0,0 +1,199 @@
+import contextlib
+import io
+import pathlib
+import tempfile
+import unittest
+
+from unittest import mock
+
+import numpy as np
+
+from fat_eval.multiaxial_fatigue.__main__ import parse_fatigue_file
+from fat_eval.multiaxial_fatigue.criteria import criteria
+from fat_eval.multiaxial_fatigue.evaluation import evaluate_effective_stress
+from fat_eval.multiaxial_fatigue import fatigue_analysis
+from fat_eval.multiaxial_fatigue.fatigue_analysis import (check_fatigue_fields, perform_fatigue_analysis,
+                                                          read_fatigue_fields, stress_history_chunk,
+                                                          write_fatigue_results, write_stress_history)
+from fat_eval.utilities.checkpoint import CheckpointMismatchError
+from fat_eval.utilities.executors import SerialExecutor
+from fat_eval.utilities.odb_cache import CachedABQInterface, OdbFieldCache
+from fat_eval.utilities.odb_server import NumpyOdbBackend, numpy_odb_server_command, OdbServerInterface
+
+input_file_template = """*abaqus, abq=abaqus
+*Effective_Stress, criterion=Findley, material=SS2506
+*Cyclic_stress, odb_file={directory}/max.odb, step=load, element_set=E, factor=0.9
+*Cyclic_stress, odb_file={directory}/min.odb, step=load, element_set=E
+*Static_stress, odb_file={directory}/residual.odb, step=residual, element_set=E
+*heat_treatment, odb_file={directory}/residual.odb, step=residual, element_set=E
+*write_to_odb, odb_file={output}/fatigue.odb, step=fatigue, frame=0, element_set=E
+"""
+
+# The output odb is copied from the residual stress odb and the stress history is written to its own odb
+copy_odb_lines = """*create_odb_from_odb, odb_to_copy={directory}/residual.odb, new_odb={output}/fatigue.odb
+*write_stress_history, odb_file={output}/history.odb, step=history, element_set=E
+"""
+
+
+def read_npz_odb(odb_file_name):
+    with np.load(odb_file_name) as data:
+        return {key: data[key] for key in data.files}
+
+
+def sequential_analysis(fatigue_analysis_data):
+    """
+    The steps of perform_fatigue_analysis done one after the other in the calling thread, without chunks and without
+    overlapping the odb operations with the evaluation
+    """
+    abq = NumpyOdbBackend()
+    if fatigue_analysis_data.copy_odb:
+        abq.create_empty_odb_from_odb(new_odb_filename=fatigue_analysis_data.copy_odb.new_odb,
+                                      odb_to_copy=fatigue_analysis_data.copy_odb.odb_to_copy)
+    cyclic_fields, static_fields, heat_treatment_data = read_fatigue_fields(abq, fatigue_analysis_data, cpus=1)
+    points = check_fatigue_fields(fatigue_analysis_data, cyclic_fields, static_fields, heat_treatment_data)
+    write_stress_history(abq, fatigue_analysis_data, cyclic_fields, static_fields)
+    criterion = criteria[fatigue_analysis_data.effective_stress]
+    s = evaluate_effective_stress(stress_history_chunk(fatigue_analysis_data, cyclic_fields, static_fields, 0, points),
+                                  fatigue_analysis_data.material, criterion.evaluate,
+                                  search_grid=fatigue_analysis_data.search_grid,
+                                  tolerance=fatigue_analysis_data.tolerance, executor=SerialExecutor(),
+                                  **heat_treatment_data)
+    s[~np.isfinite(s)] = 0
+    write_fatigue_results(abq, fatigue_analysis_data, criterion, s)
+    abq.close()
+
+
+class TestFatigueAnalysis(unittest.TestCase):
+    """
+    Runs complete analyses with the numpy stand-in of the odb server, the odb files are .npz files
+    """
+    points = 40
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = pathlib.Path(self.directory.name)
+        np.random.seed(3)
+        backend = NumpyOdbBackend()
+        for odb, step in [("max", "load"), ("min", "load"), ("residual", "residual")]:
+            backend.write_data_to_odb(300*np.random.randn(self.points, 6), "S", self.path / (odb + ".odb"),
+                                      step_name=step, frame_number=0, set_name="E")
+        backend.write_data_to_odb(58 + 4*np.random.rand(self.points), "SDV_HARDNESS", self.path / "residual.odb",
+                                  step_name="residual", frame_number=0, set_name="E")
+        backend.close()
+        patcher = mock.patch("fat_eval.multiaxial_fatigue.fatigue_analysis.create_odb_interface",
+                             self.create_odb_interface)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def create_odb_interface(self, abaqus, use_cache=True, odb_server=False, **_):
+        abq = OdbServerInterface(numpy_odb_server_command())
+        if use_cache:
+            abq = CachedABQInterface(abq, OdbFieldCache(self.path / "cache"))
+        return abq
+
+    def run_analysis(self, name, copy_odb=False, sequential=False, **kw_args):
+        """
+        Runs the analysis with the results written to the odb files in the directory name
+        :param copy_odb:    Create the output odb from the residual stress odb and write the stress history
+        :param sequential:  Run the steps of the analysis one after the other by sequential_analysis instead of by
+                            perform_fatigue_analysis
+        :return:            dict with the arrays of the written odb files
+        """
+        output = self.path / name
+        output.mkdir()
+        input_file = output / "fatigue.inp"
+        input_lines = input_file_template + (copy_odb_lines if copy_odb else "")
+        input_file.write_text(input_lines.format(directory=self.path, output=output))
+        with contextlib.redirect_stdout(io.StringIO()):
+            if sequential:
+                sequential_analysis(parse_fatigue_file(input_file))
+            else:
+                perform_fatigue_analysis(parse_fatigue_file(input_file), **kw_args)
+        return {odb_file.name: read_npz_odb(odb_file) for odb_file in output.glob("*.odb")}
+
+    def assert_same_odbs(self, odbs, expected_odbs):
+        self.assertEqual(sorted(odbs), sorted(expected_odbs))
+        for odb_file_name, expected_fields in expected_odbs.items():
+            self.assertEqual(sorted(odbs[odb_file_name]), sorted(expected_fields))
+            for key, expected in expected_fields.items():
+                np.testing.assert_allclose(odbs[odb_file_name][key], expected, rtol=1e-12, atol=1e-12, err_msg=key)
+
+    def test_serial_analysis(self):
+        odbs = self.run_analysis("serial", cpus=1, use_cache=False)
+        sf = odbs["fatigue.odb"]["fatigue/0/SF/E/"]
+        self.assertEqual(sf.shape, (self.points, ))
+        self.assertTrue(np.all(sf > 0))
+
+    def test_streaming_chunks_equal_in_memory(self):
+        expected = self.run_analysis("in_memory", cpus=1, use_cache=False)
+        # The fields are extracted to the cache by the worker processes and memory mapped from the cache
+        self.assert_same_odbs(self.run_analysis("streaming", cpus=2, chunk_size=7), expected)
+        self.assert_same_odbs(self.run_analysis("streaming_cached", cpus=2, chunk_size=13), expected)
+        self.assert_same_odbs(self.run_analysis("chunked", cpus=2, chunk_size=7, use_cache=False), expected)
+
+    def test_stage_executors_equal_serial(self):
+        expected = self.run_analysis("serial", cpus=1, use_cache=False)
+        odbs = self.run_analysis("threads", cpus=2, chunk_size=13, executors={"read": "thread", "evaluate": "thread"})
+        self.assert_same_odbs(odbs, expected)
+        self.assert_same_odbs(self.run_analysis("dynamic_threads", cpus=2, scheduler="dynamic",
+                                                executors={"evaluate": "thread"}), expected)
+        self.assert_same_odbs(self.run_analysis("shared_memory", cpus=2, chunk_size=7, shared_memory=True,
+                                                executor_timeout=60.), expected)
+
+    def test_coordinator_with_evaluate_executor(self):
+        with self.assertRaises(ValueError):
+            perform_fatigue_analysis(None, cpus=2, coordinator=object(), executors={"evaluate": "thread"})
+
+    def test_overlapped_io_equals_sequential(self):
+        expected = self.run_analysis("sequential", copy_odb=True, sequential=True)
+        self.assertEqual(sorted(expected), ["fatigue.odb", "history.odb"])
+        # The odb operations run in a background thread and the next chunk is built while a chunk is evaluated
+        self.assert_same_odbs(self.run_analysis("overlapped", copy_odb=True, cpus=1), expected)
+        self.assert_same_odbs(self.run_analysis("overlapped_chunks", copy_odb=True, cpus=2, chunk_size=7), expected)
+
+    def run_counted_analysis(self, name, interrupt_after=None, **kw_args):
+        """
+        Runs the analysis and records the evaluated chunks, the analysis is interrupted by a KeyboardInterrupt when
+        interrupt_after chunks have been evaluated
+        :return:    list with the number of points of each evaluated chunk and the written odbs, None if interrupted
+        """
+        evaluated_points = []
+
+        def evaluate_chunk(stress_history, *args, **evaluation_kw_args):
+            if len(evaluated_points) == interrupt_after:
+                raise KeyboardInterrupt
+            evaluated_points.append(stress_history.shape[1])
+            return evaluate_effective_stress(stress_history, *args, **evaluation_kw_args)
+
+        odbs = None
+        with mock.patch.object(fatigue_analysis, "evaluate_effective_stress", evaluate_chunk):
+            if interrupt_after is None:
+                odbs = self.run_analysis(name, **kw_args)
+            else:
+                with self.assertRaises(KeyboardInterrupt):
+                    self.run_analysis(name, **kw_args)
+        return evaluated_points, odbs
+
+    def test_resume_from_checkpoint(self):
+        expected = self.run_analysis("uninterrupted", cpus=1)
+        checkpoint_directory = self.path / "checkpoint"
+        self.run_counted_analysis("interrupted", 3, chunk_size=10, checkpoint_directory=checkpoint_directory)
+        self.assertTrue((checkpoint_directory / "manifest.json").is_file())
+        evaluated_points, odbs = self.run_counted_analysis("resumed", chunk_size=10, resume=True,
+                                                           checkpoint_directory=checkpoint_directory)
+        self.assertEqual(evaluated_points, [10])
+        self.assert_same_odbs(odbs, expected)
+        self.assertFalse(checkpoint_directory.exists())
+
+    def test_checkpoint_of_modified_odb_is_not_resumed(self):
+        checkpoint_directory = self.path / "checkpoint"
+        self.run_counted_analysis("interrupted", 2, chunk_size=10, checkpoint_directory=checkpoint_directory)
+        backend = NumpyOdbBackend()
+        backend.write_data_to_odb(300*np.random.randn(self.points, 6), "S", self.path / "max.odb", step_name="load",
+                                  frame_number=1, set_name="E")
+        backend.close()
+        with self.assertRaises(CheckpointMismatchError):
+            self.run_analysis("resumed", chunk_size=10, checkpoint_directory=checkpoint_directory, resume=True)
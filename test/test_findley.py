@@ -0,0 +1,103 @@
+import unittest
+
+from types import SimpleNamespace
+
+import numpy as np
+
+from benchmarks.references import reference_findley
+from fat_eval.fatigue_materials import materials, register_material
+from fat_eval.multiaxial_fatigue.findley import Findley, findley, smallest_enclosing_circle
+from fat_eval.multiaxial_fatigue.findley import smallest_enclosing_circles, findley_adaptive
+from fat_eval.multiaxial_fatigue.critical_planes import plane_normals, plane_transform_matrices
+
+
+np.random.seed(1)
+random_history = 400*np.random.randn(2, 20, 6)
+random_k = 0.5 + 0.1*np.random.rand(20)
+
+uniaxial_history = np.zeros((2, 2, 6))
+uniaxial_history[0, :, 0] = 1000
+uniaxial_history[1, 1, 0] = -1000
+
+
+class TestFindley(unittest.TestCase):
+    def test_random_history_matches_reference(self):
+        reference = reference_findley(random_history, random_k, 20)
+        sf = findley(random_history, random_k, 20)
+        np.testing.assert_allclose(sf, reference, rtol=1e-9)
+
+    def test_chunked_evaluation(self):
+        np.testing.assert_allclose(findley(random_history, random_k, 20, chunk_size=3),
+                                   findley(random_history, random_k, 20), rtol=1e-12)
+
+    def test_uniaxial_alternating(self):
+        sf = findley(uniaxial_history, np.zeros(2), 5)
+        self.assertTrue(abs(sf[0, 0] - 250) < 1e-6)
+        self.assertTrue(abs(sf[1, 0] - 500) < 1e-6)
+
+
+class TestSmallestEnclosingCircles(unittest.TestCase):
+    def test_random_paths_match_reference(self):
+        for time_points in [1, 2, 3, 4, 7, 25]:
+            x = np.random.randn(50, time_points)
+            y = np.random.randn(50, time_points)
+            _, _, radii = smallest_enclosing_circles(x, y)
+            for i in range(50):
+                # The reference implementation is not robust for collinear points but random points are not collinear
+                _, _, radius = smallest_enclosing_circle(x[i], y[i])
+                self.assertTrue(abs(radii[i] - radius) < 1e-9)
+
+    def test_collinear_points(self):
+        x = np.array([[0., 1., 2.], [0., 0., 0.], [-1., 3., 1.], [0., 1., 2.]])
+        y = np.array([[0., 1., 2.], [1., 2., 4.], [0., 0., 0.], [0., 0., 0.]])
+        _, _, radii = smallest_enclosing_circles(x, y)
+        np.testing.assert_allclose(radii, [np.sqrt(2), 1.5, 2., 1.])
+
+    def test_points_on_a_circle(self):
+        angles = np.linspace(0, 2*np.pi, 37)
+        xc, yc, radius = smallest_enclosing_circles(3 + 2*np.cos(angles)[None, :], -1 + 2*np.sin(angles)[None, :])
+        np.testing.assert_allclose([xc[0], yc[0], radius[0]], [3, -1, 2], atol=1e-9)
+
+
+class TestAdaptiveFindley(unittest.TestCase):
+    def test_adaptive_search_reaches_tolerance(self):
+        fine = findley(random_history, random_k, 1)
+        for tolerance in [5., 1., 0.1]:
+            sf, convergence = findley_adaptive(random_history, random_k, tolerance)
+            self.assertTrue(np.all(np.abs(sf[:, 0] - fine[:, 0]) < tolerance + 0.2))
+            self.assertTrue(np.all(convergence < tolerance + 0.5))
+
+    def test_convergence_against_fine_reference(self):
+        np.random.seed(5)
+        stress_history = 300*np.random.randn(2, 100, 6)
+        fine = findley(stress_history, 0.3, 1)[:, 0]
+        # With a coarse sweep bracketing the peaks the Findley stress of the 1 degree grid, which is a lower bound of
+        # the maximum, is within the spread of the refined planes
+        sf, convergence = findley_adaptive(stress_history, 0.3, 0.5, search_grid=5)
+        self.assertTrue(np.all(fine - sf[:, 0] <= convergence + 1e-9))
+        self.assertTrue(np.all(convergence <= 0.5))
+        # With a coarse sweep of 30 degrees peaks are missed and the spread is only a local measure
+        sf, convergence = findley_adaptive(stress_history, 0.3, 0.5, search_grid=30)
+        self.assertTrue(np.any(fine - sf[:, 0] > convergence + 1.))
+
+    def test_tolerance_requires_critical_findley_stress(self):
+        register_material("NoCriticalStress", SimpleNamespace(name="NoCriticalStress",
+                                                              findley_k=lambda steel_data: random_k))
+        try:
+            self.assertEqual(Findley.evaluate(random_history, None, "NoCriticalStress", 20).shape, (20, 1))
+            with self.assertRaises(ValueError):
+                Findley.evaluate(random_history, None, "NoCriticalStress", 20, tolerance=1.)
+        finally:
+            del materials["NoCriticalStress"]
+
+
+class TestCriticalPlanes(unittest.TestCase):
+    def test_no_duplicated_planes(self):
+        for sampling in ["grid", "sphere"]:
+            normals = plane_normals(10, sampling)
+            cos_angles = np.abs(np.dot(normals, normals.T)) - np.eye(normals.shape[0])
+            self.assertTrue(np.all(cos_angles < 1 - 1e-9))
+
+    def test_planes_are_cached(self):
+        self.assertTrue(plane_transform_matrices(10) is plane_transform_matrices(10.))
+        self.assertFalse(plane_transform_matrices(10).flags.writeable)
@@ -0,0 +1,23 @@
+import unittest
+import numpy as np
+
+from benchmarks.references import reference_haigh
+from fat_eval.multiaxial_fatigue.haigh import haigh
+
+
+np.random.seed(2)
+random_history = 300*np.random.randn(4, 30, 6)
+random_k = np.random.rand(30)
+
+
+class TestHaigh(unittest.TestCase):
+    def test_random_history_matches_reference(self):
+        np.testing.assert_allclose(haigh(random_history, random_k),
+                                   reference_haigh(random_history, random_k), rtol=1e-9)
+
+    def test_chunked_evaluation(self):
+        np.testing.assert_allclose(haigh(random_history, random_k, chunk_size=7), haigh(random_history, random_k))
+
+    def test_single_time_step(self):
+        with self.assertRaises(ValueError):
+            haigh(random_history[:1], random_k)
@@ -0,0 +1,88 @@
+import pathlib
+import pickle
+import tempfile
+import unittest
+
+import numpy as np
+
+from fat_eval.utilities.odb_cache import CachedABQInterface, OdbFieldCache
+
+
+class CountingReader:
+    def __init__(self):
+        self.reads = 0
+
+    def read_data_from_odb(self, field_id, odb_file_name, step_name=None, frame_number=-1, set_name='',
+                           instance_name=None, get_position_numbers=False):
+        self.reads += 1
+        if set_name == "EMPTY":
+            return np.zeros((0, 3))
+        data = np.arange(12.).reshape(4, 3) + frame_number
+        if get_position_numbers:
+            return data, None, np.array([1, 1, 2, 2])
+        return data
+
+    def get_steps(self, odb_file_name):
+        return ["step"]
+
+
+class TestOdbCache(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.odb_file = pathlib.Path(self.directory.name) / "model.odb"
+        self.odb_file.write_bytes(b"odb")
+        self.reader = CountingReader()
+        self.abq = CachedABQInterface(self.reader, OdbFieldCache(pathlib.Path(self.directory.name) / "cache"))
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_repeated_reads_are_cached(self):
+        first = self.abq.read_data_from_odb("S", self.odb_file, "step", 0)
+        second = self.abq.read_data_from_odb(field_id="S", odb_file_name=self.odb_file, step_name="step",
+                                             frame_number=0)
+        np.testing.assert_array_equal(first, second)
+        self.assertEqual(self.reader.reads, 1)
+        self.abq.read_data_from_odb("S", self.odb_file, "step", 1)
+        self.assertEqual(self.reader.reads, 2)
+
+    def test_tuples_are_cached(self):
+        self.abq.read_data_from_odb("S", self.odb_file, "step", 0, get_position_numbers=True)
+        data, _, labels = self.abq.read_data_from_odb("S", self.odb_file, "step", 0, get_position_numbers=True)
+        np.testing.assert_array_equal(labels, [1, 1, 2, 2])
+        self.assertEqual(self.reader.reads, 1)
+
+    def test_modified_odb_is_read_again(self):
+        self.abq.read_data_from_odb("S", self.odb_file, "step", 0)
+        self.odb_file.write_bytes(b"modified odb")
+        self.abq.read_data_from_odb("S", self.odb_file, "step", 0)
+        self.assertEqual(self.reader.reads, 2)
+
+    def test_empty_arrays_are_cached(self):
+        for _ in range(2):
+            data = self.abq.read_data_from_odb("S", self.odb_file, "step", 0, set_name="EMPTY")
+        self.assertEqual(data.shape, (0, 3))
+        self.assertEqual(self.reader.reads, 1)
+
+    def test_corrupt_entry_is_replaced(self):
+        self.abq.read_data_from_odb("S", self.odb_file, "step", 0)
+        _, _, entry = self.abq.cache.entries()[0]
+        for array_file in entry.glob("*.npy"):
+            array_file.write_bytes(b"corrupt")
+        np.testing.assert_array_equal(self.abq.read_data_from_odb("S", self.odb_file, "step", 0),
+                                      np.arange(12.).reshape(4, 3))
+        np.testing.assert_array_equal(self.abq.read_data_from_odb("S", self.odb_file, "step", 0),
+                                      np.arange(12.).reshape(4, 3))
+        self.assertEqual(self.reader.reads, 2)
+        self.assertEqual(len(list(entry.glob("*.npy"))), 1)
+
+    def test_eviction(self):
+        self.abq.read_data_from_odb("S", self.odb_file, "step", 0)
+        self.abq.cache.max_size = 1.5*self.abq.cache.entries()[0][1]
+        for frame in range(1, 3):
+            self.abq.read_data_from_odb("S", self.odb_file, "step", frame)
+        self.assertEqual(len(self.abq.cache.entries()), 1)
+
+    def test_forwarding_and_pickling(self):
+        self.assertEqual(self.abq.get_steps(self.odb_file), ["step"])
+        self.assertEqual(pickle.loads(pickle.dumps(self.abq)).get_steps(self.odb_file), ["step"])
@@ -0,0 +1,281 @@
+import importlib
+import io
+import pathlib
+import pickle
+import sys
+import tempfile
+import types
+import unittest
+
+from unittest import mock
+
+import numpy as np
+
+from abaqus_python_interface import OdbReadingError, OdbWritingError
+
+from fat_eval.utilities.odb_batches import group_by_odb_file, OdbWriteBatch, read_odb_fields
+from fat_eval.utilities.odb_server import NumpyOdbBackend, numpy_odb_server_command, OdbServerInterface
+from fat_eval.utilities.odb_server_protocol import read_message, serve, write_message
+
+
+class TestProtocol(unittest.TestCase):
+    def test_message_round_trip(self):
+        message = {"method": "write_data_to_odb", "args": [np.arange(6.).reshape(2, 3)],
+                   "kwargs": {"odb_file_name": pathlib.Path("/tmp/model.odb"), "frame_number": np.int64(2),
+                              "labels": (np.array([1, 2], dtype=np.int32), None)}}
+        stream = io.BytesIO()
+        write_message(stream, message)
+        stream.seek(0)
+        decoded = read_message(stream)
+        np.testing.assert_array_equal(decoded["args"][0], message["args"][0])
+        self.assertEqual(decoded["kwargs"]["odb_file_name"], "/tmp/model.odb")
+        self.assertEqual(decoded["kwargs"]["frame_number"], 2)
+        self.assertEqual(decoded["kwargs"]["labels"][0].dtype, np.int32)
+        self.assertIsNone(decoded["kwargs"]["labels"][1])
+
+
+class TestNumpyOdbServer(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.odb_file = pathlib.Path(self.directory.name) / "model.odb"
+        self.server = OdbServerInterface(numpy_odb_server_command())
+        self.labels = np.repeat(np.arange(1, 4), [8, 1, 8])
+        self.server.request("set_element_data", self.odb_file, {"C3D8R": {2: np.zeros((8, 3))}},
+                            element_set_name="ALL", integration_point_labels=self.labels)
+
+    def tearDown(self):
+        self.server.close()
+        self.directory.cleanup()
+
+    def test_write_and_read(self):
+        stress = np.random.rand(17, 6)
+        self.server.write_data_to_odb(stress, "S", self.odb_file, step_name="load", frame_number=0, set_name="ALL")
+        data, integration_points, labels = self.server.read_data_from_odb("S", self.odb_file, "load", 0, "ALL",
+                                                                          get_position_numbers=True)
+        np.testing.assert_array_equal(data, stress)
+        np.testing.assert_array_equal(labels, self.labels)
+        np.testing.assert_array_equal(integration_points, np.r_[np.arange(1, 9), 1, np.arange(1, 9)])
+        self.assertEqual(list(self.server.get_element_data(self.odb_file)), ["C3D8R"])
+        with self.assertRaises(OdbReadingError):
+            self.server.read_data_from_odb("SF", self.odb_file, "load", 0, "ALL")
+
+    def test_batch_and_persistence(self):
+        fields = np.random.rand(3, 17)
+        self.server.batch([("write_data_to_odb", [field, "SF", self.odb_file],
+                            {"step_name": "fatigue", "frame_number": i, "set_name": "ALL"})
+                           for i, field in enumerate(fields)])
+        self.server.close()
+        server = pickle.loads(pickle.dumps(self.server))
+        self.assertEqual(server.get_steps(self.odb_file), ["fatigue"])
+        self.assertEqual(server.get_frames(self.odb_file, "fatigue"), [0, 1, 2])
+        data = server.batch([("read_data_from_odb", ["SF", self.odb_file, "fatigue", i, "ALL"], {})
+                             for i in range(3)])
+        np.testing.assert_array_equal(np.array(data), fields)
+        server.close()
+
+    def test_read_odb_fields(self):
+        second_odb_file = self.odb_file.with_name("second.odb")
+        fields = np.random.rand(4, 17)
+        requests = []
+        for i, field in enumerate(fields):
+            odb_file = self.odb_file if i % 2 == 0 else second_odb_file
+            self.server.write_data_to_odb(field, "SF", odb_file, step_name="load", frame_number=i, set_name="ALL")
+            requests.append({"field_id": "SF", "odb_file_name": odb_file, "step_name": "load", "frame_number": i,
+                             "set_name": "ALL"})
+        self.server.close()
+        np.testing.assert_array_equal(np.array(read_odb_fields(self.server, requests, cpus=2)), fields)
+
+
+class RecordingOdbInterface:
+    def __init__(self):
+        self.writes = []
+
+    def write_data_to_odb(self, field, field_id, odb_file_name, **kw_args):
+        if field_id == "invalid":
+            raise OdbWritingError("Cannot write " + field_id)
+        self.writes.append((field_id, odb_file_name))
+
+
+class TestOdbBatches(unittest.TestCase):
+    def test_group_by_odb_file(self):
+        requests = [("read_data_from_odb", ["S", "a.odb"], {}), ("read_data_from_odb", [], {"odb_file_name": "b.odb"}),
+                    ("write_data_to_odb", [np.zeros(3), "SF", "a.odb"], {}), ("get_steps", ["b.odb"], {})]
+        self.assertEqual(list(group_by_odb_file(requests).items()), [("a.odb", [0, 2]), ("b.odb", [1, 3])])
+
+    def test_write_batch(self):
+        abq = RecordingOdbInterface()
+        errors = []
+        with OdbWriteBatch(abq, max_memory=3*8*10, error_handler=lambda kw_args, e: errors.append(kw_args)) as writes:
+            for field_id in ["S1", "invalid", "S2", "S3"]:
+                writes.write_data_to_odb(field=np.zeros(10), field_id=field_id, odb_file_name="a.odb")
+            # The memory limit is exceeded by the fourth field
+            self.assertEqual(abq.writes, [("S1", "a.odb"), ("S2", "a.odb"), ("S3", "a.odb")])
+            writes.write_data_to_odb(field=np.zeros(10), field_id="S4", odb_file_name="a.odb")
+            self.assertEqual(len(abq.writes), 3)
+        self.assertEqual(abq.writes[-1], ("S4", "a.odb"))
+        self.assertEqual([kw_args["field_id"] for kw_args in errors], ["invalid"])
+
+
+class FakeOdbObject:
+    def __init__(self, **attributes):
+        self.__dict__.update(attributes)
+
+
+class FakeFieldOutput:
+    """
+    Minimal field output of the Abaqus odb api, the values of all elements in one bulk data block
+    """
+    def __init__(self, name, description='', type=None, validInvariants=None, data=None, labels=None,
+                 integration_points=None):
+        self.name = name
+        self.data = np.zeros((0, 1)) if data is None else data
+        self.labels = np.zeros(0, dtype=int) if labels is None else labels
+        self.integration_points = np.zeros(0, dtype=int) if integration_points is None else integration_points
+
+    def addData(self, position, instance, labels, data):
+        points_per_element = len(data)//len(labels)
+        self.data = np.array(data, dtype=float)
+        self.labels = np.repeat(labels, points_per_element)
+        self.integration_points = np.tile(np.arange(1, points_per_element + 1), len(labels))
+
+    def getSubset(self, region=None, position=None):
+        if region is None:
+            return self
+        selected = np.isin(self.labels, [element.label for element in region.elements])
+        return FakeFieldOutput(self.name, data=self.data[selected], labels=self.labels[selected],
+                               integration_points=self.integration_points[selected])
+
+    @property
+    def bulkDataBlocks(self):
+        return [FakeOdbObject(data=self.data, elementLabels=self.labels, integrationPoints=self.integration_points)]
+
+
+class FakeStep:
+    def __init__(self):
+        self.frames = []
+
+    def Frame(self, incrementNumber, frameValue, description=''):
+        frame = FakeOdbObject(frameId=len(self.frames), frameValue=frameValue, fieldOutputs={})
+        frame.FieldOutput = lambda name, **kw_args: frame.fieldOutputs.setdefault(name, FakeFieldOutput(name))
+        self.frames.append(frame)
+        return frame
+
+
+class FakeOdb:
+    def __init__(self, element_labels):
+        elements = [FakeOdbObject(label=label, type="C3D8R", connectivity=(1, )) for label in element_labels]
+        instance = FakeOdbObject(elements=elements, nodes=[FakeOdbObject(label=1, coordinates=(0., 0., 0.))],
+                                 elementSets={"ALL": FakeOdbObject(elements=elements)})
+        self.rootAssembly = FakeOdbObject(instances={"PART-1": instance}, elementSets={}, datumCsyses={})
+        self.steps = {}
+        self.isReadOnly = True
+
+    def Step(self, name, **kw_args):
+        self.steps[name] = FakeStep()
+        return self.steps[name]
+
+    def save(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def fake_abaqus_modules(odbs):
+    """
+    Fake odbAccess and abaqusConstants modules, the odb files are the FakeOdb objects in odbs
+    """
+    constants = types.ModuleType("abaqusConstants")
+    for name in ["CENTROID", "DEFORMABLE_BODY", "ELEMENT_NODAL", "INTEGRATION_POINT", "NODAL", "SCALAR",
+                 "TENSOR_3D_FULL", "THREE_D", "TIME", "MAX_PRINCIPAL", "MID_PRINCIPAL", "MIN_PRINCIPAL", "MISES",
+                 "TRESCA", "PRESS"]:
+        setattr(constants, name, name)
+    odb_access = types.ModuleType("odbAccess")
+    odb_access.isUpgradeRequiredForOdb = lambda odb_file_name: False
+    odb_access.openOdb = lambda odb_file_name, readOnly=True: odbs[odb_file_name]
+    return {"abaqusConstants": constants, "odbAccess": odb_access}
+
+
+class TestBackendContract(unittest.TestCase):
+    """
+    The numpy stand-in and the Abaqus backend, with a fake odb api, give the same responses to the same requests
+    """
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.odb_file = str(pathlib.Path(self.directory.name).resolve() / "model.odb")
+        self.element_labels = [1, 2, 3]
+        np.random.seed(5)
+        stress = np.random.rand(6, 6)
+        hardness = np.random.rand(6)
+        request = {"odb_file_name": self.odb_file, "step_name": "load", "set_name": "ALL"}
+        self.requests = [
+            {"method": "write_data_to_odb", "args": [stress, "S"], "kwargs": dict(request, frame_number=0)},
+            {"method": "write_data_to_odb", "args": [hardness, "HV"], "kwargs": dict(request, frame_number=1)},
+            {"method": "get_steps", "args": [self.odb_file], "kwargs": {}},
+            {"method": "get_frames", "args": [self.odb_file], "kwargs": {"step_name": "load"}},
+            {"method": "read_data_from_odb", "args": ["S"],
+             "kwargs": dict(request, frame_number=0, get_position_numbers=True)},
+            {"method": "read_data_from_odb", "args": ["HV"], "kwargs": dict(request, frame_number=1,
+                                                                           get_frame_value=True)},
+            {"method": "batch", "args": [
+                {"method": "read_data_from_odb", "args": ["S"], "kwargs": dict(request, frame_number=0)},
+                {"method": "read_data_from_odb", "args": ["SF"], "kwargs": dict(request, frame_number=0)}]},
+            {"method": "read_data_from_odb", "args": ["S"], "kwargs": dict(request, step_name="missing")},
+            {"method": "read_data_from_odb", "args": ["S"], "kwargs": dict(request, frame_number=5)},
+            {"method": "read_data_from_odb", "args": ["S"], "kwargs": dict(request, frame_number="last")},
+            {"method": "read_data_from_odb", "args": ["S"], "kwargs": dict(request, frame_number=0,
+                                                                          set_name="missing")},
+            {"method": "read_data_from_odb", "args": ["S"],
+             "kwargs": {"odb_file_name": self.odb_file + ".missing", "step_name": "load"}},
+        ]
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def responses(self, backend):
+        input_stream = io.BytesIO()
+        for request in self.requests:
+            write_message(input_stream, request)
+        input_stream.seek(0)
+        output_stream = io.BytesIO()
+        serve(backend, input_stream, output_stream)
+        output_stream.seek(0)
+        return [read_message(output_stream) for _ in self.requests]
+
+    def numpy_responses(self):
+        backend = NumpyOdbBackend()
+        backend.set_element_data(self.odb_file, {"C3D8R": {label: np.zeros((1, 3)) for label in self.element_labels}},
+                                  element_set_name="ALL", integration_point_labels=np.repeat(self.element_labels, 2))
+        backend.flush()
+        return self.responses(backend)
+
+    def abaqus_responses(self):
+        pathlib.Path(self.odb_file).write_bytes(b"odb")
+        modules = fake_abaqus_modules({self.odb_file: FakeOdb(self.element_labels)})
+        with mock.patch.dict(sys.modules, modules), mock.patch.object(sys, "path", list(sys.path)):
+            sys.modules.pop("fat_eval.utilities.abaqus_odb_server", None)
+            abaqus_odb_server = importlib.import_module("fat_eval.utilities.abaqus_odb_server")
+            return self.responses(abaqus_odb_server.AbaqusOdbBackend())
+
+    def assert_same_response(self, numpy_response, abaqus_response, request):
+        if "error" in numpy_response:
+            self.assertEqual(numpy_response["error"][0], "OdbReadingError", request)
+            self.assertEqual(abaqus_response.get("error", [None])[0], "OdbReadingError", request)
+            return
+        self.assertEqual(sorted(abaqus_response), ["result"], request)
+        numpy_result, abaqus_result = numpy_response["result"], abaqus_response["result"]
+        if request["method"] == "batch":
+            for sub_request, numpy_sub_response, abaqus_sub_response in zip(request["args"], numpy_result,
+                                                                             abaqus_result):
+                self.assert_same_response(numpy_sub_response, abaqus_sub_response, sub_request)
+            return
+        if not isinstance(numpy_result, (list, tuple)):
+            numpy_result, abaqus_result = [numpy_result], [abaqus_result]
+        self.assertEqual(len(numpy_result), len(abaqus_result), request)
+        for numpy_value, abaqus_value in zip(numpy_result, abaqus_result):
+            np.testing.assert_array_equal(np.asarray(numpy_value), np.asarray(abaqus_value))
+
+    def test_same_responses(self):
+        for request, numpy_response, abaqus_response in zip(self.requests, self.numpy_responses(),
+                                                             self.abaqus_responses()):
+            self.assert_same_response(numpy_response, abaqus_response, request)
@@ -0,0 +1,72 @@
+import json
+import pathlib
+import pickle
+import pstats
+import tempfile
+import threading
+import time
+import unittest
+
+import numpy as np
+
+from fat_eval.utilities.profiling import nbytes, Profiler
+
+
+def kernel(n):
+    return np.sort(np.random.rand(n)).sum()
+
+
+class TestProfiler(unittest.TestCase):
+    def test_phases_are_accumulated(self):
+        profiler = Profiler()
+        for _ in range(3):
+            with profiler.phase("evaluate", points=1000):
+                kernel(1000)
+        profiler.add_bytes("evaluate", to_workers=100, from_workers=np.zeros(10).nbytes)
+        report = profiler.report()["phases"]["evaluate"]
+        self.assertEqual(report["calls"], 3)
+        self.assertEqual(report["points"], 3000)
+        self.assertEqual(report["bytes_from_workers"], 80)
+        self.assertTrue(report["wall_time"] > 0)
+        self.assertTrue(report["points_per_second"] > 0)
+
+    def test_overlapping_phases(self):
+        profiler = Profiler()
+        with profiler.phase("write"):
+            thread = threading.Thread(target=self.busy_phase, args=(profiler, ))
+            thread.start()
+            thread.join()
+        phases = profiler.report()["phases"]
+        self.assertTrue(phases["evaluate"]["cpu_time"] > 0.05)
+        self.assertTrue(phases["write"]["cpu_time"] < 0.5*phases["evaluate"]["cpu_time"])
+
+    @staticmethod
+    def busy_phase(profiler):
+        with profiler.phase("evaluate"):
+            start = time.thread_time()
+            while time.thread_time() - start < 0.1:
+                kernel(1000)
+
+    def test_disabled_profiler(self):
+        profiler = Profiler(enabled=False)
+        with profiler.phase("evaluate", points=1000):
+            kernel(1000)
+        profiler.add_bytes("evaluate", to_workers=100)
+        self.assertEqual(profiler.report()["phases"], {})
+
+    def test_report_and_cprofile_dumps(self):
+        with tempfile.TemporaryDirectory() as directory:
+            directory = pathlib.Path(directory)
+            profiler = Profiler(directory / "cprofile")
+            profiled_kernel = pickle.loads(pickle.dumps(profiler.profiled_function(kernel)))
+            with profiler.phase("evaluate"):
+                self.assertTrue(profiled_kernel(100) > 0)
+            profiler.write_report(directory / "report.json")
+            with open(directory / "report.json") as report_file:
+                self.assertTrue("evaluate" in json.load(report_file)["phases"])
+            dumps = list((directory / "cprofile").iterdir())
+            self.assertEqual(len(dumps), 1)
+            pstats.Stats(str(dumps[0]))
+
+    def test_nbytes(self):
+        self.assertEqual(nbytes([np.zeros(3), (np.zeros(2), None)], {"a": np.zeros(1, dtype=np.float32)}), 44)
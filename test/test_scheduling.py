@@ -0,0 +1,92 @@
+import os
+import time
+import unittest
+
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+
+from fat_eval.multiaxial_fatigue.evaluation import evaluate_effective_stress
+from fat_eval.multiaxial_fatigue.scheduling import ChunkSizeTuner, DynamicScheduler
+from fat_eval.utilities.executors import ExecutorTimeoutError, ProcessExecutor, ThreadExecutor
+
+
+def max_stress(stress_history, steel_data, material_name=None, search_grid=None):
+    return np.max(stress_history[:, :, 0], axis=0)[:, None] + steel_data.HV[:, None]
+
+
+def dying_criterion(stress_history, steel_data, **_):
+    os._exit(1)
+
+
+def failing_criterion(stress_history, steel_data, **_):
+    # The chunk with the first point fails, the other chunks do not finish
+    if steel_data.HV[0] == 0:
+        raise ValueError("Failing chunk")
+    time.sleep(60)
+
+
+def slow_criterion(stress_history, steel_data, **_):
+    time.sleep(0.5)
+    return np.zeros((stress_history.shape[1], 1))
+
+
+class TestChunkSizeTuner(unittest.TestCase):
+    def test_chunk_sizes(self):
+        tuner = ChunkSizeTuner(workers=2, initial_size=10, target_time=0.5)
+        self.assertEqual(tuner.next_size(1000), 10)
+        tuner.record(10, 0.01)
+        # 1000 points per second gives 500 points in 0.5 s, limited by half of the remaining points per worker
+        self.assertEqual(tuner.next_size(10000), 500)
+        self.assertEqual(tuner.next_size(1000), 250)
+        self.assertEqual(tuner.next_size(2), 1)
+
+
+class TestDynamicScheduler(unittest.TestCase):
+    def test_evaluate(self):
+        stress_history = np.random.rand(4, 500, 6)
+        hardness = np.arange(500.)
+        expected = np.max(stress_history[:, :, 0], axis=0)[:, None] + hardness[:, None]
+        scheduler = DynamicScheduler(initial_chunk_size=8)
+        result = evaluate_effective_stress(stress_history, "SS2506", max_stress, cpus=3, scheduler=scheduler,
+                                           HV=hardness)
+        np.testing.assert_array_equal(result, expected)
+        chunks = sorted(scheduler.chunks)
+        self.assertGreater(len(chunks), 3)
+        self.assertEqual([chunk[0] for chunk in chunks[1:]], [chunk[1] for chunk in chunks[:-1]])
+        self.assertEqual(chunks[-1][1], 500)
+
+    def test_thread_executor(self):
+        stress_history = np.random.rand(4, 200, 6)
+        hardness = np.arange(200.)
+        expected = np.max(stress_history[:, :, 0], axis=0)[:, None] + hardness[:, None]
+        scheduler = DynamicScheduler(initial_chunk_size=8)
+        result = evaluate_effective_stress(stress_history, "SS2506", max_stress, cpus=3, scheduler=scheduler,
+                                           executor=ThreadExecutor(3), HV=hardness)
+        np.testing.assert_array_equal(result, expected)
+        self.assertGreater(len(scheduler.chunks), 3)
+
+    def test_lost_worker_process(self):
+        with self.assertRaises(BrokenProcessPool):
+            evaluate_effective_stress(np.zeros((2, 50, 6)), "SS2506", dying_criterion, cpus=2, scheduler="dynamic",
+                                      HV=np.zeros(50))
+
+    def test_error_stops_workers(self):
+        start_time = time.perf_counter()
+        with self.assertRaisesRegex(ValueError, "Failing chunk"):
+            evaluate_effective_stress(np.zeros((2, 50, 6)), "SS2506", failing_criterion, cpus=2,
+                                      scheduler=DynamicScheduler(initial_chunk_size=5), HV=np.arange(50.))
+        self.assertLess(time.perf_counter() - start_time, 10.)
+
+    def test_timeout(self):
+        for executor in [ProcessExecutor(2, timeout=0.2), ThreadExecutor(2, timeout=0.2)]:
+            start_time = time.perf_counter()
+            with self.assertRaises(ExecutorTimeoutError):
+                evaluate_effective_stress(np.zeros((2, 50, 6)), "SS2506", slow_criterion, scheduler="dynamic",
+                                          executor=executor, HV=np.zeros(50))
+            self.assertLess(time.perf_counter() - start_time, 0.5)
+
+    def test_invalid_scheduler(self):
+        with self.assertRaises(ValueError):
+            evaluate_effective_stress(np.zeros((2, 3, 6)), "SS2506", max_stress, scheduler="round_robin",
+                                      HV=np.zeros(3))
@@ -0,0 +1,73 @@
+import time
+import unittest
+
+from multiprocessing import shared_memory
+from unittest import mock
+
+import numpy as np
+
+from fat_eval.multiaxial_fatigue.evaluation import evaluate_effective_stress
+from fat_eval.utilities.executors import ExecutorTimeoutError, ProcessExecutor, SerialExecutor
+from fat_eval.utilities.shared_arrays import SharedArray
+
+
+def amplitude(stress_history, steel_data, material_name=None, search_grid=None):
+    amplitudes = (np.max(stress_history[:, :, 0], axis=0) - np.min(stress_history[:, :, 0], axis=0))/2
+    return np.stack([amplitudes, amplitudes/steel_data.HV], axis=1)
+
+
+def slow_amplitude(stress_history, steel_data, **kw_args):
+    # The first point is evaluated in the calling process to find the shape of the output
+    if stress_history.shape[1] > 1:
+        time.sleep(1.)
+    return amplitude(stress_history, steel_data, **kw_args)
+
+
+class TestSharedMemoryEvaluation(unittest.TestCase):
+    def setUp(self):
+        self.stress_history = np.random.rand(5, 40, 6)
+        self.hardness = 500 + np.random.rand(40)
+        self.expected = evaluate_effective_stress(self.stress_history, "SS2506", amplitude,
+                                                  executor=SerialExecutor(), HV=self.hardness)
+        self.created_segments = []
+        create_shared_memory = shared_memory.SharedMemory
+
+        def record_segments(*args, **kw_args):
+            segment = create_shared_memory(*args, **kw_args)
+            if kw_args.get("create"):
+                self.created_segments.append(segment.name)
+            return segment
+        patcher = mock.patch("fat_eval.utilities.shared_arrays.shared_memory.SharedMemory", record_segments)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def assert_unlinked(self, names):
+        for name in names:
+            with self.assertRaises(FileNotFoundError):
+                shared_memory.SharedMemory(name=name)
+
+    def test_shared_memory_equals_serial(self):
+        result = evaluate_effective_stress(self.stress_history, "SS2506", amplitude, cpus=3, shared_memory=True,
+                                           executor=ProcessExecutor(3), HV=self.hardness)
+        np.testing.assert_array_equal(result, self.expected)
+        # The stress history, the hardness and the output
+        self.assertEqual(len(self.created_segments), 3)
+        self.assert_unlinked(self.created_segments)
+
+    def test_shared_stress_history_is_not_copied(self):
+        with SharedArray(self.stress_history.shape) as shared_history:
+            shared_history.array[...] = self.stress_history
+            self.assertEqual(len(self.created_segments), 1)
+            result = evaluate_effective_stress(shared_history, "SS2506", amplitude, cpus=2, shared_memory=True,
+                                               executor=ProcessExecutor(2), HV=self.hardness)
+            # The segment of the caller is left open, the evaluation only creates the hardness and the output
+            np.testing.assert_array_equal(shared_history.array, self.stress_history)
+            self.assertEqual(len(self.created_segments), 3)
+        np.testing.assert_array_equal(result, self.expected)
+        self.assert_unlinked(self.created_segments)
+
+    def test_executor_timeout(self):
+        with self.assertRaises(ExecutorTimeoutError):
+            evaluate_effective_stress(self.stress_history, "SS2506", slow_amplitude, shared_memory=True,
+                                      executor=ProcessExecutor(2, timeout=0.2), HV=self.hardness)
+        self.assert_unlinked(self.created_segments)
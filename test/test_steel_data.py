@@ -0,0 +1,69 @@
+import pickle
+import unittest
+
+from types import SimpleNamespace
+
+import numpy as np
+
+from fat_eval.fatigue_materials import SS2506, materials, material_field, precompute_material_fields
+from fat_eval.fatigue_materials import register_material
+from fat_eval.fatigue_materials.hardess_convertion_functions import HRC2HV
+from fat_eval.utilities.steel_data import SteelData
+
+
+class TestSteelData(unittest.TestCase):
+    def setUp(self):
+        self.hardness = np.linspace(56, 64, 10)
+        self.steel_data = SteelData({"SDV_HARDNESS": self.hardness})
+
+    def test_fields(self):
+        self.assertTrue(self.steel_data.SDV_HARDNESS is self.hardness)
+        np.testing.assert_allclose(self.steel_data.HV, HRC2HV(self.hardness))
+        with self.assertRaises(AttributeError):
+            _ = self.steel_data.SDV_AUSTENITE
+
+    def test_memoized_fields(self):
+        self.assertTrue(self.steel_data.HV is self.steel_data.HV)
+        self.assertTrue(SS2506.findley_k(self.steel_data) is SS2506.findley_k(self.steel_data))
+
+    def test_slices_are_views(self):
+        hv = self.steel_data.HV
+        subset = self.steel_data[2:5]
+        self.assertTrue(np.shares_memory(subset.SDV_HARDNESS, self.hardness))
+        self.assertTrue(np.shares_memory(subset.HV, hv))
+        np.testing.assert_allclose(subset.HV, HRC2HV(self.hardness[2:5]))
+        self.assertEqual(len(subset), 3)
+
+    def test_empty_data(self):
+        self.assertEqual(len(SteelData({})), 0)
+
+    def test_pickling(self):
+        _ = self.steel_data.HV
+        steel_data = pickle.loads(pickle.dumps(self.steel_data))
+        np.testing.assert_allclose(steel_data.SDV_HARDNESS, self.hardness)
+        self.assertEqual(steel_data._cache, {})
+        np.testing.assert_allclose(steel_data.HV, self.steel_data.HV)
+
+
+class TestMaterialFields(unittest.TestCase):
+    def setUp(self):
+        self.steel_data = SteelData({"SDV_HARDNESS": np.linspace(56, 64, 1000)})
+
+    def test_registered_material(self):
+        precompute_material_fields(self.steel_data, "SS2506")
+        self.assertTrue(SS2506.findley_k(self.steel_data) is self.steel_data._cache[("SS2506", "findley_k")])
+        np.testing.assert_allclose(SS2506.findley_k(self.steel_data), 0.017 + 8.27e-4*self.steel_data.HV)
+
+    def test_plain_hardness_object(self):
+        plain_steel_data = SimpleNamespace(HV=self.steel_data.HV)
+        np.testing.assert_allclose(SS2506.findley_k(plain_steel_data), SS2506.findley_k(self.steel_data))
+
+    def test_tabulated_fields(self):
+        hardness_fields = {"sw": lambda HV: 2000*np.exp(-HV/1000)}
+        register_material("Tabulated", object(), hardness_fields=hardness_fields, table_size=100)
+        register_material("Exact", object(), hardness_fields=hardness_fields)
+        self.assertTrue("Tabulated" in materials)
+        np.testing.assert_allclose(material_field(self.steel_data, "Tabulated", "sw"),
+                                   material_field(self.steel_data, "Exact", "sw"), rtol=1e-6)
+        materials.pop("Tabulated")
+        materials.pop("Exact")
@@ -0,0 +1,113 @@
+import tempfile
+import unittest
+from collections import defaultdict
+
+import numpy as np
+
+from benchmarks.references import reference_life, reference_pf
+from fat_eval.utilities.executors import ProcessExecutor, SerialExecutor, ThreadExecutor
+from fat_eval.utilities.odb_cache import OdbFieldCache
+from fat_eval.utilities.steel_data import SteelData
+from fat_eval.weakest_link.FEM_functions.elements import C3D8, C3D8R
+from fat_eval.weakest_link.FEM_functions.mesh import Mesh
+from fat_eval.weakest_link.probabilistic_sn_curve import (_calculate_load_case_lives, _install_worker_state,
+                                                           _worker_state, calculate_lives)
+from fat_eval.weakest_link.weakest_link_evaluator import WeakestLinkEvaluator
+
+unit_cube = np.array([[0, 0, 0], [1, 0, 0], [1, 1, 0], [0, 1, 0],
+                      [0, 0, 1], [1, 0, 1], [1, 1, 1], [0, 1, 1]], dtype=float)
+
+np.random.seed(4)
+elements = {}
+element_labels = []
+for label in range(1, 21):
+    coordinates = unit_cube*(1 + np.random.rand(3)) + 0.1*np.random.randn(8, 3)
+    if label % 4:
+        elements[label] = C3D8(coordinates)
+        element_labels.extend([label]*8)
+    else:
+        elements[label] = C3D8R(coordinates)
+        element_labels.append(label)
+element_labels = np.array(element_labels)
+stress = 330 + 40*np.random.rand(element_labels.shape[0])
+steel_data = SteelData({"SDV_HARDNESS": 58 + 4*np.random.rand(element_labels.shape[0])})
+
+
+class TestWeakestLinkEvaluator(unittest.TestCase):
+    def setUp(self):
+        self.evaluator = WeakestLinkEvaluator(elements, element_labels, steel_data, symmetry_factor=4)
+
+    def test_evaluate_matches_reference(self):
+        for cycles in [1e4, 1e5, 2e6]:
+            reference = reference_pf(elements, element_labels, steel_data, 4, stress, "SS2506", cycles=cycles)
+            self.assertAlmostEqual(self.evaluator.evaluate(stress, "SS2506", cycles=cycles), reference, places=12)
+
+    def test_evaluate_many(self):
+        cycles = np.logspace(3, 8, 50)
+        pf = self.evaluator.evaluate_many(stress, "SS2506", cycles)
+        np.testing.assert_allclose(pf, [self.evaluator.evaluate(stress, "SS2506", cycles=n) for n in cycles],
+                                   rtol=1e-12, atol=1e-15)
+        pf = self.evaluator.evaluate_many(stress, "SS2506", cycles, load_factors=[0.9, 1.1])
+        self.assertEqual(pf.shape, (2, 50))
+        np.testing.assert_allclose(pf[1], [self.evaluator.evaluate(1.1*stress, "SS2506", cycles=n) for n in cycles],
+                                   rtol=1e-12, atol=1e-15)
+
+    def test_snapshot(self):
+        with tempfile.TemporaryDirectory() as directory:
+            cache = OdbFieldCache(directory)
+            cache.store("snapshot", self.evaluator.snapshot())
+            evaluator = WeakestLinkEvaluator.from_snapshot(cache.load("snapshot"), symmetry_factor=4)
+            self.assertTrue(isinstance(evaluator.integration_weights, np.memmap))
+            self.assertEqual(evaluator.evaluate(stress, "SS2506"), self.evaluator.evaluate(stress, "SS2506"))
+
+
+class TestMesh(unittest.TestCase):
+    def test_gauss_point_volumes(self):
+        mesh = Mesh.from_elements(elements)
+        for block in mesh.blocks:
+            for label, volumes in zip(block.labels, block.gauss_point_volumes):
+                np.testing.assert_allclose(volumes, elements[label].gauss_point_volumes, rtol=1e-12)
+
+    def test_integration_weights_for_shuffled_labels(self):
+        shuffled_labels = element_labels[np.random.permutation(element_labels.shape[0])]
+        weights = Mesh.from_elements(elements).integration_weights(shuffled_labels)
+        counter = defaultdict(int)
+        for label, weight in zip(shuffled_labels, weights):
+            element = elements[label]
+            gp = counter[label]
+            self.assertAlmostEqual(weight, element.gauss_point_volumes[gp]*element.gauss_weights[gp], places=12)
+            counter[label] += 1
+
+    def test_unknown_label(self):
+        with self.assertRaises(KeyError):
+            Mesh.from_elements(elements).integration_weights([1, 1000])
+
+
+class TestLifeCalculation(unittest.TestCase):
+    def test_lives_match_bisection(self):
+        evaluator = WeakestLinkEvaluator(elements, element_labels, steel_data, symmetry_factor=4)
+        pf_levels = [0.01, 0.1, 0.5, 0.9]
+        for scale in [1., 1.2]:
+            lives = calculate_lives(scale*stress, evaluator, pf_levels, [1e2, 1e9], "SS2506")
+            for pf, life in zip(pf_levels, lives):
+                reference = reference_life(scale*stress, evaluator, pf, [1e2, 1e9], "SS2506")
+                self.assertTrue(abs(np.log(life) - np.log(reference)) < 2e-3)
+
+    def test_levels_outside_span(self):
+        evaluator = WeakestLinkEvaluator(elements, element_labels, steel_data, symmetry_factor=4)
+        self.assertEqual(calculate_lives(stress, evaluator, [0.5, 0.], [1e2, 1e3], "SS2506"), [1e3, 1e2])
+
+    def test_worker_state_lives_equal_serial(self):
+        evaluator = WeakestLinkEvaluator(elements, element_labels, steel_data, symmetry_factor=4)
+        stress_states = [stress, 1.2*stress, 0.9*stress]
+        pf_levels = [0.1, 0.5]
+        expected = [calculate_lives(stress_state, evaluator, pf_levels, [1e2, 1e9], "SS2506")
+                    for stress_state in stress_states]
+        jobs = [(_calculate_load_case_lives, (i, pf_levels), {}) for i in range(len(stress_states))]
+        for executor in [SerialExecutor(), ThreadExecutor(2), ProcessExecutor(2)]:
+            try:
+                lives = executor.run(jobs, initializer=_install_worker_state,
+                                     initargs=(evaluator, stress_states, [1e2, 1e9], "SS2506"))
+            finally:
+                _worker_state.clear()
+            self.assertEqual(lives, expected, executor.name)